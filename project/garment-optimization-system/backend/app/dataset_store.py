@@ -0,0 +1,140 @@
+import glob
+import os
+import threading
+
+import numpy as np
+
+from app.ml.feature_builder import DEPARTMENTS, TEAM_FIELDS
+
+BACKEND_PATH = os.path.join(os.path.dirname(__file__), '..')
+
+# Tried in order when DATASET_PATH is not set
+DEFAULT_DATASET_PATHS = [
+    os.path.join(BACKEND_PATH, 'dataset', 'garment_production_dataset.csv'),
+    os.path.join(BACKEND_PATH, '..', '..', '..', 'dataset')
+]
+
+
+def resolve_dataset_files(path):
+    """A CSV file, or every garment*.csv in a directory"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, 'garment*.csv')))
+    return [path] if os.path.exists(path) else []
+
+
+def dataset_files(path=None):
+    """Files under path, else under the first DEFAULT_DATASET_PATHS entry that has any"""
+    if path:
+        return resolve_dataset_files(path)
+    for candidate in DEFAULT_DATASET_PATHS:
+        files = resolve_dataset_files(candidate)
+        if files:
+            return files
+    return []
+
+
+def normalize_frame(df):
+    """
+    Bring one dataset file to the shared layout.
+
+    The garment*.csv files differ: some have blank (unnamed) columns, some
+    only record absent_workers instead of per-department attendance. Missing
+    attendance is derived by splitting absent_workers across departments in
+    proportion to their size (largest remainder), keeping at least one
+    worker present per department. bottleneck_department is lowercased.
+    Rows that would fail team validation are dropped.
+    """
+    df = df.loc[:, [c for c in df.columns if c.strip() and not c.startswith('Unnamed')]]
+    df.columns = [c.strip().lower() for c in df.columns]
+    if 'bottleneck_department' in df.columns:
+        df = df.assign(bottleneck_department=df['bottleneck_department'].str.strip().str.lower())
+
+    if not all(f'{dept}_attendance' in df.columns for dept in DEPARTMENTS):
+        if 'absent_workers' not in df.columns:
+            raise ValueError("Dataset needs per-department attendance or absent_workers")
+        df = df.assign(**derive_attendance(df))
+
+    df = df.dropna(subset=TEAM_FIELDS)
+    teams = df[TEAM_FIELDS].astype(np.int64)
+    valid = (
+        (teams[[f'{dept}_workers' for dept in DEPARTMENTS]].sum(axis=1) == teams['total_workers'])
+        & (teams[TEAM_FIELDS] > 0).all(axis=1)
+    )
+    for dept in DEPARTMENTS:
+        valid &= teams[f'{dept}_attendance'] <= teams[f'{dept}_workers']
+
+    return df.loc[valid].assign(**{f: teams.loc[valid, f] for f in TEAM_FIELDS})
+
+
+def derive_attendance(df):
+    """Per-department attendance columns from total absent_workers"""
+    workers = df[[f'{dept}_workers' for dept in DEPARTMENTS]].to_numpy(dtype=np.float64)
+    total = workers.sum(axis=1, keepdims=True)
+    absent = np.clip(df['absent_workers'].fillna(0).to_numpy(dtype=np.float64), 0, None)[:, np.newaxis]
+
+    share = np.divide(absent * workers, total, out=np.zeros_like(workers), where=total > 0)
+    absences = np.floor(share)
+
+    # Hand the leftover absences to the largest remainders
+    leftover = (absent[:, 0] - absences.sum(axis=1)).astype(np.int64)
+    order = np.argsort(-(share - absences), axis=1, kind='stable')
+    ranks = np.argsort(order, axis=1)
+    absences += ranks < leftover[:, np.newaxis]
+
+    attendance = np.clip(workers - absences, 1, None).astype(np.int64)
+    return {f'{dept}_attendance': attendance[:, i] for i, dept in enumerate(DEPARTMENTS)}
+
+
+class DatasetStore:
+    """
+    Sample teams held in memory as one typed NumPy column per team field.
+
+    Files are read on first use and re-read when their modification time
+    (or the set of files) changes; sampling is plain index selection.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('DATASET_PATH')
+        self.columns = None
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _files(self):
+        return dataset_files(self.path)
+
+    def _load(self, files):
+        # pandas is only needed here; importing it lazily keeps startup fast
+        import pandas as pd
+
+        frames = [normalize_frame(pd.read_csv(f, skipinitialspace=True)) for f in files]
+        return {
+            field: np.concatenate([frame[field].to_numpy() for frame in frames]).astype(np.int32)
+            for field in TEAM_FIELDS
+        }
+
+    def refresh(self):
+        """Load or reload the columns if the files changed since the last load"""
+        files = self._files()
+        if not files:
+            raise FileNotFoundError("Dataset file not found")
+        signature = tuple((f, os.stat(f).st_mtime_ns) for f in files)
+
+        with self._lock:
+            if signature != self._signature:
+                self.columns = self._load(files)
+                self._signature = signature
+            return self.columns
+
+    def __len__(self):
+        columns = self.refresh()
+        return len(columns['total_workers'])
+
+    def sample(self, num_teams, seed=None):
+        """Up to num_teams distinct rows as team dicts"""
+        columns = self.refresh()
+        total_rows = len(columns['total_workers'])
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(total_rows, size=min(num_teams, total_rows), replace=False)
+
+        rows = np.column_stack([columns[f][idx] for f in TEAM_FIELDS]).tolist()
+        return [dict(zip(TEAM_FIELDS, row)) for row in rows], total_rows
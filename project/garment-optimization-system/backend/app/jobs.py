@@ -0,0 +1,147 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at its depth limit"""
+
+
+class Job:
+    """One optimization run tracked by the JobManager"""
+
+    def __init__(self, job_id):
+        self.id = job_id
+        self.status = QUEUED
+        self.progress = {'iteration': 0, 'best_completion_rate': None}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def report_progress(self, iteration, best_score):
+        """progress_callback for the optimizer"""
+        self.progress = {'iteration': iteration, 'best_completion_rate': best_score}
+
+    def cancel(self):
+        """Ask the job to stop; queued jobs never start"""
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def cancel_requested(self):
+        """should_stop callback for the optimizer"""
+        return self._cancel_event.is_set()
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+
+
+class JobManager:
+    """
+    Runs optimizations on one bounded thread pool.
+
+    At most max_workers jobs run at a time and at most max_queue more may
+    wait; further submissions raise QueueFullError so callers can shed load.
+    Finished jobs are kept (oldest dropped first) up to max_finished.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, max_finished=1000):
+        self.max_workers = max_workers or int(os.environ.get('OPTIMIZER_WORKERS', os.cpu_count() or 1))
+        self.max_queue = max_queue if max_queue is not None else int(os.environ.get('OPTIMIZER_QUEUE_DEPTH', 16))
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='optimizer')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, fn):
+        """
+        Queue fn(job) to run on the pool and return the Job.
+
+        fn receives the Job so it can report progress and check for
+        cancellation; its return value becomes job.result.
+        """
+        with self._lock:
+            active = sum(1 for job in self._jobs.values() if job.status not in FINISHED_STATES)
+            if active >= self.max_workers + self.max_queue:
+                raise QueueFullError(
+                    f"Optimization queue is full ({active} jobs queued or running)"
+                )
+            job = Job(uuid.uuid4().hex)
+            self._jobs[job.id] = job
+            self._prune()
+
+        job.future = self._executor.submit(self._run, job, fn)
+        job.future.add_done_callback(lambda future: self._on_cancelled(job, future))
+        return job
+
+    def _run(self, job, fn):
+        if job.cancel_requested():
+            self._finish(job, CANCELLED)
+            return None
+        job.status = RUNNING
+        job.started_at = time.time()
+        try:
+            job.result = fn(job)
+        except Exception as e:
+            job.error = str(e)
+            self._finish(job, FAILED)
+            raise
+        # A cancelled run still returns its best state so far
+        self._finish(job, CANCELLED if job.cancel_requested() else COMPLETED)
+        return job.result
+
+    def _on_cancelled(self, job, future):
+        # Jobs cancelled while still queued never reach _run
+        if future.cancelled():
+            self._finish(job, CANCELLED)
+
+    def _finish(self, job, status):
+        job.finished_at = time.time()
+        job.status = status
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED_STATES]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            counts = {state: 0 for state in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return {'max_workers': self.max_workers, 'max_queue': self.max_queue, **counts}
+
+    def shutdown(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        for job in jobs:
+            if job.status not in FINISHED_STATES:
+                job.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -1,33 +1,69 @@
-from fastapi import FastAPI, HTTPException, Query
+import time
+
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from contextlib import asynccontextmanager
-import time
-import pandas as pd
-import os
-import random
-import json
+from typing import Literal, Optional, Union
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import queue
+import os
+import threading
 
-from app.schemas import OptimizationRequest, OptimizationResponse, SampleDataResponse
+from app.schemas import (
+    OptimizationDeltaResponse, OptimizationRequest, OptimizationResponse, SampleDataResponse, ScenarioBatchRequest,
+    SessionUpdate
+)
 from app.ml.model_loader import ModelLoader
-from app.ml.evaluator import evaluate_system
-from app.ml.optimizer import optimize_worker_allocation
-from app.utils.validators import validate_teams
+from app.ml.prediction_cache import prediction_cache
+from app.ml.feature_builder import team_matrix
+from app.ml.multi_start import shutdown_chain_pool
+from app.ml import scenarios
+from app.dataset_store import DatasetStore
+from app.jobs import JobManager, QueueFullError, CANCELLED, COMPLETED, FAILED, FINISHED_STATES
+from app import metrics
+from app.result_cache import ResultCache, request_key
+from app import responses
+from app.optimization import MAX_ITERATIONS, request_matrix, run_optimization
+from app.worker_pool import WorkerPool
+from app.sessions import SessionCapacityError, SessionStore, reoptimize
+
+IMPORT_SECONDS = time.perf_counter() - IMPORT_STARTED
+STREAM_DISCONNECT_POLL = 0.5  # seconds between disconnect checks while no events arrive
+
+# ?format= of optimization results: every team ('full') or only the changed ones ('delta')
+ResponseFormat = Literal['full', 'delta']
 
 model_loader = None
+job_manager = None
+result_cache = None
+worker_pool = None  # set when OPTIMIZER_BACKEND=process
+session_store = None
+dataset_store = DatasetStore()  # loaded on first /sample-data request
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global model_loader
+    global model_loader, job_manager, result_cache, worker_pool, session_store
     print("Loading ML artifacts...")
     model_loader = ModelLoader()
     model_loader.load_artifacts()
     print("ML artifacts loaded successfully!")
+    job_manager = JobManager()
+    result_cache = ResultCache()
+    session_store = SessionStore()
+    if os.environ.get('OPTIMIZER_BACKEND', 'thread') == 'process':
+        # One worker process per job thread; each thread blocks on its worker
+        worker_pool = WorkerPool(job_manager.max_workers, model_loader.artifacts_path, model_loader.current.version,
+                                 inference_backend=model_loader.inference_backend)
+        print(f"✓ Started {job_manager.max_workers} optimizer worker processes")
     yield
     print("Shutting down...")
+    job_manager.shutdown()
+    if worker_pool is not None:
+        worker_pool.shutdown()
+    shutdown_chain_pool()
 
 app = FastAPI(
     title="Garment Production Optimizer",
@@ -50,6 +86,11 @@ def root():
         "status": "running",
         "endpoints": {
             "optimize": "POST /optimize",
+            "jobs": "POST /jobs",
+            "sessions": "POST /sessions",
+            "evaluate_batch": "POST /evaluate/batch",
+            "model": "GET /model",
+            "metrics": "GET /metrics",
             "health": "GET /health"
         }
     }
@@ -60,221 +101,496 @@ def health_check():
         raise HTTPException(status_code=503, detail="ML models not loaded")
     return {
         "status": "healthy",
-        "model_loaded": True
+        "model_loaded": True,
+        "model_version": model_loader.current.version,
+        "startup": {
+            "import_seconds": IMPORT_SECONDS,
+            **model_loader.timings
+        },
+        "prediction_cache": prediction_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "jobs": job_manager.stats(),
+        "sessions": session_store.stats(),
+        "execution": worker_pool.stats() if worker_pool is not None else {'backend': 'thread'}
     }
 
 @app.get("/sample-data", response_model=SampleDataResponse)
-def get_sample_data(num_teams: int = Query(default=5, ge=1, le=50)):
+def get_sample_data(
+    num_teams: int = Query(default=5, ge=1, le=50),
+    seed: Optional[int] = Query(default=None, ge=0)
+):
     """Load random sample teams from the dataset"""
     try:
-        dataset_path = os.path.join(os.path.dirname(__file__), '..', 'dataset', 'garment_production_dataset.csv')
-        df = pd.read_csv(dataset_path)
-        
-        # Randomly sample rows
-        sample_size = min(num_teams, len(df))
-        sample_df = df.sample(n=sample_size, random_state=random.randint(1, 10000))
-        
-        teams = []
-        for _, row in sample_df.iterrows():
-            teams.append({
-                "total_workers": int(row['total_workers']),
-                "cutting_workers": int(row['cutting_workers']),
-                "sewing_workers": int(row['sewing_workers']),
-                "finishing_workers": int(row['finishing_workers']),
-                "cutting_attendance": int(row['cutting_attendance']),
-                "sewing_attendance": int(row['sewing_attendance']),
-                "finishing_attendance": int(row['finishing_attendance']),
-                "daily_target": int(row['daily_target'])
-            })
-        
-        return SampleDataResponse(teams=teams, total_rows=len(df))
+        teams, total_rows = dataset_store.sample(num_teams, seed=seed)
+        return SampleDataResponse(teams=teams, total_rows=total_rows)
     except FileNotFoundError:
         raise HTTPException(status_code=404, detail="Dataset file not found")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to load sample data: {str(e)}")
 
-@app.post("/optimize", response_model=OptimizationResponse)
-def optimize_teams(request: OptimizationRequest):
-    start_time = time.time()
+def submit_optimization(request, progress_callback=None, on_initial=None, model=None):
+    """
+    Queue an optimization on the shared job pool (429 when it is full).
+    It runs with `model`, by default the model current at submission, so a
+    reload while it is queued cannot change the version its result is
+    cached under.
+    """
+    model = model or model_loader.current
+    # The time budget starts on arrival, so time spent queued counts against it
+    deadline = None
+    if request.time_budget_ms is not None:
+        deadline = time.monotonic() + request.time_budget_ms / 1000
+    
+    def run(job):
+        def report(iteration, best_score):
+            job.report_progress(iteration, best_score)
+            if progress_callback:
+                progress_callback(iteration, best_score)
+        if worker_pool is not None:
+            result = worker_pool.run(request, model.version, progress_callback=report,
+                                     should_stop=job.cancel_requested, on_initial=on_initial, deadline=deadline)
+        else:
+            result = run_optimization(request, model, progress_callback=report,
+                                      should_stop=job.cancel_requested, on_initial=on_initial, deadline=deadline)
+        # Cancelled runs are partial and profiled runs carry timings; neither is reusable
+        if not job.cancel_requested() and not request.profile:
+            result_cache.put(request_key(request, model.version), result)
+        return result
     
+    return submit_job(run)
+
+def submit_job(run):
+    """job_manager.submit, with a full queue reported as 429"""
     try:
-        # Validate input
-        validate_teams(request.teams)
-        
-        # Convert to list of dicts
-        teams = [team.dict() for team in request.teams]
-        
-        # Evaluate initial state
-        initial_performance = evaluate_system(
-            teams,
-            model_loader.rf_model,
-            model_loader.scaler,
-            model_loader.feature_order,
-            bottleneck_aware=True
-        )
-        
-        # Deep copy for optimization
-        import copy
-        teams_for_opt = copy.deepcopy(teams)
-        
-        # Run optimization
-        optimization_result = optimize_worker_allocation(
-            teams_for_opt,
-            model_loader.rf_model,
-            model_loader.scaler,
-            model_loader.feature_order,
-            max_iterations=1000,
-            temperature=2.0,
-            cooling_rate=0.995,
-            bottleneck_aware=True
-        )
-        
-        computation_time = time.time() - start_time
-        
-        # Build response
-        return OptimizationResponse(
-            initial={
-                "completion_rate": initial_performance['total_completion_rate'],
-                "total_output": initial_performance['total_output'],
-                "total_target": initial_performance['total_target']
-            },
-            final={
-                "completion_rate": optimization_result['best_performance']['total_completion_rate'],
-                "total_output": optimization_result['best_performance']['total_output'],
-                "total_target": optimization_result['best_performance']['total_target']
-            },
-            teams_before=teams,
-            teams_after=optimization_result['optimized_teams'],
-            team_metrics_before=initial_performance.get('team_metrics', []),
-            team_metrics_after=optimization_result['best_performance'].get('team_metrics', []),
-            iterations=optimization_result['iterations'],
-            migrations=optimization_result['migrations'],
-            improvement_pct=optimization_result['improvement_pct'],
-            gain=optimization_result['gain'],
-            computation_time=computation_time,
-            migration_log=optimization_result['migration_log']
-        )
-        
+        return job_manager.submit(run)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+def submit_shared(request, key, model):
+    """
+    submit_optimization, or the job of an identical request already running.
+    Returns (job, joined). Only for callers that never cancel the job: a
+    shared job cancelled by one waiter would fail the others.
+    """
+    if request.profile:
+        return submit_optimization(request, model=model), False
+    return result_cache.join_or_start(key, lambda: submit_optimization(request, model=model))
+
+async def cached_result(key):
+    """result_cache.get, in a worker thread when it may read sqlite"""
+    if result_cache.persistent:
+        return await run_in_threadpool(result_cache.get, key)
+    return result_cache.get(key)
+
+async def wrap_job(job):
+    """
+    Await a job's result; a job cancelled before it started (server
+    shutdown) is a 503 rather than an uncaught CancelledError
+    """
+    try:
+        return await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        if not job.future.cancelled():
+            raise  # the request itself was cancelled
+        raise HTTPException(status_code=503, detail="Optimization was cancelled", headers={"Retry-After": "1"})
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match header check (weak comparison, '*' matches anything)"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+@app.post("/optimize", response_model=Union[OptimizationResponse, OptimizationDeltaResponse])
+async def optimize_teams(
+    request: OptimizationRequest,
+    response_format: ResponseFormat = Query(default='full', alias='format'),
+    if_none_match: Optional[str] = Header(default=None),
+    cache_control: Optional[str] = Header(default=None),
+    accept_encoding: Optional[str] = Header(default=None)
+):
+    start_time = time.perf_counter()
+    # One handle for the cache key and the run, even if the model is reloaded meanwhile
+    model = model_loader.current
+    key = request_key(request, model.version)
+    etag = f'"{key}"' if response_format == 'full' else f'"{key}-{response_format}"'
+    
+    # Identical requests (same teams, parameters, seed and model version)
+    # reuse a cached result, or join the computation already running
+    result = None
+    if not request.profile and 'no-cache' not in (cache_control or ''):
+        result = await cached_result(key)
+    if result is not None:
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers={"ETag": etag})
+        cache_status = 'HIT'
+    else:
+        job, joined = submit_shared(request, key, model)
+        cache_status = 'COALESCED' if joined else 'MISS'
+    
+    try:
+        if result is None:
+            result = await wrap_job(job)
+        # The result is server-generated, so it is encoded as-is rather than
+        # re-validated through OptimizationResponse
+        with metrics.stage('serialize'):
+            response = responses.json_response(
+                responses.format_result(result, response_format), accept_encoding,
+                headers={"ETag": etag, "X-Cache": cache_status}
+            )
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start_time, route='/optimize')
+        return response
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
 
 @app.post("/optimize-stream")
-async def optimize_teams_stream(request: OptimizationRequest):
+async def optimize_teams_stream(
+    request: OptimizationRequest,
+    http_request: Request,
+    progress_interval_ms: int = Query(default=100, ge=0, le=10000),
+    response_format: ResponseFormat = Query(default='full', alias='format')
+):
     """Streaming endpoint that sends progress updates during optimization"""
     
+    loop = asyncio.get_running_loop()
+    events = asyncio.Queue()
+    progress_interval = progress_interval_ms / 1000
+    last_progress = {'sent_at': float('-inf')}
+    
+    def sse(event):
+        return b"data: " + responses.dumps(event) + b"\n\n"
+    
+    def publish(event):
+        # Called from the optimizer thread; hand the event to the event loop
+        loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    def send_initial(initial_performance):
+        publish({'type': 'init', 'initial_completion_rate': initial_performance['total_completion_rate']})
+    
+    def send_progress(iteration, best_score):
+        # Coalesce progress to at most one event per interval
+        now = time.monotonic()
+        if now - last_progress['sent_at'] >= progress_interval:
+            last_progress['sent_at'] = now
+            publish({'type': 'progress', 'iteration': iteration, 'best_completion_rate': best_score})
+    
     async def event_generator():
+        job = None
         try:
-            # Validate input
-            validate_teams(request.teams)
-            
-            # Convert to list of dicts
-            teams = [team.dict() for team in request.teams]
+            # Run optimization on the shared job pool
+            job = submit_optimization(request, progress_callback=send_progress, on_initial=send_initial)
+            job.future.add_done_callback(lambda future: publish(None))  # Signal completion
             
-            # Evaluate initial state
-            initial_performance = evaluate_system(
-                teams,
-                model_loader.rf_model,
-                model_loader.scaler,
-                model_loader.feature_order,
-                bottleneck_aware=True
-            )
-            
-            # Send initial state
-            yield f"data: {json.dumps({'type': 'init', 'initial_completion_rate': initial_performance['total_completion_rate']})}\n\n"
-            
-            # Deep copy for optimization
-            import copy
-            teams_for_opt = copy.deepcopy(teams)
-            
-            # Create a queue for progress updates
-            progress_queue = queue.Queue()
-            result_queue = queue.Queue()
-            
-            def sync_progress_callback(iteration, best_score):
-                progress_queue.put({
-                    'type': 'progress',
-                    'iteration': iteration,
-                    'best_completion_rate': best_score
-                })
-            
-            # Run optimization in a separate thread
-            def run_optimization():
-                try:
-                    start_time = time.time()
-                    optimization_result = optimize_worker_allocation(
-                        teams_for_opt,
-                        model_loader.rf_model,
-                        model_loader.scaler,
-                        model_loader.feature_order,
-                        max_iterations=1000,
-                        temperature=2.0,
-                        cooling_rate=0.995,
-                        bottleneck_aware=True,
-                        progress_callback=sync_progress_callback
-                    )
-                    computation_time = time.time() - start_time
-                    result_queue.put((optimization_result, computation_time, None))
-                except Exception as e:
-                    result_queue.put((None, None, str(e)))
-                finally:
-                    progress_queue.put(None)  # Signal completion
-            
-            # Start optimization in thread
-            executor = ThreadPoolExecutor(max_workers=1)
-            future = executor.submit(run_optimization)
-            
-            # Stream progress updates as they come
+            # Stream events as they come, checking for a disconnect before each one
             while True:
+                if await http_request.is_disconnected():
+                    return
                 try:
-                    update = progress_queue.get(timeout=0.1)
-                    if update is None:  # Optimization complete
-                        break
-                    yield f"data: {json.dumps(update)}\n\n"
-                except queue.Empty:
-                    await asyncio.sleep(0.01)
+                    event = await asyncio.wait_for(events.get(), timeout=STREAM_DISCONNECT_POLL)
+                except asyncio.TimeoutError:
                     continue
+                if event is None:  # Optimization complete
+                    break
+                yield sse(event)
             
-            # Wait for result
-            optimization_result, computation_time, error = result_queue.get()
-            
-            if error:
-                raise Exception(error)
+            if job.future.cancelled():
+                raise RuntimeError("Optimization cancelled")
             
             # Send final result
             result = {
                 'type': 'complete',
-                'result': {
-                    'initial': {
-                        "completion_rate": initial_performance['total_completion_rate'],
-                        "total_output": initial_performance['total_output'],
-                        "total_target": initial_performance['total_target']
-                    },
-                    'final': {
-                        "completion_rate": optimization_result['best_performance']['total_completion_rate'],
-                        "total_output": optimization_result['best_performance']['total_output'],
-                        "total_target": optimization_result['best_performance']['total_target']
-                    },
-                    'teams_before': teams,
-                    'teams_after': optimization_result['optimized_teams'],
-                    'team_metrics_before': initial_performance.get('team_metrics', []),
-                    'team_metrics_after': optimization_result['best_performance'].get('team_metrics', []),
-                    'iterations': optimization_result['iterations'],
-                    'migrations': optimization_result['migrations'],
-                    'improvement_pct': optimization_result['improvement_pct'],
-                    'gain': optimization_result['gain'],
-                    'computation_time': computation_time,
-                    'migration_log': optimization_result['migration_log']
-                }
+                'result': responses.format_result(job.future.result(), response_format)
             }
-            yield f"data: {json.dumps(result)}\n\n"
-            
-            executor.shutdown(wait=False)
+            yield sse(result)
             
         except Exception as e:
-            error_data = {'type': 'error', 'message': str(e)}
-            yield f"data: {json.dumps(error_data)}\n\n"
+            error_data = {'type': 'error', 'message': str(e.detail) if isinstance(e, HTTPException) else str(e)}
+            yield sse(error_data)
+        finally:
+            # Stop the optimization if the client went away
+            if job is not None and not job.future.done():
+                job.cancel()
     
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 
+@app.post("/evaluate/batch")
+def evaluate_batch(request: ScenarioBatchRequest):
+    """
+    Score what-if attendance scenarios against a base plant, streamed as
+    NDJSON: a 'base' line, 'scenario' lines as each chunk finishes (or the
+    top_k by output at the end), then a 'summary' line.
+    """
+    model = model_loader.current
+    try:
+        base = request_matrix(request)
+        
+        # Explicit scenarios are already in memory; check them before streaming
+        sources = [list(scenarios.explicit_scenarios(base, [s.dict() for s in request.scenarios]))]
+        if request.sweep is not None:
+            sweep = request.sweep
+            if sweep.teams is not None and any(t < 0 or t >= len(base) for t in sweep.teams):
+                raise ValueError("Sweep teams must be indices into teams")
+            sources.append(scenarios.sweep_scenarios(base, sweep.max_delta, sweep.departments, sweep.teams))
+        if request.history is not None:
+            columns = dataset_store.refresh()
+            sources.append(scenarios.history_scenarios(base, columns, request.history.days, request.history.seed))
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Dataset file not found")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def lines():
+        start_time = time.time()
+        evaluated = {'scenarios': 0}
+        
+        def counted(chunks):
+            for chunk in chunks:
+                evaluated['scenarios'] += len(chunk)
+                yield chunk
+        
+        try:
+            results = scenarios.evaluate_scenarios(
+                base, (scenario for source in sources for scenario in source),
+                model.rf_model, model.scaler, model.feature_order
+            )
+            yield responses.dumps({'type': 'base', **next(results)}) + b"\n"
+            
+            chunks = counted(results)
+            if request.top_k is not None:
+                chunks = [scenarios.top_k(chunks, request.top_k, request.rank)]
+            for chunk in chunks:
+                with metrics.stage('serialize'):
+                    yield b"".join(responses.dumps({'type': 'scenario', **result}) + b"\n" for result in chunk)
+        except Exception as e:
+            yield responses.dumps({'type': 'error', 'message': str(e)}) + b"\n"
+            return
+        yield responses.dumps({
+            'type': 'summary',
+            'scenarios': evaluated['scenarios'],
+            'model_version': model.version,
+            'computation_time': time.time() - start_time
+        }) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@app.post("/jobs", status_code=202)
+def create_job(request: OptimizationRequest):
+    """Queue an optimization and return its job id"""
+    # Not shared with identical requests: DELETE /jobs/{job_id} cancels it
+    job = submit_optimization(request)
+    return {"job_id": job.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Job status and progress"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    status = job.to_dict()
+    status['progress'] = {**status['progress'], 'max_iterations': MAX_ITERATIONS}
+    return status
+
+@app.get("/jobs/{job_id}/result", response_model=Union[OptimizationResponse, OptimizationDeltaResponse])
+def get_job_result(
+    job_id: str,
+    response_format: ResponseFormat = Query(default='full', alias='format'),
+    accept_encoding: Optional[str] = Header(default=None)
+):
+    """
+    Result of a finished job. A job cancelled while running returns the best
+    allocation found before it stopped (stop_reason 'cancelled'); X-Job-Status
+    tells it apart from a completed one.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == FAILED:
+        raise HTTPException(status_code=400 if isinstance(job.future.exception(), ValueError) else 500,
+                            detail=job.error)
+    # Jobs cancelled before they started have no result
+    if job.status not in (COMPLETED, CANCELLED) or job.result is None:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return responses.json_response(responses.format_result(job.result, response_format), accept_encoding,
+                                   headers={"X-Job-Status": job.status})
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job; the annealing loop stops at its next iteration"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status not in FINISHED_STATES:
+        job.cancel()
+    return {"job_id": job.id, "status": job.status}
+
+@app.post("/sessions", status_code=201, response_model=Union[OptimizationResponse, OptimizationDeltaResponse])
+async def create_session(
+    request: OptimizationRequest,
+    response_format: ResponseFormat = Query(default='full', alias='format'),
+    accept_encoding: Optional[str] = Header(default=None)
+):
+    """
+    Optimize a plant like /optimize and keep the result server-side, so
+    PATCH /sessions/{session_id} can re-optimize it after small edits
+    """
+    model = model_loader.current
+    key = request_key(request, model.version)
+    result = None if request.profile else await cached_result(key)
+    if result is None:
+        job, _ = submit_shared(request, key, model)
+    
+    try:
+        if result is None:
+            result = await wrap_job(job)
+        # The result was computed with `model`, so its team scores are reused
+        team_metrics = result['team_metrics_after']
+        scores = ([team['completion_rate'] for team in team_metrics], [team['output'] for team in team_metrics])
+        session = session_store.create(model, team_matrix(result['teams_after']), scores, seed=result['seed'])
+    except SessionCapacityError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
+    
+    content = {**result, 'session_id': session.id, 'revision': session.revision}
+    return responses.json_response(
+        responses.format_result(content, response_format), accept_encoding,
+        headers={"Location": f"/sessions/{session.id}"}, status_code=201
+    )
+
+@app.patch("/sessions/{session_id}", response_model=Union[OptimizationResponse, OptimizationDeltaResponse])
+async def update_session(
+    session_id: str,
+    update: SessionUpdate,
+    response_format: ResponseFormat = Query(default='full', alias='format'),
+    accept_encoding: Optional[str] = Header(default=None)
+):
+    """
+    Edit a session's teams and re-optimize from its previous best with a
+    short, reheated annealing run on the shared job pool; unedited teams are
+    not re-predicted
+    """
+    start_time = time.perf_counter()
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    deadline = None
+    if update.time_budget_ms is not None:
+        deadline = time.monotonic() + update.time_budget_ms / 1000
+    
+    changes = [change.dict() for change in update.changes]
+    teams = {idx: team.dict() for idx, team in update.teams.items()}
+    
+    def run(job):
+        return session.update(changes=changes, teams=teams, deadline=deadline, should_stop=job.cancel_requested,
+                              run=worker_pool.reoptimize if worker_pool is not None else reoptimize)
+    
+    job = submit_job(run)
+    try:
+        result = await wrap_job(job)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
+    
+    response = responses.json_response(responses.format_result(result, response_format), accept_encoding)
+    metrics.REQUEST_SECONDS.observe(time.perf_counter() - start_time, route='/sessions')
+    return response
+
+@app.get("/sessions/{session_id}")
+def get_session(session_id: str):
+    """Current teams and totals of a session"""
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return session.to_dict(session_store.ttl)
+
+@app.delete("/sessions/{session_id}", status_code=204)
+def delete_session(session_id: str):
+    """End a session and free its state"""
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found")
+    return Response(status_code=204)
+
+@app.get("/model")
+def get_model():
+    """Current model version, available versions and the last reload"""
+    if model_loader is None or not model_loader.is_loaded():
+        raise HTTPException(status_code=503, detail="ML models not loaded")
+    return {
+        "version": model_loader.current.version,
+        "inference_backend": model_loader.current.inference_backend,
+        "available_versions": model_loader.available_versions(),
+        "reloading": model_loader.is_reloading(),
+        "last_reload": model_loader.last_reload
+    }
+
+@app.post("/model/reload", status_code=202)
+def reload_model(version: Optional[str] = Query(default=None)):
+    """
+    Load a model version in the background and swap it in once validated
+    and warmed up. Running optimizations finish on the version they started with.
+    """
+    if model_loader.is_reloading():
+        raise HTTPException(status_code=409, detail="A model reload is already in progress")
+    if version is not None and version not in model_loader.available_versions():
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    
+    def reload():
+        try:
+            model_loader.reload(version)
+        except Exception as e:
+            print(f"✗ Model reload failed: {e}")
+    
+    threading.Thread(target=reload, name='model-reload', daemon=True).start()
+    return {"status": "reloading", "version": version or model_loader.default_version()}
+
+# Point-in-time values that already live in other components, read at scrape time
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_jobs', 'Optimization jobs by state', 'gauge',
+    lambda: {(state,): job_manager.stats()[state] for state in ('queued', 'running') + FINISHED_STATES},
+    ('state',)
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_prediction_cache_lookups_total', 'Prediction cache lookups by result', 'counter',
+    lambda: {('hit',): prediction_cache.hits, ('miss',): prediction_cache.misses},
+    ('result',)
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_prediction_cache_entries', 'Teams held in the prediction cache', 'gauge',
+    lambda: {(): prediction_cache.stats()['size']}
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_result_cache_lookups_total', 'Optimization result cache lookups by result', 'counter',
+    lambda: {('hit',): result_cache.hits, ('miss',): result_cache.misses, ('coalesced',): result_cache.coalesced},
+    ('result',)
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_sessions', 'Re-optimization sessions held in memory', 'gauge',
+    lambda: {(): session_store.stats()['sessions']}
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_startup_seconds', 'Startup time by phase', 'gauge',
+    lambda: {('import',): IMPORT_SECONDS, **{(phase.replace('_seconds', ''),): seconds
+                                            for phase, seconds in model_loader.timings.items()}},
+    ('phase',)
+))
+metrics.REGISTRY.register(metrics.CallbackMetric(
+    'garment_model_info', 'Model version currently serving', 'gauge',
+    lambda: {(model_loader.current.version, model_loader.current.inference_backend): 1},
+    ('version', 'inference_backend')
+))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Counters and latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
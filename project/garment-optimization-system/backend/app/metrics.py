@@ -0,0 +1,268 @@
+import bisect
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans a single sub-millisecond model call up to a long optimization
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in pairs
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label values, extra labels, value) tuples"""
+        with self._lock:
+            return [('', key, (), value) for key, value in self._values.items()]
+
+    def drain(self):
+        """Current values, resetting them; for shipping another process's metrics"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        """Fold values drained from the same metric in another process into this one"""
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        for suffix, key, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}')
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down"""
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def merge(self, values):
+        with self._lock:
+            self._values.update(values)
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative le buckets, with _sum and _count"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+            state['counts'][bisect.bisect_left(self.buckets, value)] += 1
+            state['sum'] += value
+
+    def merge(self, values):
+        with self._lock:
+            for key, other in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0}
+                state['counts'] = [a + b for a, b in zip(state['counts'], other['counts'])]
+                state['sum'] += other['sum']
+
+    def samples(self):
+        with self._lock:
+            states = [(key, list(state['counts']), state['sum']) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total in states:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(('_bucket', key, (('le', _format_value(bound)),), cumulative))
+            samples.append(('_sum', key, (), total))
+            samples.append(('_count', key, (), cumulative))
+        return samples
+
+
+class CallbackMetric(_Metric):
+    """
+    Metric whose values are read from fn() at scrape time, for state that
+    already lives elsewhere (cache statistics, job counts). fn returns a
+    {label values tuple: value} dict.
+    """
+
+    def __init__(self, name, documentation, type, fn, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.type = type
+        self.fn = fn
+
+    def drain(self):
+        return {}  # read from its source in each process
+
+    def samples(self):
+        try:
+            values = self.fn()
+        except Exception:
+            return []  # source not ready (e.g. before startup finishes)
+        return [('', key, (), value) for key, value in values.items()]
+
+
+class Registry:
+    """Metrics rendered together in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def drain(self):
+        """{metric name: values} recorded since the last drain, for merge() in another process"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: values for metric in metrics if (values := metric.drain())}
+
+    def merge(self, snapshot):
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in snapshot.items():
+            if name in metrics:
+                metrics[name].merge(values)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'garment_stage_seconds', 'Time spent in one pipeline stage', ('stage',)
+))
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'garment_request_seconds', 'Optimization request latency by route', ('route',)
+))
+OPTIMIZATIONS_TOTAL = REGISTRY.register(Counter(
+    'garment_optimizations_total', 'Optimization runs by algorithm and outcome', ('algorithm', 'status')
+))
+ITERATIONS_TOTAL = REGISTRY.register(Counter(
+    'garment_optimizer_iterations_total', 'Optimizer iterations run', ('algorithm',)
+))
+MOVES_TOTAL = REGISTRY.register(Counter(
+    'garment_optimizer_moves_total', 'Candidate worker moves by outcome', ('algorithm', 'outcome')
+))
+STOPS_TOTAL = REGISTRY.register(Counter(
+    'garment_optimizer_stops_total', 'Why optimizer runs ended', ('algorithm', 'reason')
+))
+
+# Per-request stage breakdown, active only while profiling() is open
+_active_profile = contextvars.ContextVar('active_profile', default=None)
+
+
+class Profile:
+    """Stage times collected for one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+
+    def add(self, name, seconds):
+        stage = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+        stage['seconds'] += seconds
+        stage['calls'] += 1
+
+    def to_dict(self):
+        return {
+            'total_seconds': time.perf_counter() - self.started,
+            'stages': {name: dict(stage) for name, stage in self.stages.items()}
+        }
+
+
+@contextmanager
+def profiling():
+    """Collect stage times from this thread into a Profile"""
+    profile = Profile()
+    token = _active_profile.set(profile)
+    try:
+        yield profile
+    finally:
+        _active_profile.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Time a block into garment_stage_seconds and the active profile, if any"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        profile = _active_profile.get()
+        if profile is not None:
+            profile.add(name, elapsed)
+
+
+def record_optimization(algorithm, result):
+    """Count iterations, move outcomes and stop reasons of a finished run"""
+    runs = result.get('chains') or [result]
+    for run in runs:
+        ITERATIONS_TOTAL.inc(run['iterations'], algorithm=algorithm)
+        for outcome in ('accepted', 'rejected', 'infeasible'):
+            if run.get(outcome):
+                MOVES_TOTAL.inc(run[outcome], algorithm=algorithm, outcome=outcome)
+        if run.get('stop_reason'):
+            STOPS_TOTAL.inc(algorithm=algorithm, reason=run['stop_reason'])
@@ -0,0 +1,169 @@
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+
+# Directories save() writes into before publishing them
+STAGING_PREFIX = '.staging-'
+
+
+class CompiledForest:
+    """
+    Array-based inference engine for a fitted RandomForestRegressor.
+
+    All trees are flattened into contiguous node arrays (feature, threshold,
+    left, right, value). Leaves point back at themselves with an infinite
+    threshold, so every row can walk every tree in lockstep for max_depth
+    vectorized steps without branching on leaf checks.
+
+    When a StandardScaler is given it is folded into the split thresholds,
+    so predict() takes raw (unscaled) feature rows. Thresholds also absorb
+    sklearn's float32 cast of the input, so results match rf_model.predict.
+    """
+
+    # Tells the evaluator to skip scaler.transform
+    expects_raw_features = True
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+
+    @classmethod
+    def from_sklearn(cls, rf_model, scaler=None):
+        """Flatten a fitted sklearn forest, folding in an optional StandardScaler"""
+        if getattr(rf_model, 'n_outputs_', 1) != 1 or not hasattr(rf_model, 'estimators_'):
+            raise ValueError("Only fitted single-output RandomForestRegressor models can be compiled")
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        max_depth = 0
+        offset = 0
+
+        for estimator in rf_model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes, dtype=np.int64)
+            is_leaf = tree.children_left < 0
+
+            feature = np.where(is_leaf, 0, tree.feature).astype(np.int64)
+            threshold = np.where(is_leaf, np.inf, tree.threshold).astype(np.float64)
+            left = np.where(is_leaf, node_ids, tree.children_left) + offset
+            right = np.where(is_leaf, node_ids, tree.children_right) + offset
+
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(left)
+            rights.append(right)
+            values.append(tree.value[:, 0, 0].astype(np.float64))
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        feature = np.concatenate(features)
+        threshold = np.concatenate(thresholds)
+
+        # sklearn compares float32(x_scaled) <= t. float32 rounding is
+        # monotone, so that holds exactly when x_scaled is below the midpoint
+        # between the largest float32 <= t and the next float32 up; mapping
+        # the midpoint back through the scaler gives a raw-space threshold.
+        internal = np.isfinite(threshold)
+        t = threshold[internal]
+        t32 = t.astype(np.float32)
+        t32 = np.where(t32 > t, np.nextafter(t32, np.float32(-np.inf)), t32)
+        midpoint = (t32.astype(np.float64) + np.nextafter(t32, np.float32(np.inf)).astype(np.float64)) / 2
+
+        if scaler is not None:
+            # x_scaled < m  <=>  x < m * scale + mean  (scale > 0)
+            n_features = scaler.n_features_in_
+            scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+            mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+            midpoint = midpoint * scale[feature[internal]] + mean[feature[internal]]
+
+        # Strict < becomes <= against the next float64 down
+        threshold[internal] = np.nextafter(midpoint, -np.inf)
+
+        return cls(
+            feature=feature,
+            threshold=threshold,
+            left=np.concatenate(lefts),
+            right=np.concatenate(rights),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth
+        )
+
+    def predict(self, X):
+        """Mean leaf value across trees for each row of X"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+
+        rows = np.arange(X.shape[0])[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], X.shape[0], axis=0)
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+
+        return self.value[nodes].mean(axis=1)
+
+    def save(self, directory, signature=None):
+        """
+        Write the node arrays as .npy files so they can be memory-mapped.
+
+        The files are written to a temporary directory next to `directory`
+        and published with one rename, so readers never see a partial set.
+        An existing `directory` is never rewritten, since other processes
+        may have its files mapped.
+
+        Returns:
+            False if `directory` already existed (e.g. another process
+            published it first), else True
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=STAGING_PREFIX, dir=parent)
+        try:
+            for name in ARRAY_NAMES:
+                np.save(os.path.join(staging, f'{name}.npy'), getattr(self, name))
+            with open(os.path.join(staging, 'meta.json'), 'w') as f:
+                json.dump({'max_depth': self.max_depth, 'signature': signature}, f)
+            os.rename(staging, directory)
+        except OSError:
+            shutil.rmtree(staging, ignore_errors=True)
+            if os.path.isdir(directory):
+                return False
+            raise
+        return True
+
+    @classmethod
+    def load(cls, directory, signature=None, mmap_mode='r'):
+        """
+        Load arrays written by save(), or None if missing or stale.
+
+        With mmap_mode='r' the arrays live in the page cache, so every
+        worker process on the host shares one copy of the forest.
+        """
+        try:
+            with open(os.path.join(directory, 'meta.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if signature is not None and meta.get('signature') != signature:
+            return None
+        try:
+            arrays = {
+                name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+                for name in ARRAY_NAMES
+            }
+        except (OSError, ValueError):
+            return None  # removed as stale by another process meanwhile
+        return cls(max_depth=meta['max_depth'], **arrays)
@@ -1,4 +1,10 @@
-from app.ml.feature_builder import build_team_features
+import numpy as np
+
+from app.ml.feature_builder import (
+    ATTENDANCE_COLUMNS, TARGET_COLUMN, WORKER_COLUMNS, build_team_features, compile_feature_layout, team_matrix
+)
+from app.ml.prediction_cache import prediction_cache
+from app import metrics
 
 def evaluate_system(teams, rf_model, scaler, feature_order, bottleneck_aware=True):
     """
@@ -24,7 +30,10 @@ def evaluate_system(teams, rf_model, scaler, feature_order, bottleneck_aware=Tru
     for team in teams:
         features = build_team_features(team)
         feature_vector = [features[f] for f in feature_order]
-        feature_scaled = scaler.transform([feature_vector])
+        if getattr(rf_model, 'expects_raw_features', False):
+            feature_scaled = [feature_vector]
+        else:
+            feature_scaled = scaler.transform([feature_vector])
         
         # ML model prediction
         predicted_rate = rf_model.predict(feature_scaled)[0]
@@ -62,3 +71,118 @@ def evaluate_system(teams, rf_model, scaler, feature_order, bottleneck_aware=Tru
         'total_target': total_target,
         'team_metrics': team_metrics
     }
+
+
+def predict_rates(teams, rf_model, scaler, feature_order, cache=prediction_cache, feature_buffer=None):
+    """
+    Raw model completion rates for a list of teams, in one model call.
+    
+    Teams already in the prediction cache are not re-predicted; pass
+    cache=None to always hit the model. feature_buffer is an optional
+    FeatureBuffer the feature matrix is built into instead of a new array.
+    """
+    return predict_rates_matrix(team_matrix(teams), rf_model, scaler, feature_order, cache, feature_buffer)
+
+
+def predict_rates_matrix(raw, rf_model, scaler, feature_order, cache=prediction_cache, feature_buffer=None):
+    """predict_rates for an (n_teams x 8) team matrix in TEAM_FIELDS order"""
+    if cache is None:
+        keys = None
+        predicted_rates = [None] * len(raw)
+    else:
+        keys = list(map(tuple, raw.tolist()))
+        predicted_rates = cache.get_many(keys, rf_model, scaler)
+    
+    missing = [idx for idx, rate in enumerate(predicted_rates) if rate is None]
+    if missing:
+        with metrics.stage('build_features'):
+            rows = raw if len(missing) == len(raw) else raw[missing]
+            feature_matrix = compile_feature_layout(feature_order).build(rows, feature_buffer)
+        if getattr(rf_model, 'expects_raw_features', False):
+            # Compiled backend has the scaler folded into its thresholds
+            feature_scaled = feature_matrix
+        else:
+            with metrics.stage('scale'):
+                feature_scaled = scaler.transform(feature_matrix)
+        with metrics.stage('predict'):
+            new_rates = rf_model.predict(feature_scaled)
+        
+        for idx, rate in zip(missing, new_rates):
+            predicted_rates[idx] = rate
+        if cache is not None:
+            cache.put_many([keys[idx] for idx in missing], new_rates, rf_model, scaler)
+    
+    return np.asarray(predicted_rates, dtype=float)
+
+
+def team_outputs(raw, rf_model, scaler, feature_order, bottleneck_aware=True, cache=prediction_cache,
+                 feature_buffer=None):
+    """
+    Effective completion rates and predicted outputs for a team matrix.
+    
+    Args:
+        raw: (n_teams x 8) integer team matrix in TEAM_FIELDS order
+        (other arguments as for evaluate_system_batch)
+    
+    Returns:
+        (effective_rates, predicted_outputs) float arrays of length n_teams
+    """
+    # ML model prediction for the whole plant
+    predicted_rates = predict_rates_matrix(raw, rf_model, scaler, feature_order, cache, feature_buffer)
+    
+    if bottleneck_aware:
+        # Bottleneck is the department with the lowest attendance ratio
+        bottleneck_factors = (raw[:, ATTENDANCE_COLUMNS] / raw[:, WORKER_COLUMNS]).min(axis=1)
+        effective_rates = predicted_rates * (0.3 + 0.7 * bottleneck_factors)
+    else:
+        effective_rates = predicted_rates
+    
+    return effective_rates, effective_rates * raw[:, TARGET_COLUMN]
+
+
+def performance_summary(effective_rates, predicted_outputs, targets):
+    """evaluate_system_batch's result dict from per-team arrays"""
+    team_metrics = [
+        {'completion_rate': rate, 'output': output, 'target': target}
+        for rate, output, target in zip(effective_rates.tolist(), predicted_outputs.tolist(), targets)
+    ]
+    
+    total_predicted_output = float(predicted_outputs.sum())
+    total_target = sum(targets)
+    total_completion_rate = total_predicted_output / total_target
+    
+    return {
+        'total_completion_rate': total_completion_rate,
+        'total_output': total_predicted_output,
+        'total_target': total_target,
+        'team_metrics': team_metrics
+    }
+
+
+def evaluate_system_batch(teams, rf_model, scaler, feature_order, bottleneck_aware=True, cache=prediction_cache,
+                          feature_buffer=None):
+    """
+    Evaluate total system performance with a single model call.
+    
+    Same result as evaluate_system, but all teams are stacked into one
+    (n_teams x n_features) matrix that is scaled and predicted once, and the
+    bottleneck penalty is applied as array math.
+    
+    Args:
+        teams: list of team dicts, or an (n_teams x 8) team matrix in
+            TEAM_FIELDS order
+        rf_model: loaded RandomForest model
+        scaler: loaded StandardScaler
+        feature_order: list of feature names
+        bottleneck_aware: if True, apply bottleneck penalty
+        cache: PredictionCache to consult before the model (None disables)
+        feature_buffer: optional reusable FeatureBuffer for the feature matrix
+    
+    Returns:
+        dict with total_completion_rate, total_output, and team_metrics
+    """
+    raw = teams if isinstance(teams, np.ndarray) else team_matrix(teams)
+    effective_rates, predicted_outputs = team_outputs(
+        raw, rf_model, scaler, feature_order, bottleneck_aware, cache, feature_buffer
+    )
+    return performance_summary(effective_rates, predicted_outputs, raw[:, TARGET_COLUMN].tolist())
@@ -1,3 +1,27 @@
+import numpy as np
+
+# Raw team fields, in the order used for cache keys and team arrays
+TEAM_FIELDS = [
+    'total_workers',
+    'cutting_workers',
+    'sewing_workers',
+    'finishing_workers',
+    'cutting_attendance',
+    'sewing_attendance',
+    'finishing_attendance',
+    'daily_target'
+]
+
+DEPARTMENTS = ['cutting', 'sewing', 'finishing']
+
+# Team matrix columns per department, in DEPARTMENTS order
+WORKER_COLUMNS = [1, 2, 3]
+ATTENDANCE_COLUMNS = [4, 5, 6]
+TARGET_COLUMN = 7
+
+# Team matrices are int32 during optimization, so larger values are rejected
+MAX_TEAM_VALUE = int(np.iinfo(np.int32).max)
+
 def build_team_features(team_data):
     """
     Build ML features from team data.
@@ -38,3 +62,146 @@ def build_team_features(team_data):
     features['finishing_capacity_pressure'] = team_data['daily_target'] / (team_data['finishing_attendance'] + 1)
     
     return features
+
+
+def team_key(team_data):
+    """Hashable tuple of the raw team fields"""
+    return tuple(int(team_data[f]) for f in TEAM_FIELDS)
+
+
+# Engineered features as (numerator fields, denominator field, offset):
+# value = sum(numerator fields) / (denominator field + offset)
+ENGINEERED_FEATURES = {
+    'attendance_ratio_cutting': (('cutting_attendance',), 'cutting_workers', 0),
+    'attendance_ratio_sewing': (('sewing_attendance',), 'sewing_workers', 0),
+    'attendance_ratio_finishing': (('finishing_attendance',), 'finishing_workers', 0),
+    'overall_attendance_ratio': (
+        ('cutting_attendance', 'sewing_attendance', 'finishing_attendance'), 'total_workers', 0
+    ),
+    'cutting_worker_ratio': (('cutting_workers',), 'total_workers', 0),
+    'sewing_worker_ratio': (('sewing_workers',), 'total_workers', 0),
+    'finishing_worker_ratio': (('finishing_workers',), 'total_workers', 0),
+    'target_per_worker': (('daily_target',), 'total_workers', 0),
+    'cutting_capacity_pressure': (('daily_target',), 'cutting_attendance', 1),
+    'sewing_capacity_pressure': (('daily_target',), 'sewing_attendance', 1),
+    'finishing_capacity_pressure': (('daily_target',), 'finishing_attendance', 1)
+}
+
+
+def team_matrix(teams):
+    """(n_teams x 8) int64 array of the raw team fields, in TEAM_FIELDS order"""
+    return np.array([[team[f] for f in TEAM_FIELDS] for team in teams], dtype=np.int64).reshape(-1, len(TEAM_FIELDS))
+
+
+def team_matrix_from_columns(columns):
+    """
+    (n_teams x 8) int64 team matrix from parallel per-field lists.
+
+    Args:
+        columns: dict of TEAM_FIELDS name -> list of ints, all the same length
+
+    Raises:
+        ValueError: if the lists differ in length or a value does not fit
+            int64 (values above MAX_TEAM_VALUE are left to validate_team_matrix)
+    """
+    lengths = {len(columns[f]) for f in TEAM_FIELDS}
+    if len(lengths) > 1:
+        raise ValueError("All team columns must have the same length")
+    matrix = np.empty((lengths.pop(), len(TEAM_FIELDS)), dtype=np.int64)
+    try:
+        for col, field in enumerate(TEAM_FIELDS):
+            matrix[:, col] = columns[field]
+    except OverflowError:
+        raise ValueError(f"Team values must be at most {MAX_TEAM_VALUE}")
+    return matrix
+
+
+def teams_from_matrix(matrix):
+    """Team dicts (plain ints) from a team matrix"""
+    return [dict(zip(TEAM_FIELDS, row)) for row in matrix.tolist()]
+
+
+class FeatureBuffer:
+    """Preallocated output and scratch matrices for FeatureLayout.build"""
+
+    def __init__(self, rows, n_features):
+        self.features = np.empty((rows, n_features))
+        self.denominators = np.empty((rows, n_features))
+
+
+class FeatureLayout:
+    """
+    Feature matrix builder compiled from a feature_order.
+
+    Every feature is written as (team matrix @ numerators) / (team matrix @
+    denominators + offsets), with raw fields dividing by 1, so building a
+    whole (n_teams x n_features) matrix takes a few array operations and no
+    per-team dicts. Sums of integer fields are exact in float64, so values
+    match build_team_features bit for bit.
+    """
+
+    def __init__(self, feature_order):
+        self.feature_order = list(feature_order)
+        n_features = len(self.feature_order)
+        self.numerators = np.zeros((len(TEAM_FIELDS), n_features))
+        self.denominators = np.zeros((len(TEAM_FIELDS), n_features))
+        self.offsets = np.zeros(n_features)
+
+        for col, name in enumerate(self.feature_order):
+            if name in TEAM_FIELDS:
+                self.numerators[TEAM_FIELDS.index(name), col] = 1
+                self.offsets[col] = 1
+            elif name in ENGINEERED_FEATURES:
+                numerator_fields, denominator_field, offset = ENGINEERED_FEATURES[name]
+                for field in numerator_fields:
+                    self.numerators[TEAM_FIELDS.index(field), col] = 1
+                self.denominators[TEAM_FIELDS.index(denominator_field), col] = 1
+                self.offsets[col] = offset
+            else:
+                raise ValueError(f"Unknown feature in feature_order: {name}")
+
+    @property
+    def n_features(self):
+        return len(self.feature_order)
+
+    def allocate(self, rows):
+        """Buffer for building up to `rows` teams at a time"""
+        return FeatureBuffer(rows, self.n_features)
+
+    def build(self, teams, buffer=None):
+        """
+        Feature matrix for a team matrix (see team_matrix).
+
+        Args:
+            teams: (n_teams x 8) integer array in TEAM_FIELDS order
+            buffer: optional FeatureBuffer with at least n_teams rows; the
+                result is then a view into it, valid until the next build
+
+        Returns:
+            (n_teams x n_features) float64 array in feature_order
+        """
+        n = len(teams)
+        if buffer is None:
+            buffer = self.allocate(n)
+        elif len(buffer.features) < n:
+            raise ValueError(f"Feature buffer holds {len(buffer.features)} rows, {n} needed")
+
+        features = buffer.features[:n]
+        denominators = buffer.denominators[:n]
+        np.matmul(teams, self.denominators, out=denominators)
+        denominators += self.offsets
+        np.matmul(teams, self.numerators, out=features)
+        np.divide(features, denominators, out=features)
+        return features
+
+
+_layouts = {}
+
+
+def compile_feature_layout(feature_order):
+    """FeatureLayout for feature_order, compiled once per distinct order"""
+    key = tuple(feature_order)
+    layout = _layouts.get(key)
+    if layout is None:
+        layout = _layouts[key] = FeatureLayout(key)
+    return layout
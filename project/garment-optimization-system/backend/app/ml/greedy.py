@@ -0,0 +1,187 @@
+import heapq
+import time
+
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.feature_builder import DEPARTMENTS, compile_feature_layout
+
+
+def _variants(team):
+    """The team itself, then one more / one fewer attended worker per department"""
+    rows = [team]
+    for dept in DEPARTMENTS:
+        for step in (1, -1):
+            variant = dict(team)
+            variant[f'{dept}_attendance'] += step
+            rows.append(variant)
+    return rows
+
+
+def _score_teams(teams, team_indices, rf_model, scaler, feature_order, bottleneck_aware, feature_buffer=None):
+    """
+    Output now, and marginal add gain / remove loss per department, for
+    each listed team - all in one model call.
+    """
+    rows = []
+    for idx in team_indices:
+        rows.extend(_variants(teams[idx]))
+
+    # Out-of-range variants are scored too (they are valid inputs for the
+    # model) but never make it into the heaps
+    outputs = [m['output'] for m in evaluate_system_batch(
+        rows, rf_model, scaler, feature_order, bottleneck_aware, feature_buffer=feature_buffer
+    )['team_metrics']]
+
+    scores = {}
+    for pos, idx in enumerate(team_indices):
+        base = outputs[pos * 7]
+        per_dept = {}
+        for d, dept in enumerate(DEPARTMENTS):
+            per_dept[dept] = (
+                outputs[pos * 7 + 1 + 2 * d] - base,  # gain from one more worker
+                base - outputs[pos * 7 + 2 + 2 * d]   # loss from one fewer worker
+            )
+        scores[idx] = (base, per_dept)
+    return scores
+
+
+def _push(heaps, versions, teams, idx, per_dept):
+    team = teams[idx]
+    for dept in DEPARTMENTS:
+        gain, loss = per_dept[dept]
+        if team[f'{dept}_attendance'] < team[f'{dept}_workers']:
+            heapq.heappush(heaps[dept]['add'], (-gain, idx, versions[idx]))
+        if team[f'{dept}_attendance'] > 1:
+            heapq.heappush(heaps[dept]['remove'], (loss, idx, versions[idx]))
+
+
+def _top_two(heap, versions):
+    """Best two current entries of a lazily-invalidated heap"""
+    top = []
+    while heap and len(top) < 2:
+        entry = heapq.heappop(heap)
+        if entry[2] == versions[entry[1]]:
+            top.append(entry)
+    for entry in top:
+        heapq.heappush(heap, entry)
+    return top
+
+
+def _best_transfer(heaps, versions):
+    """(net_gain, dept, donor, receiver) of the best single-worker move"""
+    best = None
+    for dept in DEPARTMENTS:
+        adds = _top_two(heaps[dept]['add'], versions)
+        removes = _top_two(heaps[dept]['remove'], versions)
+        for neg_gain, receiver, _ in adds:
+            for loss, donor, _ in removes:
+                if donor == receiver:
+                    continue
+                net = -neg_gain - loss
+                if best is None or net > best[0]:
+                    best = (net, dept, donor, receiver)
+                break
+    return best
+
+
+def optimize_greedy(
+    teams,
+    rf_model,
+    scaler,
+    feature_order,
+    max_iterations=10000,
+    bottleneck_aware=True,
+    min_gain=1e-9,
+    progress_callback=None,
+    should_stop=None,
+    deadline=None,
+    target_score=None
+):
+    """
+    Deterministic steepest-ascent worker allocation.
+
+    For every team and department the output gained by one more attended
+    worker and lost by one fewer is kept in per-department heaps. Each step
+    moves one worker from the cheapest donor to the best receiver in the
+    department with the largest net gain, then re-scores only those two
+    teams. Stops when no move gains more than min_gain, at deadline (a
+    time.monotonic() value) or once target_score is reached; every step
+    improves, so the current allocation is always the best so far.
+
+    Same migration rules and result structure as optimize_worker_allocation.
+    """
+    initial_performance = evaluate_system_batch(teams, rf_model, scaler, feature_order, bottleneck_aware)
+    total_target = initial_performance['total_target']
+
+    current_teams = [dict(team) for team in teams]
+    versions = [0] * len(current_teams)
+    heaps = {dept: {'add': [], 'remove': []} for dept in DEPARTMENTS}
+
+    scores = _score_teams(current_teams, list(range(len(current_teams))),
+                          rf_model, scaler, feature_order, bottleneck_aware)
+    outputs = [scores[idx][0] for idx in range(len(current_teams))]
+    current_output = sum(outputs)
+    for idx, (_, per_dept) in scores.items():
+        _push(heaps, versions, current_teams, idx, per_dept)
+    model_calls = 1
+
+    migration_log = {'cutting': 0, 'sewing': 0, 'finishing': 0}
+    iterations = 0
+
+    # Each step re-scores the 7 variants of the donor and the receiver
+    feature_buffer = compile_feature_layout(feature_order).allocate(14)
+    stop_reason = 'max_iterations'
+
+    while iterations < max_iterations:
+        if should_stop is not None and should_stop():
+            stop_reason = 'cancelled'
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            stop_reason = 'time_budget'
+            break
+        if target_score is not None and current_output / total_target >= target_score:
+            stop_reason = 'target_reached'
+            break
+
+        best = _best_transfer(heaps, versions)
+        if best is None or best[0] <= min_gain:
+            stop_reason = 'converged'
+            break
+        _, dept, donor, receiver = best
+
+        current_teams[donor][f'{dept}_attendance'] -= 1
+        current_teams[receiver][f'{dept}_attendance'] += 1
+        migration_log[dept] += 1
+        iterations += 1
+
+        # Only the two touched teams need new scores
+        scores = _score_teams(current_teams, [donor, receiver],
+                              rf_model, scaler, feature_order, bottleneck_aware, feature_buffer)
+        model_calls += 1
+        for idx, (output, per_dept) in scores.items():
+            current_output += output - outputs[idx]
+            outputs[idx] = output
+            versions[idx] += 1
+            _push(heaps, versions, current_teams, idx, per_dept)
+
+        if progress_callback and iterations % 5 == 0:
+            progress_callback(iterations, sum(outputs) / total_target)
+
+    best_performance = evaluate_system_batch(current_teams, rf_model, scaler, feature_order, bottleneck_aware)
+    gain = best_performance['total_output'] - initial_performance['total_output']
+    improvement_pct = ((best_performance['total_completion_rate'] /
+                       initial_performance['total_completion_rate']) - 1) * 100
+
+    return {
+        'optimized_teams': current_teams,
+        'best_performance': best_performance,
+        'initial_performance': initial_performance,
+        'gain': gain,
+        'improvement_pct': improvement_pct,
+        'iterations': iterations,
+        'migrations': iterations,
+        'accepted_worse': 0,
+        'accepted': iterations,
+        'stop_reason': stop_reason,
+        'migration_log': migration_log,
+        'model_calls': model_calls
+    }
@@ -1,31 +1,264 @@
+import hashlib
 import joblib
+import json
 import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from app.ml.compiled_forest import STAGING_PREFIX, CompiledForest
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.feature_builder import compile_feature_layout
+from app.ml.prediction_cache import prediction_cache
+
+INFERENCE_BACKENDS = ('sklearn', 'compiled')
+
+# Version name of the flat artifacts/ directory (no versions/ subdirectory)
+DEFAULT_VERSION = 'default'
+
+# Representative team used for the warm-up prediction
+WARMUP_TEAM = {
+    'total_workers': 30,
+    'cutting_workers': 10,
+    'sewing_workers': 15,
+    'finishing_workers': 5,
+    'cutting_attendance': 9,
+    'sewing_attendance': 14,
+    'finishing_attendance': 4,
+    'daily_target': 800
+}
+
+class ModelHandle:
+    """
+    One loaded model version. Never mutated after construction, so a
+    request that grabbed a handle keeps a consistent model even if the
+    loader swaps in a new version meanwhile.
+    """
+
+    def __init__(self, version, rf_model, scaler, feature_order, sklearn_model=None,
+                 inference_backend='sklearn', timings=None):
+        self.version = version
+        self.rf_model = rf_model
+        self.scaler = scaler
+        self.feature_order = feature_order
+        self.feature_layout = compile_feature_layout(feature_order)
+        self.sklearn_model = sklearn_model
+        self.inference_backend = inference_backend
+        self.timings = dict(timings or {})
 
 class ModelLoader:
-    def __init__(self):
-        self.rf_model = None
-        self.scaler = None
-        self.feature_order = None
+    """
+    Model registry over versioned artifact directories.
+
+    Versions live in artifacts/versions/<version>/ (rf_completion_model.pkl,
+    scaler.pkl, feature_order.pkl). The version named in artifacts/CURRENT,
+    else the last one in sort order, is loaded by default; without a
+    versions/ directory (or with an empty one) the flat artifacts/ directory
+    is used as 'default'.
+    reload() validates and warms up a bundle before swapping `current`.
+    """
+
+    def __init__(self, inference_backend=None, mmap_mode=None):
+        # 'sklearn' predicts with the fitted forest as-is; 'compiled' flattens
+        # it into NumPy node arrays with the scaler folded into the thresholds
+        self.inference_backend = inference_backend or os.environ.get('INFERENCE_BACKEND', 'sklearn')
+        if self.inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend: {self.inference_backend}")
+
+        # Memory-map artifact arrays so worker processes share them through
+        # the page cache ('' or 'none' loads private copies)
+        mmap_mode = mmap_mode if mmap_mode is not None else os.environ.get('MODEL_MMAP_MODE', 'r')
+        self.mmap_mode = None if mmap_mode in ('', 'none') else mmap_mode
+
+        self.current = None
+        self.last_reload = None
+        self._reload_lock = threading.Lock()
         self.artifacts_path = os.path.join(os.path.dirname(__file__), '..', '..', 'artifacts')
-    
-    def load_artifacts(self):
+
+    # The current version's artifacts, for callers that do not hold a handle
+    @property
+    def rf_model(self):
+        return self.current.rf_model if self.current else None
+
+    @property
+    def scaler(self):
+        return self.current.scaler if self.current else None
+
+    @property
+    def feature_order(self):
+        return self.current.feature_order if self.current else None
+
+    @property
+    def sklearn_model(self):
+        return self.current.sklearn_model if self.current else None
+
+    @property
+    def timings(self):
+        return self.current.timings if self.current else {}
+
+    def _versions(self):
+        versions_path = os.path.join(self.artifacts_path, 'versions')
+        if not os.path.isdir(versions_path):
+            return []
+        return sorted(
+            name for name in os.listdir(versions_path)
+            if os.path.isdir(os.path.join(versions_path, name))
+        )
+
+    def available_versions(self):
+        # No versions/ directory, or an empty one: the flat layout
+        return self._versions() or [DEFAULT_VERSION]
+
+    def default_version(self):
+        try:
+            with open(os.path.join(self.artifacts_path, 'CURRENT')) as f:
+                return f.read().strip()
+        except OSError:
+            return self.available_versions()[-1]
+
+    def version_path(self, version):
+        if version == DEFAULT_VERSION and not self._versions():
+            return self.artifacts_path
+        if version not in self.available_versions():
+            raise ValueError(f"Unknown model version: {version}")
+        return os.path.join(self.artifacts_path, 'versions', version)
+
+    def _signature(self, path):
+        """Identifies the pickles a compiled forest was built from"""
+        signature = []
+        for name in ('rf_completion_model.pkl', 'scaler.pkl'):
+            stat = os.stat(os.path.join(path, name))
+            signature.append([name, stat.st_size, stat.st_mtime_ns])
+        return signature
+
+    def _load_compiled(self, path, scaler):
+        """
+        Compiled forest from <version>/compiled/<signature digest>/,
+        rebuilding it from the pickle when missing. A fresh cache skips
+        unpickling the sklearn forest entirely.
+
+        Each pickle signature gets its own directory, so a rebuild never
+        rewrites files that other workers or older handles have mapped.
+
+        Returns:
+            (compiled forest, sklearn forest or None)
+        """
+        signature = self._signature(path)
+        compiled_root = os.path.join(path, 'compiled')
+        digest = hashlib.sha256(json.dumps(signature).encode()).hexdigest()[:16]
+        compiled_path = os.path.join(compiled_root, digest)
+
+        compiled = CompiledForest.load(compiled_path, signature, mmap_mode=self.mmap_mode)
+        if compiled is not None:
+            return compiled, None
+
+        sklearn_model = joblib.load(os.path.join(path, 'rf_completion_model.pkl'), mmap_mode=self.mmap_mode)
+        compiled = CompiledForest.from_sklearn(sklearn_model, scaler)
+        try:
+            compiled.save(compiled_path, signature)
+            compiled = CompiledForest.load(compiled_path, signature, mmap_mode=self.mmap_mode) or compiled
+        except OSError:
+            pass  # read-only artifacts: keep the in-memory arrays
+        else:
+            self._prune_compiled(compiled_root, keep=digest)
+        return compiled, sklearn_model
+
+    def _prune_compiled(self, compiled_root, keep):
+        """
+        Remove caches built from older pickles. Unlinking leaves existing
+        mappings intact, so handles still using them keep working.
+        """
+        for name in os.listdir(compiled_root):
+            if name == keep or name.startswith(STAGING_PREFIX):
+                continue
+            entry = os.path.join(compiled_root, name)
+            if os.path.isdir(entry):
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                try:
+                    os.remove(entry)  # flat layout of earlier releases
+                except OSError:
+                    pass
+
+    def load_bundle(self, version=None):
+        """Load, validate and warm up one version without making it current"""
+        version = version or self.default_version()
+        path = self.version_path(version)
+        timings = {}
+
+        start = time.perf_counter()
+        scaler = joblib.load(os.path.join(path, 'scaler.pkl'))
+        feature_order = list(joblib.load(os.path.join(path, 'feature_order.pkl')))
+
+        if self.inference_backend == 'compiled':
+            rf_model, sklearn_model = self._load_compiled(path, scaler)
+        else:
+            # sklearn copies tree nodes into its own buffers, so mmap
+            # only avoids a second transient copy while unpickling
+            sklearn_model = joblib.load(os.path.join(path, 'rf_completion_model.pkl'), mmap_mode=self.mmap_mode)
+            rf_model = sklearn_model
+        timings['load_seconds'] = time.perf_counter() - start
+
+        # Validate the bundle fits together
+        if len(feature_order) != getattr(scaler, 'n_features_in_', len(feature_order)):
+            raise ValueError(
+                f"feature_order has {len(feature_order)} features, scaler expects {scaler.n_features_in_}"
+            )
+        if sklearn_model is not None and getattr(sklearn_model, 'n_features_in_', len(feature_order)) != len(feature_order):
+            raise ValueError(
+                f"Model expects {sklearn_model.n_features_in_} features, feature_order has {len(feature_order)}"
+            )
+        compile_feature_layout(feature_order)  # column plan; rejects unknown feature names
+
+        # Warm-up prediction, which also checks the model produces a usable rate
+        start = time.perf_counter()
+        warmup = evaluate_system_batch([WARMUP_TEAM], rf_model, scaler, feature_order, cache=None)
+        timings['warmup_seconds'] = time.perf_counter() - start
+        if not np.isfinite(warmup['total_completion_rate']):
+            raise ValueError("Warm-up prediction is not finite")
+
+        prediction_cache.register(rf_model, scaler, version)
+        return ModelHandle(version, rf_model, scaler, feature_order, sklearn_model,
+                           self.inference_backend, timings)
+
+    def load_artifacts(self, version=None):
         """Load ML artifacts once at startup"""
         try:
-            self.rf_model = joblib.load(os.path.join(self.artifacts_path, 'rf_completion_model.pkl'))
-            self.scaler = joblib.load(os.path.join(self.artifacts_path, 'scaler.pkl'))
-            self.feature_order = joblib.load(os.path.join(self.artifacts_path, 'feature_order.pkl'))
-            
-            print(f"✓ Loaded Random Forest model")
+            self.current = self.load_bundle(version)
+
+            print(f"✓ Loaded Random Forest model {self.current.version} ({self.inference_backend} backend)")
             print(f"✓ Loaded StandardScaler")
-            print(f"✓ Loaded feature order ({len(self.feature_order)} features)")
-            
+            print(f"✓ Loaded feature order ({len(self.current.feature_order)} features)")
+            print(f"✓ Warm-up prediction in {self.current.timings['warmup_seconds'] * 1000:.1f} ms")
+
         except Exception as e:
             raise RuntimeError(f"Failed to load ML artifacts: {str(e)}")
-    
+
+    def reload(self, version=None):
+        """
+        Load a version and swap it in atomically. On failure the current
+        model stays in place and the error is recorded in last_reload.
+        """
+        with self._reload_lock:
+            started_at = time.time()
+            try:
+                handle = self.load_bundle(version)
+            except Exception as e:
+                self.last_reload = {'status': 'failed', 'version': version, 'error': str(e),
+                                    'started_at': started_at, 'finished_at': time.time()}
+                raise
+            previous = self.current.version if self.current else None
+            self.current = handle
+            self.last_reload = {'status': 'completed', 'version': handle.version, 'previous_version': previous,
+                                'started_at': started_at, 'finished_at': time.time()}
+            print(f"✓ Swapped model {previous} -> {handle.version}")
+            return handle
+
+    def is_reloading(self):
+        return self._reload_lock.locked()
+
     def is_loaded(self):
         """Check if all artifacts are loaded"""
-        return all([
-            self.rf_model is not None,
-            self.scaler is not None,
-            self.feature_order is not None
-        ])
+        return self.current is not None
@@ -0,0 +1,289 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import secrets
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from app import metrics
+from app.ml.optimizer import optimize_worker_allocation
+
+# Chains of one request that can run in the pool; restarts beyond this run
+# one after another in the calling thread
+MAX_POOL_CHAINS = 64
+
+# Requests that can have chains in the pool at once, each with a slot of
+# shared memory: its stop flag, then (iteration, best score) per chain
+REQUEST_SLOTS = 64
+SLOT_WIDTH = 1 + 2 * MAX_POOL_CHAINS
+
+# Seconds between stop / progress checks while chains run
+POLL_INTERVAL = 0.05
+
+# Forests each worker keeps, most recently used last
+WORKER_MODELS = 2
+
+# Worker state, set by _init_worker: the shared slots and cached forests
+_worker = {}
+
+
+def _init_worker(slots):
+    """Pool initializer: forests arrive with the first chain that needs them"""
+    _worker.update(slots=slots, models=OrderedDict())
+
+
+def _run_chain(teams, seed, model_key, rf_model, scaler, feature_order, slot, chain, optimizer_kwargs):
+    """
+    One annealing chain in a pool worker; returns (result, metrics snapshot),
+    or None when the worker does not have the forest model_key and rf_model
+    was not sent (the caller then resubmits with it)
+    """
+    models = _worker['models']
+    if rf_model is not None:
+        models[model_key] = rf_model
+        while len(models) > WORKER_MODELS:
+            models.popitem(last=False)
+    elif model_key not in models:
+        return None
+    models.move_to_end(model_key)
+
+    slots = _worker['slots']
+    base = slot * SLOT_WIDTH
+
+    def report(iteration, best_score):
+        slots[base + 2 + 2 * chain] = best_score
+        slots[base + 1 + 2 * chain] = iteration
+
+    result = optimize_worker_allocation(
+        teams, models[model_key], scaler, feature_order, seed=seed, progress_callback=report,
+        should_stop=lambda: slots[base] != 0, **optimizer_kwargs
+    )
+    return result, metrics.REGISTRY.drain()
+
+
+class ChainPool:
+    """
+    Long-lived worker processes shared by every multi-start request, so the
+    number of chain processes stays at size however many requests run.
+
+    Workers are started with spawn (the server process has threads, whose
+    locks fork would copy mid-state) and keep the last WORKER_MODELS forests
+    they were sent. Each running request holds a slot of shared memory its
+    chains check for the stop flag and report progress into.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        context = multiprocessing.get_context('spawn')
+        self._slots = context.RawArray('d', REQUEST_SLOTS * SLOT_WIDTH)
+        self._free_slots = queue.Queue()
+        for slot in range(REQUEST_SLOTS):
+            self._free_slots.put(slot)
+        self._executor = ProcessPoolExecutor(
+            max_workers=size, mp_context=context, initializer=_init_worker, initargs=(self._slots,)
+        )
+        self._model_keys = weakref.WeakKeyDictionary()
+        self._next_key = itertools.count()
+        self._lock = threading.Lock()
+
+    def _model_key(self, rf_model):
+        with self._lock:
+            key = self._model_keys.get(rf_model)
+            if key is None:
+                key = self._model_keys[rf_model] = next(self._next_key)
+            return key
+
+    def run(self, teams, seeds, rf_model, scaler, feature_order, progress_callback, should_stop, optimizer_kwargs):
+        """Run one chain per seed; returns their results in seed order (None for chains stopped before starting)"""
+        model_key = self._model_key(rf_model)
+        slot = self._free_slots.get()
+        base = slot * SLOT_WIDTH
+        self._slots[base:base + SLOT_WIDTH] = [0.0] * SLOT_WIDTH
+        try:
+            return self._run(teams, seeds, model_key, rf_model, scaler, feature_order, slot, progress_callback,
+                             should_stop, optimizer_kwargs)
+        finally:
+            # Stop anything still running before the slot is reused
+            self._slots[base] = 1
+            self._free_slots.put(slot)
+
+    def _run(self, teams, seeds, model_key, rf_model, scaler, feature_order, slot, progress_callback, should_stop,
+             optimizer_kwargs):
+        base = slot * SLOT_WIDTH
+
+        def submit(chain, with_model):
+            return self._executor.submit(
+                _run_chain, teams, seeds[chain], model_key, rf_model if with_model else None, scaler, feature_order,
+                slot, chain, optimizer_kwargs
+            )
+
+        results = [None] * len(seeds)
+        pending = {submit(chain, False): chain for chain in range(len(seeds))}
+        reported = None
+        while pending:
+            done, _ = wait(pending, timeout=POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                chain = pending.pop(future)
+                if future.cancelled():
+                    continue
+                outcome = future.result()
+                if outcome is None:
+                    pending[submit(chain, True)] = chain
+                    continue
+                results[chain], snapshot = outcome
+                metrics.REGISTRY.merge(snapshot)
+
+            if should_stop is not None and should_stop() and not self._slots[base]:
+                # Running chains stop at their next iteration; queued ones never start
+                self._slots[base] = 1
+                for future in pending:
+                    future.cancel()
+            if progress_callback:
+                cells = self._slots[base + 1:base + 1 + 2 * len(seeds)]
+                progress = (max(cells[0::2]), max(cells[1::2]))
+                if progress != reported and progress[0] > 0:
+                    reported = progress
+                    progress_callback(int(progress[0]), progress[1])
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def chain_pool():
+    """The process-wide ChainPool, started on first use (CHAIN_WORKERS processes, default the CPU count)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ChainPool(int(os.environ.get('CHAIN_WORKERS', os.cpu_count() or 1)))
+        return _pool
+
+
+def shutdown_chain_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def _reset_broken_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def chain_seeds(seed, restarts):
+    """
+    Distinct, reproducible per-chain seeds derived from one request seed.
+
+    A None seed is replaced by a fresh random one, which is returned so the
+    run can be replayed later.
+    """
+    if seed is None:
+        seed = secrets.randbits(32)
+    seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(seed).spawn(restarts)]
+    return seed, seeds
+
+
+def optimize_multi_start(
+    teams,
+    rf_model,
+    scaler,
+    feature_order,
+    restarts=1,
+    seed=None,
+    max_workers=None,
+    progress_callback=None,
+    should_stop=None,
+    deadline=None,
+    **optimizer_kwargs
+):
+    """
+    Run independent simulated annealing chains and keep the best one.
+
+    With more than one restart the chains run in the shared ChainPool; each
+    worker receives a forest once and keeps it for later chains.
+
+    Args:
+        teams: list of team configurations
+        rf_model: loaded RandomForest model
+        scaler: loaded StandardScaler
+        feature_order: list of feature names
+        restarts: number of independent chains
+        seed: request seed the chain seeds are derived from
+        max_workers: 1 runs the chains one after another in this thread;
+            otherwise they run in the ChainPool (default: if restarts > 1)
+        progress_callback: optional function(iteration, best_score); for
+            pool chains the furthest iteration and best score of any chain,
+            every POLL_INTERVAL
+        should_stop: optional function() -> bool; stops running chains at
+            their next iteration and cancels those not started yet
+        deadline: optional time.monotonic() value all chains stop at; chains
+            run one after another split the remaining time between them
+        **optimizer_kwargs: passed through to optimize_worker_allocation
+
+    Returns:
+        result of the best chain, plus 'seed' and per-chain 'chains' stats
+    """
+    seed, seeds = chain_seeds(seed, restarts)
+    max_workers = min(restarts, max_workers or os.cpu_count() or 1)
+
+    results = [None] * restarts
+    if max_workers <= 1 or restarts > MAX_POOL_CHAINS:
+        for idx, chain_seed in enumerate(seeds):
+            chain_deadline = deadline
+            if deadline is not None:
+                now = time.monotonic()
+                chain_deadline = now + max(deadline - now, 0) / (restarts - idx)
+            results[idx] = optimize_worker_allocation(
+                teams, rf_model, scaler, feature_order,
+                seed=chain_seed, progress_callback=progress_callback,
+                should_stop=should_stop, deadline=chain_deadline, **optimizer_kwargs
+            )
+            if should_stop is not None and should_stop():
+                break
+    else:
+        pool = chain_pool()
+        try:
+            results = pool.run(teams, seeds, rf_model, scaler, feature_order, progress_callback, should_stop,
+                               {**optimizer_kwargs, 'deadline': deadline})
+        except BrokenProcessPool:
+            # A worker died; the next request starts a fresh pool
+            _reset_broken_pool(pool)
+            raise RuntimeError("Optimization worker process crashed")
+
+    # Chains cancelled before they started have no result
+    finished = [idx for idx, result in enumerate(results) if result is not None]
+    chains = [
+        {
+            'seed': seeds[idx],
+            'best_score': results[idx]['best_performance']['total_completion_rate'],
+            'iterations': results[idx]['iterations'],
+            'accepted_worse': results[idx]['accepted_worse'],
+            'accepted': results[idx]['accepted'],
+            'rejected': results[idx]['rejected'],
+            'infeasible': results[idx]['infeasible'],
+            'stop_reason': results[idx]['stop_reason']
+        }
+        for idx in finished
+    ]
+
+    # Ties go to the lowest chain index so the pick is reproducible
+    best_pos = max(range(len(finished)), key=lambda pos: (chains[pos]['best_score'], -pos))
+    best = dict(results[finished[best_pos]])
+    best['seed'] = seed
+    best['chains'] = chains
+    return best
@@ -1,7 +1,53 @@
+import time
+
 import numpy as np
-import copy
 
-from app.ml.evaluator import evaluate_system
+from app.ml.evaluator import performance_summary, team_outputs
+from app.ml.feature_builder import (
+    DEPARTMENTS, TARGET_COLUMN, compile_feature_layout, team_matrix, teams_from_matrix
+)
+
+# With a deadline the loop stops this many initial per-team summaries early:
+# building the result repeats the summary and builds the team dicts (4-5x)
+RESULT_BUILD_FACTOR = 6
+
+def _sample_feasible_moves(attendance, capacity, k, rng):
+    """
+    Draw k (dept, team_from, team_to) moves that respect the migration rules.
+    
+    attendance and capacity are (n_teams x 3) arrays with one column per
+    department; dept in the returned moves is that column index. Donors
+    have attendance > 1 and receivers have room below capacity, so no draw
+    is wasted on an infeasible pair.
+    """
+    pools = {}
+    for dept in range(len(DEPARTMENTS)):
+        donors = np.flatnonzero(attendance[:, dept] > 1)
+        receivers = np.flatnonzero(attendance[:, dept] < capacity[:, dept])
+        if len(donors) == 1:
+            receivers = receivers[receivers != donors[0]]
+        if len(donors) and len(receivers):
+            pools[dept] = (donors, receivers)
+    
+    if not pools:
+        return []
+    
+    depts = list(pools)
+    moves = []
+    for _ in range(k):
+        dept = depts[rng.randint(len(depts))]
+        donors, receivers = pools[dept]
+        team_to = receivers[rng.randint(len(receivers))]
+        
+        # Uniform over donors other than the receiver
+        pos = np.searchsorted(donors, team_to)
+        skip = int(pos < len(donors) and donors[pos] == team_to)
+        draw = rng.randint(len(donors) - skip)
+        if skip and draw >= pos:
+            draw += 1
+        moves.append((dept, int(donors[draw]), int(team_to)))
+    return moves
+
 
 def optimize_worker_allocation(
     teams,
@@ -12,7 +58,15 @@ def optimize_worker_allocation(
     temperature=2.0,
     cooling_rate=0.995,
     bottleneck_aware=True,
-    progress_callback=None
+    progress_callback=None,
+    seed=None,
+    should_stop=None,
+    batch_size=1,
+    batch_selection='best',
+    deadline=None,
+    target_score=None,
+    patience=200,
+    initial_scores=None
 ):
     """
     Optimize worker allocation with bottleneck awareness.
@@ -23,7 +77,8 @@ def optimize_worker_allocation(
     - Attendance must stay >= 1
     
     Args:
-        teams: list of team configurations
+        teams: list of team configurations, or an (n_teams x 8) team matrix
+            in TEAM_FIELDS order
         rf_model: loaded RandomForest model
         scaler: loaded StandardScaler
         feature_order: list of feature names
@@ -32,103 +87,217 @@ def optimize_worker_allocation(
         cooling_rate: cooling schedule
         bottleneck_aware: enable bottleneck penalty
         progress_callback: optional function(iteration, best_score) called each iteration
+        seed: optional seed for a private random stream (global np.random if None)
+        should_stop: optional function() -> bool checked each iteration; when it
+            returns True the loop stops and the best state so far is returned
+        batch_size: candidate moves per step; above 1 they are drawn only from
+            feasible (donor, receiver) pairs and scored in one model call
+        batch_selection: 'best' tests the best of the K candidates for
+            acceptance, 'metropolis' accepts the first candidate that passes
+        deadline: optional time.monotonic() value to stop at; the cooling
+            schedule then follows whichever of the iteration count and the
+            elapsed share of the time budget is further along
+        target_score: optional completion rate to stop at once reached
+        patience: stop after this many consecutive rejected moves
+        initial_scores: optional (effective_rates, predicted_outputs) of
+            teams, e.g. from an earlier run, used instead of predicting the
+            starting state (warm starts)
     
     Returns:
-        dict with optimized teams and performance metrics
+        dict with optimized teams and performance metrics, move counts
+        (accepted / rejected / infeasible) and stop_reason ('max_iterations',
+        'no_improvement', 'no_moves', 'time_budget', 'target_reached' or
+        'cancelled')
     """
     
-    # Deep copy teams
-    current_teams = copy.deepcopy(teams)
-    best_teams = copy.deepcopy(teams)
+    # Private random stream for reproducible chains
+    rng = np.random.RandomState(seed) if seed is not None else np.random
+    
+    # Team state as one int32 matrix in TEAM_FIELDS order; departments are
+    # column indices into the attendance and capacity (workers) views
+    if isinstance(teams, np.ndarray):
+        state = teams.astype(np.int32)
+    else:
+        state = team_matrix(teams).astype(np.int32)
+    attendance = state[:, 4:7]
+    capacity = state[:, 1:4]
+    n_teams = len(state)
+    targets = state[:, TARGET_COLUMN].tolist()
+    
+    # Evaluate initial state, unless the caller already has its scores
+    if initial_scores is not None:
+        rates, outputs = (np.array(scores, dtype=np.float64) for scores in initial_scores)
+    else:
+        rates, outputs = team_outputs(state, rf_model, scaler, feature_order, bottleneck_aware)
+    summary_started = time.monotonic()
+    initial_performance = performance_summary(rates, outputs, targets)
+    summary_seconds = time.monotonic() - summary_started
     
-    # Evaluate initial state
-    current_performance = evaluate_system(current_teams, rf_model, scaler, feature_order, bottleneck_aware)
-    best_performance = current_performance
+    # Per-team rates/outputs and a running total, so each step only
+    # re-predicts the two teams it touches
+    total_output = initial_performance['total_output']
+    total_target = initial_performance['total_target']
     
-    current_score = current_performance['total_completion_rate']
+    current_score = initial_performance['total_completion_rate']
     best_score = current_score
     
+    # Time-scaled cooling: temperature = T0 * cooling_rate ** (progress *
+    # max_iterations), so a budget that allows fewer iterations than the cap
+    # still cools down fully by the deadline
+    initial_temperature = temperature
+    if deadline is not None:
+        stop_at = deadline - RESULT_BUILD_FACTOR * summary_seconds
+        started = time.monotonic()
+        budget = max(stop_at - started, 1e-9)
+    best_state = state.copy()
+    best_rates = rates.copy()
+    best_outputs = outputs.copy()
+    
     # Optimization loop
     improvements = 0
     no_improvement_count = 0
     accepted_worse = 0
+    rejected = 0
+    infeasible = 0
+    stop_reason = 'max_iterations'
+    
+    migrations_per_dept = [0] * len(DEPARTMENTS)
     
-    migration_log = {'cutting': 0, 'sewing': 0, 'finishing': 0}
+    # Candidate rows (donor, receiver per move) and their feature matrix are
+    # built in buffers allocated once
+    max_rows = 2 * max(batch_size, 1)
+    candidates = np.empty((max_rows, state.shape[1]), dtype=np.int32)
+    feature_buffer = compile_feature_layout(feature_order).allocate(max_rows)
     
+    iteration = -1
     for iteration in range(max_iterations):
         # Report progress every 5 iterations
         if progress_callback and iteration % 5 == 0:
             progress_callback(iteration + 1, best_score)
         
-        # Random migration attempt
-        dept = np.random.choice(['cutting', 'sewing', 'finishing'])
+        # Cooperative cancellation
+        if should_stop is not None and should_stop():
+            stop_reason = 'cancelled'
+            break
         
-        # Pick two different teams
-        if len(current_teams) < 2:
+        if target_score is not None and best_score >= target_score:
+            stop_reason = 'target_reached'
             break
         
-        team_from_idx, team_to_idx = np.random.choice(len(current_teams), 2, replace=False)
-        team_from = current_teams[team_from_idx]
-        team_to = current_teams[team_to_idx]
+        if deadline is not None:
+            now = time.monotonic()
+            if now >= stop_at:
+                stop_reason = 'time_budget'
+                break
+            progress = max(iteration / max_iterations, (now - started) / budget)
+            temperature = initial_temperature * cooling_rate ** (progress * max_iterations)
         
-        # Check if migration is possible
-        from_attendance = team_from[f'{dept}_attendance']
-        to_attendance = team_to[f'{dept}_attendance']
-        to_capacity = team_to[f'{dept}_workers']
+        # Pick two different teams
+        if n_teams < 2:
+            stop_reason = 'no_moves'
+            break
         
-        if from_attendance <= 1 or to_attendance >= to_capacity:
-            continue
+        if batch_size > 1:
+            # K feasible candidate moves, scored together
+            moves = _sample_feasible_moves(attendance, capacity, batch_size, rng)
+            if not moves:
+                stop_reason = 'no_moves'
+                break
+        else:
+            # Random migration attempt
+            dept = rng.choice(len(DEPARTMENTS))
+            team_from_idx, team_to_idx = rng.choice(n_teams, 2, replace=False)
+            
+            # Check if migration is possible
+            if attendance[team_from_idx, dept] <= 1 or attendance[team_to_idx, dept] >= capacity[team_to_idx, dept]:
+                infeasible += 1
+                continue
+            moves = [(dept, team_from_idx, team_to_idx)]
         
-        # Perform migration
-        team_from[f'{dept}_attendance'] -= 1
-        team_to[f'{dept}_attendance'] += 1
+        # Evaluate candidate states (only the two teams each move touches)
+        move_array = np.array(moves)
+        rows = candidates[:2 * len(moves)]
+        np.take(state, move_array[:, 1:].ravel(), axis=0, out=rows)
+        rows[0::2][np.arange(len(moves)), 4 + move_array[:, 0]] -= 1
+        rows[1::2][np.arange(len(moves)), 4 + move_array[:, 0]] += 1
+        move_rates, move_outputs = team_outputs(
+            rows, rf_model, scaler, feature_order, bottleneck_aware, feature_buffer=feature_buffer
+        )
         
-        # Evaluate new state
-        new_performance = evaluate_system(current_teams, rf_model, scaler, feature_order, bottleneck_aware)
-        new_score = new_performance['total_completion_rate']
+        new_outputs = (
+            total_output
+            - outputs[move_array[:, 1]] - outputs[move_array[:, 2]]
+            + move_outputs[0::2] + move_outputs[1::2]
+        ).tolist()
         
         # Acceptance criteria (Simulated Annealing)
-        delta = new_score - current_score
+        if batch_selection == 'best':
+            # Best of K, then the usual acceptance test
+            order = [int(np.argmax(new_outputs))]
+        else:
+            # First candidate that passes the Metropolis test
+            order = range(len(moves))
+        
+        chosen = None
+        for m in order:
+            delta = new_outputs[m] / total_target - current_score
+            # A fully cooled (underflowed) temperature only accepts improvements
+            if delta > 0 or (temperature > 0 and rng.random() < np.exp(delta / temperature)):
+                chosen = m
+                break
         
-        if delta > 0:
-            # Improvement - always accept
+        if chosen is None:
+            # Reject - keep current state
+            no_improvement_count += 1
+            rejected += 1
+        else:
+            dept, team_from_idx, team_to_idx = moves[chosen]
+            new_score = new_outputs[chosen] / total_target
+            delta = new_score - current_score
+            
+            # Perform migration
+            attendance[team_from_idx, dept] -= 1
+            attendance[team_to_idx, dept] += 1
+            
             current_score = new_score
-            improvements += 1
+            total_output = new_outputs[chosen]
+            rates[team_from_idx], rates[team_to_idx] = move_rates[2 * chosen], move_rates[2 * chosen + 1]
+            outputs[team_from_idx], outputs[team_to_idx] = move_outputs[2 * chosen], move_outputs[2 * chosen + 1]
             no_improvement_count = 0
-            migration_log[dept] += 1
             
-            if new_score > best_score:
-                best_score = new_score
-                best_performance = new_performance
-                best_teams = copy.deepcopy(current_teams)
-        else:
-            # Non-improvement - accept with probability
-            acceptance_prob = np.exp(delta / temperature)
-            if np.random.random() < acceptance_prob:
-                current_score = new_score
-                no_improvement_count = 0
-                accepted_worse += 1
+            if delta > 0:
+                # Improvement
+                improvements += 1
+                migrations_per_dept[dept] += 1
+                
+                if new_score > best_score:
+                    best_score = new_score
+                    np.copyto(best_state, state)
+                    np.copyto(best_rates, rates)
+                    np.copyto(best_outputs, outputs)
             else:
-                # Reject - revert migration
-                team_from[f'{dept}_attendance'] += 1
-                team_to[f'{dept}_attendance'] -= 1
-                no_improvement_count += 1
+                # Accepted a worse state
+                accepted_worse += 1
         
         # Cool down temperature
         temperature *= cooling_rate
         
         # Early stopping
-        if no_improvement_count > 200:
+        if no_improvement_count > patience:
+            stop_reason = 'no_improvement'
             break
     
+    # Rebuild best performance from the per-team scores; summing them
+    # afresh avoids drift from the running total
+    best_performance = performance_summary(best_rates, best_outputs, targets)
+    
     # Calculate gains
-    initial_performance = evaluate_system(teams, rf_model, scaler, feature_order, bottleneck_aware)
     gain = best_performance['total_output'] - initial_performance['total_output']
     improvement_pct = ((best_performance['total_completion_rate'] /
                        initial_performance['total_completion_rate']) - 1) * 100
     
     return {
-        'optimized_teams': best_teams,
+        'optimized_teams': teams_from_matrix(best_state),
         'best_performance': best_performance,
         'initial_performance': initial_performance,
         'gain': gain,
@@ -136,5 +305,9 @@ def optimize_worker_allocation(
         'iterations': iteration + 1,
         'migrations': improvements,
         'accepted_worse': accepted_worse,
-        'migration_log': migration_log
+        'accepted': improvements + accepted_worse,
+        'rejected': rejected,
+        'infeasible': infeasible,
+        'stop_reason': stop_reason,
+        'migration_log': dict(zip(DEPARTMENTS, migrations_per_dept))
     }
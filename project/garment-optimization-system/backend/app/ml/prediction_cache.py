@@ -0,0 +1,105 @@
+import itertools
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Process-wide bounded LRU cache of team configuration -> predicted rate.
+
+    Entries are keyed by model version as well as team, so requests still
+    running on an older model keep their own entries while new requests use
+    the new one. Models are identified by their (rf_model, scaler) objects;
+    ModelLoader registers each loaded bundle under its version name, and
+    unregistered models get an anonymous version. Only the most recent
+    max_versions models keep entries.
+    """
+
+    def __init__(self, maxsize=100000, max_versions=4):
+        self.maxsize = maxsize
+        self.max_versions = max_versions
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._versions = OrderedDict()  # (id(rf_model), id(scaler)) -> (rf_model, scaler, version)
+        self._anonymous = itertools.count()
+        self._lock = threading.Lock()
+
+    def register(self, rf_model, scaler, version):
+        """Key entries for this model/scaler pair by version"""
+        with self._lock:
+            # Entries left by an earlier model loaded under the same name are stale
+            for ident, (_, _, known) in list(self._versions.items()):
+                if known == version:
+                    del self._versions[ident]
+                    self._purge(version)
+            self._versions[(id(rf_model), id(scaler))] = (rf_model, scaler, version)
+            self._trim_versions()
+
+    def _version(self, rf_model, scaler):
+        ident = (id(rf_model), id(scaler))
+        known = self._versions.get(ident)
+        if known is None:
+            known = (rf_model, scaler, f'anonymous-{next(self._anonymous)}')
+            self._versions[ident] = known
+            self._trim_versions()
+        else:
+            self._versions.move_to_end(ident)
+        return known[2]
+
+    def _trim_versions(self):
+        while len(self._versions) > self.max_versions:
+            _, (_, _, version) = self._versions.popitem(last=False)
+            self._purge(version)
+
+    def _purge(self, version):
+        for key in [key for key in self._entries if key[0] == version]:
+            del self._entries[key]
+
+    def get_many(self, keys, rf_model, scaler):
+        """Return cached rates for keys (None where missing)"""
+        with self._lock:
+            version = self._version(rf_model, scaler)
+            rates = []
+            for key in keys:
+                entry_key = (version, key)
+                rate = self._entries.get(entry_key)
+                if rate is None:
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(entry_key)
+                    self.hits += 1
+                rates.append(rate)
+            return rates
+
+    def put_many(self, keys, rates, rf_model, scaler):
+        """Store freshly predicted rates, evicting least recently used entries"""
+        with self._lock:
+            version = self._version(rf_model, scaler)
+            for key, rate in zip(keys, rates):
+                entry_key = (version, key)
+                self._entries[entry_key] = float(rate)
+                self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and model versions"""
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'versions': [version for _, _, version in self._versions.values()]
+            }
+
+
+prediction_cache = PredictionCache()
@@ -0,0 +1,185 @@
+import heapq
+
+import numpy as np
+
+from app.ml.evaluator import team_outputs
+from app.ml.feature_builder import ATTENDANCE_COLUMNS, DEPARTMENTS, TARGET_COLUMN, WORKER_COLUMNS
+
+# Changed team rows scored per model call
+DEFAULT_CHUNK_ROWS = 20000
+
+
+def explicit_scenarios(base, scenarios):
+    """
+    Scenarios given as lists of attendance changes.
+
+    Args:
+        base: (n_teams x 8) team matrix of the base plant
+        scenarios: dicts with optional 'name' and 'changes', a list of
+            {'team', 'department', 'delta'}
+
+    Yields:
+        (description, team indices, new attendance rows (k x 3))
+
+    Raises:
+        ValueError: for an unknown team or attendance outside 1..workers
+    """
+    for idx, scenario in enumerate(scenarios):
+        attendance = {}
+        for change in scenario['changes']:
+            team = change['team']
+            if team >= len(base):
+                raise ValueError(f"Scenario {idx + 1}: team {team} does not exist")
+            # int64, so a large delta cannot wrap around in an int32 base
+            row = attendance.setdefault(team, base[team, ATTENDANCE_COLUMNS].astype(np.int64))
+            row[DEPARTMENTS.index(change['department'])] += change['delta']
+
+        for team, row in attendance.items():
+            if (row < 1).any() or (row > base[team, WORKER_COLUMNS]).any():
+                raise ValueError(f"Scenario {idx + 1}: team {team} attendance must stay between 1 and its workers")
+
+        teams = list(attendance)
+        description = {'source': 'explicit', 'name': scenario.get('name')}
+        rows = np.array([attendance[t] for t in teams], dtype=base.dtype).reshape(-1, 3)
+        yield description, np.array(teams, dtype=np.intp), rows
+
+
+def sweep_scenarios(base, max_delta, departments=DEPARTMENTS, teams=None):
+    """
+    Every single-team, single-department attendance change of up to
+    +/- max_delta workers that keeps attendance within 1..workers.
+    """
+    team_indices = range(len(base)) if teams is None else teams
+    for team in team_indices:
+        if team >= len(base):
+            raise ValueError(f"Team {team} does not exist")
+        for dept in departments:
+            d = DEPARTMENTS.index(dept)
+            attendance = base[team, ATTENDANCE_COLUMNS[d]]
+            workers = base[team, WORKER_COLUMNS[d]]
+            for delta in range(-max_delta, max_delta + 1):
+                if delta == 0 or not 1 <= attendance + delta <= workers:
+                    continue
+                row = base[team, ATTENDANCE_COLUMNS].copy()
+                row[d] += delta
+                description = {'source': 'sweep', 'team': int(team), 'department': dept, 'delta': delta}
+                yield description, np.array([team], dtype=np.intp), row[np.newaxis, :]
+
+
+def history_scenarios(base, columns, days, seed=None):
+    """
+    Apply sampled historical days to the whole plant: each day's attendance
+    ratio per department is applied to every team, rounded and kept within
+    1..workers.
+
+    Args:
+        columns: dataset columns (DatasetStore.refresh())
+        days: number of days to sample (with replacement beyond the dataset size)
+    """
+    total_rows = len(columns['total_workers'])
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(total_rows, size=days, replace=days > total_rows)
+
+    workers = base[:, WORKER_COLUMNS]
+    team_indices = np.arange(len(base), dtype=np.intp)
+    for row in rows.tolist():
+        ratios = np.array([
+            columns[f'{dept}_attendance'][row] / columns[f'{dept}_workers'][row] for dept in DEPARTMENTS
+        ])
+        attendance = np.clip(np.rint(ratios * workers), 1, workers).astype(base.dtype)
+        yield {'source': 'history', 'dataset_row': row}, team_indices, attendance
+
+
+def _chunks(scenarios, chunk_rows):
+    """Group scenarios so each chunk changes about chunk_rows team rows"""
+    chunk = []
+    rows = 0
+    for scenario in scenarios:
+        chunk.append(scenario)
+        rows += len(scenario[1])
+        if rows >= chunk_rows:
+            yield chunk
+            chunk = []
+            rows = 0
+    if chunk:
+        yield chunk
+
+
+def evaluate_scenarios(
+    base,
+    scenarios,
+    rf_model,
+    scaler,
+    feature_order,
+    bottleneck_aware=True,
+    chunk_rows=DEFAULT_CHUNK_ROWS
+):
+    """
+    Score what-if scenarios against a base plant, chunk by chunk.
+
+    Only the team rows a scenario changes are re-scored: a chunk's changed
+    rows are de-duplicated and predicted in one model call, and each
+    scenario's output is the base output plus its teams' output changes.
+    Memory depends on chunk_rows, not on the number of scenarios.
+
+    Args:
+        base: (n_teams x 8) team matrix of the base plant
+        scenarios: iterable of (description, team indices, attendance rows)
+        rf_model, scaler, feature_order: model bundle
+        bottleneck_aware: apply the bottleneck penalty
+        chunk_rows: changed team rows per model call
+
+    Yields:
+        (base performance dict) first, then one list of scenario result
+        dicts per chunk
+    """
+    base_rates, base_outputs = team_outputs(base, rf_model, scaler, feature_order, bottleneck_aware, cache=None)
+    base_output = float(base_outputs.sum())
+    total_target = int(base[:, TARGET_COLUMN].sum())
+    yield {
+        'total_completion_rate': base_output / total_target,
+        'total_output': base_output,
+        'total_target': total_target
+    }
+
+    index = 0
+    for chunk in _chunks(scenarios, chunk_rows):
+        team_ids = np.concatenate([teams for _, teams, _ in chunk])
+        owners = np.repeat(np.arange(len(chunk)), [len(teams) for _, teams, _ in chunk])
+
+        rows = base[team_ids]
+        rows[:, ATTENDANCE_COLUMNS] = np.concatenate([attendance for _, _, attendance in chunk])
+
+        # Scenarios often share changed rows (and history days repeat)
+        unique_rows, inverse = np.unique(rows, axis=0, return_inverse=True)
+        _, unique_outputs = team_outputs(
+            unique_rows, rf_model, scaler, feature_order, bottleneck_aware, cache=None
+        )
+        changes = unique_outputs[inverse.reshape(-1)] - base_outputs[team_ids]
+        totals = base_output + np.bincount(owners, weights=changes, minlength=len(chunk))
+
+        results = []
+        for (description, _, _), total in zip(chunk, totals.tolist()):
+            results.append({
+                'index': index,
+                **description,
+                'total_completion_rate': total / total_target,
+                'total_output': total,
+                'output_change': total - base_output
+            })
+            index += 1
+        yield results
+
+
+def top_k(result_chunks, k, rank='best'):
+    """The k highest ('best') or lowest ('worst') output scenarios, most extreme first"""
+    sign = 1 if rank == 'best' else -1
+    heap = []
+    for results in result_chunks:
+        for result in results:
+            entry = (sign * result['total_output'], -result['index'], result)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+    return [entry[2] for entry in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
@@ -0,0 +1,183 @@
+import time
+from contextlib import nullcontext
+
+import numpy as np
+
+from app import metrics
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.feature_builder import MAX_TEAM_VALUE, TEAM_FIELDS, team_matrix_from_columns, teams_from_matrix
+from app.ml.greedy import optimize_greedy
+from app.ml.multi_start import optimize_multi_start
+from app.utils.validators import validate_team_matrix
+
+MAX_ITERATIONS = 1000
+ALGORITHMS = ('annealing', 'greedy')
+
+
+def request_matrix(request):
+    """
+    (n_teams x 8) int32 team matrix of a request's teams or columns,
+    validated in one vectorized pass (ValueError lists every bad team)
+    """
+    if request.columns is not None:
+        matrix = team_matrix_from_columns(dict(request.columns))
+    else:
+        try:
+            matrix = np.array([[getattr(team, f) for f in TEAM_FIELDS] for team in request.teams], dtype=np.int64)
+        except OverflowError:
+            raise ValueError(f"Team values must be at most {MAX_TEAM_VALUE}")
+    validate_team_matrix(matrix)
+    return matrix.astype(np.int32)
+
+
+def run_algorithm(algorithm, teams, request, model, progress_callback=None, should_stop=None, deadline=None,
+                  chain_workers=None):
+    """Run one optimization algorithm on a team matrix with a ModelHandle"""
+    start_time = time.time()
+    with metrics.stage(algorithm):
+        result = _run_algorithm(algorithm, teams, request, model, progress_callback, should_stop, deadline,
+                                chain_workers)
+    result['computation_time'] = time.time() - start_time
+    metrics.record_optimization(algorithm, result)
+    return result
+
+
+def _run_algorithm(algorithm, teams, request, model, progress_callback, should_stop, deadline, chain_workers):
+    if algorithm == 'greedy':
+        return optimize_greedy(
+            teams_from_matrix(teams),
+            model.rf_model,
+            model.scaler,
+            model.feature_order,
+            bottleneck_aware=True,
+            progress_callback=progress_callback,
+            should_stop=should_stop,
+            deadline=deadline,
+            target_score=request.target_completion_rate
+        )
+    else:
+        return optimize_multi_start(
+            teams,
+            model.rf_model,
+            model.scaler,
+            model.feature_order,
+            restarts=request.restarts,
+            seed=request.seed,
+            max_workers=chain_workers,
+            max_iterations=MAX_ITERATIONS,
+            temperature=2.0,
+            cooling_rate=0.995,
+            bottleneck_aware=True,
+            progress_callback=progress_callback,
+            should_stop=should_stop,
+            deadline=deadline,
+            target_score=request.target_completion_rate,
+            batch_size=request.batch_size,
+            batch_selection=request.batch_selection
+        )
+
+
+def algorithm_summary(result):
+    """Solution quality and cost of one algorithm run, for comparisons"""
+    return {
+        "completion_rate": result['best_performance']['total_completion_rate'],
+        "total_output": result['best_performance']['total_output'],
+        "improvement_pct": result['improvement_pct'],
+        "iterations": result['iterations'],
+        "computation_time": result['computation_time']
+    }
+
+
+def run_optimization(request, model, progress_callback=None, should_stop=None, on_initial=None, deadline=None,
+                     chain_workers=None):
+    """
+    Validate, evaluate and optimize one request with a ModelHandle; returns
+    the response fields. With a deadline (time.monotonic()) the best
+    allocation found by then is returned. chain_workers caps the processes
+    used for restarts (default: one per chain, up to the CPU count).
+    """
+    with metrics.profiling() if request.profile else nullcontext() as profile:
+        try:
+            result = _run_optimization(request, model, progress_callback, should_stop, on_initial, deadline,
+                                       chain_workers)
+        except Exception:
+            metrics.OPTIMIZATIONS_TOTAL.inc(algorithm=request.algorithm, status='failed')
+            raise
+        metrics.OPTIMIZATIONS_TOTAL.inc(algorithm=request.algorithm, status='completed')
+        result['profile'] = profile.to_dict() if profile is not None else None
+        return result
+
+
+def _run_optimization(request, model, progress_callback, should_stop, on_initial, deadline, chain_workers):
+    start_time = time.time()
+    
+    # Validate input into one team matrix
+    with metrics.stage('validate'):
+        teams = request_matrix(request)
+    
+    # Evaluate initial state
+    with metrics.stage('evaluate_initial'):
+        initial_performance = evaluate_system_batch(
+            teams,
+            model.rf_model,
+            model.scaler,
+            model.feature_order,
+            bottleneck_aware=True
+        )
+    if on_initial:
+        on_initial(initial_performance)
+    
+    # A comparison run gets the second half of the remaining time budget
+    algorithm_deadline = deadline
+    if deadline is not None and request.compare_algorithms:
+        now = time.monotonic()
+        algorithm_deadline = now + max(deadline - now, 0) / 2
+    
+    # Run optimization (the optimizers leave the input teams untouched)
+    optimization_result = run_algorithm(
+        request.algorithm, teams, request, model,
+        progress_callback=progress_callback, should_stop=should_stop, deadline=algorithm_deadline,
+        chain_workers=chain_workers
+    )
+    
+    # Optionally run the other algorithm on the same input for comparison
+    comparison = None
+    if request.compare_algorithms:
+        comparison = {request.algorithm: algorithm_summary(optimization_result)}
+        for other in ALGORITHMS:
+            if other != request.algorithm:
+                comparison[other] = algorithm_summary(
+                    run_algorithm(other, teams, request, model, should_stop=should_stop, deadline=deadline,
+                                  chain_workers=chain_workers)
+                )
+    
+    computation_time = time.time() - start_time
+    
+    return {
+        "initial": {
+            "completion_rate": initial_performance['total_completion_rate'],
+            "total_output": initial_performance['total_output'],
+            "total_target": initial_performance['total_target']
+        },
+        "final": {
+            "completion_rate": optimization_result['best_performance']['total_completion_rate'],
+            "total_output": optimization_result['best_performance']['total_output'],
+            "total_target": optimization_result['best_performance']['total_target']
+        },
+        "teams_before": teams_from_matrix(teams),
+        "teams_after": optimization_result['optimized_teams'],
+        "team_metrics_before": initial_performance.get('team_metrics', []),
+        "team_metrics_after": optimization_result['best_performance'].get('team_metrics', []),
+        "iterations": optimization_result['iterations'],
+        "migrations": optimization_result['migrations'],
+        "improvement_pct": optimization_result['improvement_pct'],
+        "gain": optimization_result['gain'],
+        "computation_time": computation_time,
+        "migration_log": optimization_result['migration_log'],
+        "seed": optimization_result.get('seed'),
+        "chains": optimization_result.get('chains', []),
+        "algorithm": request.algorithm,
+        "comparison": comparison,
+        "model_version": model.version,
+        "stop_reason": optimization_result.get('stop_reason')
+    }
@@ -0,0 +1,129 @@
+import gzip
+import json
+import os
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional: stdlib json is used instead
+    orjson = None
+
+from app.ml.feature_builder import DEPARTMENTS, TEAM_FIELDS
+
+# Full-format fields that scale with the number of teams
+TEAM_LIST_FIELDS = ('teams_before', 'teams_after', 'team_metrics_before', 'team_metrics_after')
+
+# Smaller bodies are not worth the compression time
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 3))
+
+
+def dumps(content):
+    """
+    JSON bytes for server-generated content, with orjson when it is
+    installed. Values orjson cannot encode (integers beyond 64 bits) fall
+    back to the stdlib encoder.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass
+    return json.dumps(content, separators=(',', ':')).encode()
+
+
+def transfers(teams_before, teams_after):
+    """
+    Net worker transfers between teams, per department.
+
+    Each department's attendance changes sum to zero (workers only move
+    within a department), so donors are matched to receivers in team
+    order. Workers moved back and forth during the search cancel out, so
+    the counts can be lower than migration_log.
+
+    Returns:
+        list of {'department', 'from_team', 'to_team', 'count'}
+    """
+    result = []
+    for dept in DEPARTMENTS:
+        field = f'{dept}_attendance'
+        changes = [after[field] - before[field] for before, after in zip(teams_before, teams_after)]
+        donors = [[idx, -change] for idx, change in enumerate(changes) if change < 0]
+        receivers = [[idx, change] for idx, change in enumerate(changes) if change > 0]
+        d = 0
+        for receiver, needed in receivers:
+            while needed > 0:
+                donor = donors[d]
+                count = min(needed, donor[1])
+                result.append({'department': dept, 'from_team': donor[0], 'to_team': receiver, 'count': count})
+                needed -= count
+                donor[1] -= count
+                if donor[1] == 0:
+                    d += 1
+    return result
+
+
+def delta_result(result):
+    """
+    The delta response format of an optimization result: scalar fields
+    as in the full format, plus only the teams whose attendance changed
+    (with their metrics before and after) and the transfers between them.
+    """
+    delta = {field: value for field, value in result.items() if field not in TEAM_LIST_FIELDS}
+    teams_before, teams_after = result['teams_before'], result['teams_after']
+    metrics_before, metrics_after = result['team_metrics_before'], result['team_metrics_after']
+
+    changed = []
+    for idx, (before, after) in enumerate(zip(teams_before, teams_after)):
+        if any(before[field] != after[field] for field in TEAM_FIELDS):
+            changed.append({
+                'team': idx,
+                'before': {f'{dept}_attendance': before[f'{dept}_attendance'] for dept in DEPARTMENTS},
+                'after': {f'{dept}_attendance': after[f'{dept}_attendance'] for dept in DEPARTMENTS},
+                'metrics_before': metrics_before[idx] if metrics_before else None,
+                'metrics_after': metrics_after[idx] if metrics_after else None
+            })
+
+    delta['format'] = 'delta'
+    delta['n_teams'] = len(teams_before)
+    delta['changed_teams'] = changed
+    delta['transfers'] = transfers(teams_before, teams_after)
+    return delta
+
+
+def format_result(result, response_format):
+    return delta_result(result) if response_format == 'delta' else result
+
+
+def accepts_gzip(accept_encoding):
+    """Whether an Accept-Encoding header allows gzip (q=0 refuses it)"""
+    for coding in (accept_encoding or '').split(','):
+        name, _, params = coding.strip().partition(';')
+        if name.strip().lower() in ('gzip', '*'):
+            q = params.strip()
+            if not q.startswith('q='):
+                return True
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+
+def json_response(content, accept_encoding=None, headers=None, status_code=200):
+    """
+    A JSON Response for server-generated content: encoded once without
+    response-model validation, and gzipped when the client accepts it and
+    the body is large enough. A gzipped body's ETag is sent as weak, since
+    the bytes differ from the identity encoding.
+    """
+    body = dumps(content)
+    headers = dict(headers or {})
+    headers['Vary'] = 'Accept-Encoding'
+    if len(body) >= GZIP_MIN_BYTES and accepts_gzip(accept_encoding):
+        body = gzip.compress(body, compresslevel=GZIP_LEVEL)
+        headers['Content-Encoding'] = 'gzip'
+        if 'ETag' in headers and not headers['ETag'].startswith('W/'):
+            headers['ETag'] = 'W/' + headers['ETag']
+    return Response(content=body, status_code=status_code, media_type='application/json', headers=headers)
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Request fields that change what is measured, not what is computed
+UNCACHED_FIELDS = {'profile'}
+
+
+def request_key(request, model_version):
+    """
+    Content hash of an OptimizationRequest for one model version.
+
+    Teams keep their order (results are positional); fields are serialized
+    in schema order by pydantic, so equal requests always hash the same.
+    """
+    digest = hashlib.sha256(model_version.encode() + b'\0')
+    digest.update(request.model_dump_json(exclude=UNCACHED_FIELDS).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    LRU cache of optimization results with a time-to-live, optionally
+    backed by a sqlite file so results survive restarts.
+
+    Results are kept in memory up to maxsize; with a path, every result is
+    also written to sqlite and memory misses are looked up there. Entries
+    older than ttl seconds are treated as missing. maxsize=0 disables the
+    cache.
+
+    Also tracks in-flight computations so identical concurrent requests
+    share one job (see join_or_start).
+
+    sqlite I/O runs outside the lock that guards the in-memory entries, so
+    memory lookups and join_or_start never wait on the disk. With a path,
+    get() and put() still block on sqlite; async callers run them in a
+    thread (see `persistent`).
+    """
+
+    def __init__(self, maxsize=None, ttl=None, path=None):
+        self.maxsize = maxsize if maxsize is not None else int(os.environ.get('RESULT_CACHE_SIZE', 256))
+        self.ttl = ttl if ttl is not None else float(os.environ.get('RESULT_CACHE_TTL', 3600))
+        self.path = path if path is not None else os.environ.get('RESULT_CACHE_PATH') or None
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()  # key -> (stored_at, result)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        if self.path and self.enabled:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL, result TEXT)'
+            )
+            self._db.commit()
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    @property
+    def persistent(self):
+        """Whether get() and put() may do sqlite I/O"""
+        return self._db is not None
+
+    def _fresh(self, stored_at):
+        return time.time() - stored_at < self.ttl
+
+    def get(self, key):
+        """Cached result for key, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._fresh(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    'SELECT stored_at, result FROM results WHERE key = ?', (key,)
+                ).fetchone()
+            if row is not None and self._fresh(row[0]):
+                entry = (row[0], json.loads(row[1]))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self._store(key, entry)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, result):
+        if not self.enabled:
+            return
+        stored_at = time.time()
+        with self._lock:
+            self._store(key, (stored_at, result))
+        if self._db is not None:
+            payload = json.dumps(result)
+            with self._db_lock:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO results (key, stored_at, result) VALUES (?, ?, ?)',
+                    (key, stored_at, payload)
+                )
+                self._db.execute('DELETE FROM results WHERE stored_at < ?', (stored_at - self.ttl,))
+                self._db.commit()
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def join_or_start(self, key, start):
+        """
+        The job already computing key, else the job returned by start().
+
+        Returns:
+            (job, joined) where joined is True if the job was already running
+        """
+        with self._lock:
+            job = self._inflight.get(key)
+            if job is not None:
+                self.coalesced += 1
+                return job, True
+            job = start()
+            self._inflight[key] = job
+        job.future.add_done_callback(lambda future: self._finish_inflight(key, job))
+        return job, False
+
+    def _finish_inflight(self, key, job):
+        with self._lock:
+            if self._inflight.get(key) is job:
+                del self._inflight[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute('DELETE FROM results')
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'persistent': self.persistent,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'coalesced': self.coalesced,
+                'in_flight': len(self._inflight)
+            }
@@ -1,5 +1,7 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import List, Dict
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from typing import Any, List, Dict, Optional, Literal
+
+from app.ml.feature_builder import MAX_TEAM_VALUE
 
 class Team(BaseModel):
     total_workers: int = Field(..., gt=0)
@@ -29,8 +31,82 @@ class Team(BaseModel):
             raise ValueError('finishing_attendance cannot exceed finishing_workers')
         return v
 
-class OptimizationRequest(BaseModel):
-    teams: List[Team] = Field(..., min_length=1)
+class TeamColumns(BaseModel):
+    total_workers: List[int] = Field(..., min_length=1)
+    cutting_workers: List[int]
+    sewing_workers: List[int]
+    finishing_workers: List[int]
+    cutting_attendance: List[int]
+    sewing_attendance: List[int]
+    finishing_attendance: List[int]
+    daily_target: List[int]
+    
+    @model_validator(mode='after')
+    def validate_lengths(self):
+        if len({len(values) for values in self.__dict__.values()}) > 1:
+            raise ValueError('All team columns must have the same length')
+        return self
+
+# Teams as a list of objects, or as parallel arrays (columns) for large plants
+class PlantRequest(BaseModel):
+    teams: Optional[List[Team]] = Field(default=None, min_length=1)
+    columns: Optional[TeamColumns] = None
+    
+    @model_validator(mode='after')
+    def validate_one_team_format(self):
+        if (self.teams is None) == (self.columns is None):
+            raise ValueError('Provide either teams or columns')
+        return self
+
+class OptimizationRequest(PlantRequest):
+    restarts: int = Field(default=1, ge=1, le=64)
+    seed: Optional[int] = Field(default=None, ge=0)
+    algorithm: Literal['annealing', 'greedy'] = 'annealing'
+    batch_size: int = Field(default=1, ge=1, le=256)
+    batch_selection: Literal['best', 'metropolis'] = 'best'
+    compare_algorithms: bool = False
+    profile: bool = False
+    time_budget_ms: Optional[int] = Field(default=None, ge=1, le=600000)
+    target_completion_rate: Optional[float] = Field(default=None, gt=0)
+
+Department = Literal['cutting', 'sewing', 'finishing']
+
+class AttendanceChange(BaseModel):
+    team: int = Field(..., ge=0)
+    department: Department
+    delta: int = Field(..., ge=-MAX_TEAM_VALUE, le=MAX_TEAM_VALUE)
+
+class Scenario(BaseModel):
+    name: Optional[str] = None
+    changes: List[AttendanceChange] = Field(..., min_length=1)
+
+class AttendanceSweep(BaseModel):
+    max_delta: int = Field(default=1, ge=1, le=50)
+    departments: List[Department] = ['cutting', 'sewing', 'finishing']
+    teams: Optional[List[int]] = None
+
+class HistorySample(BaseModel):
+    days: int = Field(default=30, ge=1, le=100000)
+    seed: Optional[int] = Field(default=None, ge=0)
+
+class ScenarioBatchRequest(PlantRequest):
+    scenarios: List[Scenario] = Field(default=[], max_length=100000)
+    sweep: Optional[AttendanceSweep] = None
+    history: Optional[HistorySample] = None
+    top_k: Optional[int] = Field(default=None, ge=1, le=10000)
+    rank: Literal['best', 'worst'] = 'best'
+    
+    @model_validator(mode='after')
+    def validate_has_scenarios(self):
+        if not self.scenarios and self.sweep is None and self.history is None:
+            raise ValueError('Provide scenarios, a sweep or a history sample')
+        return self
+
+# PATCH /sessions/{id}: edits to the session's current (optimized) teams
+class SessionUpdate(BaseModel):
+    changes: List[AttendanceChange] = Field(default=[], max_length=10000)
+    teams: Dict[int, Team] = {}
+    time_budget_ms: Optional[int] = Field(default=None, ge=1, le=600000)
 
 class PerformanceMetrics(BaseModel):
     completion_rate: float
@@ -42,7 +118,19 @@ class TeamMetrics(BaseModel):
     output: float
     target: float
 
+class ChainStats(BaseModel):
+    seed: int
+    best_score: float
+    iterations: int
+    accepted_worse: int
+    accepted: Optional[int] = None
+    rejected: Optional[int] = None
+    infeasible: Optional[int] = None
+    stop_reason: Optional[str] = None
+
 class OptimizationResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # allows the model_version field
+    
     initial: PerformanceMetrics
     final: PerformanceMetrics
     teams_before: List[Dict]
@@ -55,6 +143,56 @@ class OptimizationResponse(BaseModel):
     gain: float
     computation_time: float
     migration_log: Dict[str, int]
+    seed: Optional[int] = None
+    chains: List[ChainStats] = []
+    algorithm: str = 'annealing'
+    comparison: Optional[Dict[str, Dict[str, float]]] = None
+    model_version: Optional[str] = None
+    stop_reason: Optional[str] = None
+    profile: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None  # set by /sessions
+    revision: Optional[int] = None
+    edited_teams: Optional[List[int]] = None
+
+class TeamChange(BaseModel):
+    team: int
+    before: Dict[str, int]
+    after: Dict[str, int]
+    metrics_before: Optional[TeamMetrics] = None
+    metrics_after: Optional[TeamMetrics] = None
+
+class Transfer(BaseModel):
+    department: str
+    from_team: int
+    to_team: int
+    count: int
+
+# format=delta: OptimizationResponse without the per-team lists
+class OptimizationDeltaResponse(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())  # allows the model_version field
+    
+    format: Literal['delta'] = 'delta'
+    n_teams: int
+    changed_teams: List[TeamChange]
+    transfers: List[Transfer]
+    initial: PerformanceMetrics
+    final: PerformanceMetrics
+    iterations: int
+    migrations: int
+    improvement_pct: float
+    gain: float
+    computation_time: float
+    migration_log: Dict[str, int]
+    seed: Optional[int] = None
+    chains: List[ChainStats] = []
+    algorithm: str = 'annealing'
+    comparison: Optional[Dict[str, Dict[str, float]]] = None
+    model_version: Optional[str] = None
+    stop_reason: Optional[str] = None
+    profile: Optional[Dict[str, Any]] = None
+    session_id: Optional[str] = None  # set by /sessions
+    revision: Optional[int] = None
+    edited_teams: Optional[List[int]] = None
 
 class SampleTeam(BaseModel):
     total_workers: int
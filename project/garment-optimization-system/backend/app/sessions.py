@@ -0,0 +1,288 @@
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from app import metrics
+from app.ml.evaluator import team_outputs
+from app.ml.feature_builder import (
+    ATTENDANCE_COLUMNS, DEPARTMENTS, MAX_TEAM_VALUE, TARGET_COLUMN, TEAM_FIELDS, team_matrix, teams_from_matrix
+)
+from app.ml.optimizer import optimize_worker_allocation
+from app.utils.validators import validate_team_matrix
+
+# Re-optimization after an edit: a short annealing run from the previous
+# best. Each step scores WARM_BATCH_SIZE candidate moves in one model call and
+# tries the best, so few steps (and model calls) are needed. Scores are
+# completion rates, so at WARM_TEMPERATURE a 0.001 drop is still accepted with
+# probability exp(-0.1) ~ 0.9: far cooler than a cold start's 2.0 (which takes
+# almost any move), but warm enough to step off the local optimum the
+# previous run ended in
+WARM_ITERATIONS = 30
+WARM_BATCH_SIZE = 32
+WARM_TEMPERATURE = 0.01
+WARM_COOLING_RATE = 0.9
+WARM_PATIENCE = 5
+
+
+class SessionCapacityError(Exception):
+    """Raised when a plant alone is larger than the session memory cap"""
+
+
+def reoptimize(model, state, rates, outputs, seed, deadline=None, should_stop=None):
+    """
+    The warm-start annealing run of a session edit: short and low
+    temperature (see WARM_TEMPERATURE), starting from state with its known
+    per-team scores.
+
+    Returns:
+        optimize_worker_allocation's result
+    """
+    with metrics.stage('annealing'):
+        result = optimize_worker_allocation(
+            state, model.rf_model, model.scaler, model.feature_order,
+            max_iterations=WARM_ITERATIONS,
+            temperature=WARM_TEMPERATURE,
+            cooling_rate=WARM_COOLING_RATE,
+            patience=WARM_PATIENCE,
+            seed=seed,
+            deadline=deadline,
+            should_stop=should_stop,
+            batch_size=WARM_BATCH_SIZE,
+            initial_scores=(rates, outputs)
+        )
+    metrics.record_optimization('annealing', result)
+    return result
+
+
+class Session:
+    """
+    Optimized state of one plant kept between edits: the best team matrix,
+    its per-team effective rates and outputs, and the model that scored
+    them.
+    """
+
+    def __init__(self, session_id, model, state, rates, outputs, seed=None):
+        self.id = session_id
+        self.model = model
+        self.state = state
+        self.rates = rates
+        self.outputs = outputs
+        self.seed = seed if seed is not None else secrets.randbits(32)
+        self.revision = 0
+        self.last_used = time.time()
+        self.lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return self.state.nbytes + self.rates.nbytes + self.outputs.nbytes
+
+    def _apply_edits(self, changes, teams):
+        """Copy of the state with edits applied, and the edited team indices"""
+        # int64 so edits cannot wrap before validate_team_matrix bounds them
+        state = self.state.astype(np.int64)
+        edited = set()
+        for idx, team in (teams or {}).items():
+            if not 0 <= idx < len(state):
+                raise ValueError(f"No team at index {idx}")
+            try:
+                state[idx] = [team[f] for f in TEAM_FIELDS]
+            except OverflowError:
+                raise ValueError(f"Team values must be at most {MAX_TEAM_VALUE}")
+            edited.add(idx)
+        for change in changes or []:
+            idx = change['team']
+            if not 0 <= idx < len(state):
+                raise ValueError(f"No team at index {idx}")
+            state[idx, ATTENDANCE_COLUMNS[DEPARTMENTS.index(change['department'])]] += change['delta']
+            edited.add(idx)
+        return state, sorted(edited)
+
+    def update(self, changes=None, teams=None, deadline=None, should_stop=None, run=reoptimize):
+        """
+        Apply edits and continue annealing from the previous best.
+
+        Only the edited teams are re-predicted; the others keep their scores.
+
+        Args:
+            changes: attendance changes, [{'team', 'department', 'delta'}]
+            teams: {team index: team dict} replacing whole teams
+            deadline: optional time.monotonic() value to stop at
+            should_stop: optional function() -> bool stopping the annealing
+            run: the reoptimize function to use (WorkerPool.reoptimize runs
+                it in a worker process)
+
+        Returns:
+            dict with the optimization response fields, the session id and
+            its new revision
+
+        Raises:
+            ValueError: for an unknown team or an invalid edited team
+        """
+        start_time = time.time()
+        with self.lock:
+            model = self.model
+            with metrics.stage('validate'):
+                state, edited = self._apply_edits(changes, teams)
+                validate_team_matrix(state)
+            state = state.astype(np.int32)
+
+            rates, outputs = self.rates.copy(), self.outputs.copy()
+            if edited:
+                with metrics.stage('evaluate_initial'):
+                    rates[edited], outputs[edited] = team_outputs(
+                        state[edited], model.rf_model, model.scaler, model.feature_order
+                    )
+
+            seed = (self.seed + self.revision + 1) % 2 ** 32
+            result = run(model, state, rates, outputs, seed, deadline=deadline, should_stop=should_stop)
+
+            best = result['best_performance']
+            self.state = team_matrix(result['optimized_teams']).astype(np.int32)
+            self.rates = np.array([team['completion_rate'] for team in best['team_metrics']])
+            self.outputs = np.array([team['output'] for team in best['team_metrics']])
+            self.revision += 1
+            self.last_used = time.time()
+
+            initial = result['initial_performance']
+            return {
+                "session_id": self.id,
+                "revision": self.revision,
+                "edited_teams": edited,
+                "initial": {
+                    "completion_rate": initial['total_completion_rate'],
+                    "total_output": initial['total_output'],
+                    "total_target": initial['total_target']
+                },
+                "final": {
+                    "completion_rate": best['total_completion_rate'],
+                    "total_output": best['total_output'],
+                    "total_target": best['total_target']
+                },
+                "teams_before": teams_from_matrix(state),
+                "teams_after": result['optimized_teams'],
+                "team_metrics_before": initial['team_metrics'],
+                "team_metrics_after": best['team_metrics'],
+                "iterations": result['iterations'],
+                "migrations": result['migrations'],
+                "improvement_pct": result['improvement_pct'],
+                "gain": result['gain'],
+                "computation_time": time.time() - start_time,
+                "migration_log": result['migration_log'],
+                "seed": seed,
+                "chains": [],
+                "algorithm": 'annealing',
+                "comparison": None,
+                "model_version": model.version,
+                "stop_reason": result['stop_reason'],
+                "profile": None
+            }
+
+    def to_dict(self, ttl):
+        with self.lock:
+            total_output = float(self.outputs.sum())
+            total_target = int(self.state[:, TARGET_COLUMN].sum())
+            return {
+                "session_id": self.id,
+                "revision": self.revision,
+                "model_version": self.model.version,
+                "n_teams": len(self.state),
+                "completion_rate": total_output / total_target,
+                "total_output": total_output,
+                "total_target": total_target,
+                "teams": teams_from_matrix(self.state),
+                "expires_in": max(self.last_used + ttl - time.time(), 0)
+            }
+
+
+class SessionStore:
+    """
+    Re-optimization sessions by id, expired after ttl idle seconds and
+    capped at max_bytes of team state; the least recently used sessions are
+    evicted to make room.
+    """
+
+    def __init__(self, ttl=None, max_bytes=None):
+        self.ttl = ttl if ttl is not None else float(os.environ.get('SESSION_TTL', 900))
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.environ.get('SESSION_MEMORY_MB', 64)) * 1024 * 1024
+        )
+        self.expired = 0
+        self.evicted = 0
+        self._sessions = OrderedDict()  # id -> Session, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def create(self, model, state, scores=None, seed=None):
+        """
+        Start a session from an optimized team matrix.
+
+        Args:
+            model: ModelHandle edits are scored with
+            state: (n_teams x 8) team matrix
+            scores: optional (effective_rates, predicted_outputs) of state
+                under model; predicted here when not given
+            seed: seed the edits' annealing seeds are derived from
+
+        Raises:
+            SessionCapacityError: if the plant alone exceeds max_bytes
+        """
+        state = np.asarray(state, dtype=np.int32)
+        if scores is None:
+            scores = team_outputs(state, model.rf_model, model.scaler, model.feature_order)
+        rates, outputs = (np.asarray(values, dtype=np.float64) for values in scores)
+        session = Session(secrets.token_hex(16), model, state, rates, outputs, seed)
+        if session.nbytes > self.max_bytes:
+            raise SessionCapacityError(f"Plant needs {session.nbytes} bytes; the session limit is {self.max_bytes}")
+
+        with self._lock:
+            self._expire()
+            while self._bytes + session.nbytes > self.max_bytes:
+                _, evicted = self._sessions.popitem(last=False)
+                self._bytes -= evicted.nbytes
+                self.evicted += 1
+            self._sessions[session.id] = session
+            self._bytes += session.nbytes
+        return session
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.last_used >= cutoff:
+                break
+            del self._sessions[session.id]
+            self._bytes -= session.nbytes
+            self.expired += 1
+
+    def get(self, session_id):
+        """Session by id (marked as used), or None if unknown or expired"""
+        with self._lock:
+            self._expire()
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.last_used = time.time()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._bytes -= session.nbytes
+            return session is not None
+
+    def stats(self):
+        with self._lock:
+            self._expire()
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
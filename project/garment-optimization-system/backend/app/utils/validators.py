@@ -1,3 +1,8 @@
+import numpy as np
+
+from app.ml.feature_builder import ATTENDANCE_COLUMNS, DEPARTMENTS, MAX_TEAM_VALUE, WORKER_COLUMNS
+
+
 def validate_teams(teams):
     """Validate team data before optimization"""
     
@@ -41,3 +46,43 @@ def validate_teams(teams):
             raise ValueError(f"Team {idx+1}: finishing_attendance must be at least 1")
     
     return True
+
+
+def validate_team_matrix(matrix):
+    """
+    Validate a (n_teams x 8) team matrix (TEAM_FIELDS order) in one
+    vectorized pass.
+    
+    Checks the same rules as validate_teams (plus every field positive, as
+    the Team schema does, and at most MAX_TEAM_VALUE so the int32 matrices
+    the optimizers use cannot wrap), but reports every failing team per rule
+    instead of stopping at the first one.
+    
+    Raises:
+        ValueError: listing the (1-based) failing teams for each rule
+    """
+    
+    if len(matrix) == 0:
+        raise ValueError("At least one team is required")
+    
+    workers = matrix[:, WORKER_COLUMNS]
+    attendance = matrix[:, ATTENDANCE_COLUMNS]
+    
+    failures = [
+        ("all fields must be positive", (matrix < 1).any(axis=1)),
+        (f"fields must be at most {MAX_TEAM_VALUE}", (matrix > MAX_TEAM_VALUE).any(axis=1)),
+        ("sum of department workers must equal total_workers", workers.sum(axis=1) != matrix[:, 0])
+    ]
+    for d, dept in enumerate(DEPARTMENTS):
+        failures.append((f"{dept}_attendance exceeds {dept}_workers", attendance[:, d] > workers[:, d]))
+    
+    errors = []
+    for message, failed in failures:
+        teams = np.flatnonzero(failed) + 1
+        if len(teams):
+            label = "Team" if len(teams) == 1 else "Teams"
+            errors.append(f"{label} {', '.join(map(str, teams.tolist()))}: {message}")
+    if errors:
+        raise ValueError("; ".join(errors))
+    
+    return True
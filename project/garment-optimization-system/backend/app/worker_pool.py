@@ -0,0 +1,222 @@
+import math
+import multiprocessing
+import os
+import queue
+import sys
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from app import metrics
+from app.ml.model_loader import ModelLoader
+from app.optimization import run_optimization
+from app.sessions import reoptimize
+
+# Shared per-task slot: iteration, best score, initial completion rate, cancel flag
+SLOT_FIELDS = 4
+ITERATION, BEST_SCORE, INITIAL_RATE, CANCEL = range(SLOT_FIELDS)
+
+# Seconds between progress / cancellation checks while waiting on a worker
+POLL_INTERVAL = 0.05
+
+# ProcessPoolExecutor(max_tasks_per_child=) is Python 3.11+; older versions
+# replace the whole pool after size * max_tasks_per_worker tasks instead
+PER_CHILD_RECYCLING = sys.version_info >= (3, 11)
+
+# Set once per worker process by _init_worker
+_worker = {}
+
+
+def _init_worker(artifacts_path, version, inference_backend, slots):
+    """Pool initializer: load the model bundle once for all of this worker's tasks"""
+    warnings.simplefilter('ignore')
+    loader = ModelLoader(inference_backend=inference_backend)
+    loader.artifacts_path = artifacts_path
+    _worker.update(loader=loader, model=loader.load_bundle(version), slots=slots)
+
+
+def _model(version):
+    if _worker['model'].version != version:
+        # The server reloaded to another version since this worker started
+        _worker['model'] = _worker['loader'].load_bundle(version)
+    return _worker['model']
+
+
+def _run_task(slot, request, version, deadline):
+    """Run one optimization in a worker, reporting through the shared slot"""
+    model = _model(version)
+    slots = _worker['slots']
+    base = slot * SLOT_FIELDS
+
+    def report(iteration, best_score):
+        slots[base + BEST_SCORE] = best_score
+        slots[base + ITERATION] = iteration
+
+    def on_initial(initial_performance):
+        slots[base + INITIAL_RATE] = initial_performance['total_completion_rate']
+
+    def should_stop():
+        return slots[base + CANCEL] != 0
+
+    # Restarts run one after another: the pool already keeps every core busy
+    result = run_optimization(request, model, progress_callback=report, should_stop=should_stop,
+                              on_initial=on_initial, deadline=deadline, chain_workers=1)
+    return result, metrics.REGISTRY.drain()
+
+
+def _run_reoptimize(version, state, rates, outputs, seed, deadline):
+    """A session edit's warm-start run in a worker"""
+    result = reoptimize(_model(version), state, rates, outputs, seed, deadline=deadline)
+    return result, metrics.REGISTRY.drain()
+
+
+class WorkerPool:
+    """
+    Long-lived worker processes that run optimizations outside the server's
+    GIL.
+
+    Each worker loads the model once at startup (and again only when a task
+    asks for another version) and is replaced after max_tasks_per_worker
+    tasks (before Python 3.11, the whole pool is replaced once it has run
+    size * max_tasks_per_worker tasks). If a worker dies, the pool is rebuilt and the task retried once.
+    Progress, the initial completion rate and cancellation travel through a
+    small shared-memory array, one slot per running task; worker metrics are
+    returned with each result and merged into this process's registry.
+    """
+
+    def __init__(self, size, artifacts_path, version, inference_backend='sklearn', max_tasks_per_worker=None):
+        self.size = size
+        self.artifacts_path = artifacts_path
+        self.version = version
+        self.inference_backend = inference_backend
+        self.max_tasks_per_worker = max_tasks_per_worker or int(os.environ.get('OPTIMIZER_MAX_TASKS_PER_WORKER', 500))
+        self.tasks = 0
+        self.rebuilds = 0
+        self._executor_tasks = 0
+
+        # spawn: the server process has threads, which fork would copy mid-state
+        self._context = multiprocessing.get_context('spawn')
+        self._slots = self._context.RawArray('d', size * SLOT_FIELDS)
+        self._free_slots = queue.Queue()
+        for slot in range(size):
+            self._free_slots.put(slot)
+        self._lock = threading.Lock()
+        self._executor = self._start()
+
+    def _start(self):
+        recycling = {'max_tasks_per_child': self.max_tasks_per_worker} if PER_CHILD_RECYCLING else {}
+        return ProcessPoolExecutor(
+            max_workers=self.size,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self.artifacts_path, self.version, self.inference_backend, self._slots),
+            **recycling
+        )
+
+    def _rebuild(self, broken):
+        with self._lock:
+            if self._executor is broken:
+                self._executor = self._start()
+                self._executor_tasks = 0
+                self.rebuilds += 1
+            return self._executor
+
+    def _submit(self, fn, *args):
+        """Submit to the current executor; returns (executor, future)"""
+        with self._lock:
+            executor = self._executor
+            future = executor.submit(fn, *args)
+            self.tasks += 1
+            self._executor_tasks += 1
+            if not PER_CHILD_RECYCLING and self._executor_tasks >= self.size * self.max_tasks_per_worker:
+                # Queued and running tasks still finish on the old workers
+                self._executor = self._start()
+                self._executor_tasks = 0
+                executor.shutdown(wait=False)
+        return executor, future
+
+    def run(self, request, version, progress_callback=None, should_stop=None, on_initial=None, deadline=None):
+        """
+        run_optimization in a worker process, blocking until it finishes.
+
+        Callbacks run in the calling thread: progress and on_initial are
+        relayed every POLL_INTERVAL, and should_stop is checked as often and
+        forwarded to the worker.
+        """
+        slot = self._free_slots.get()
+        try:
+            result, snapshot = self._run(slot, request, version, progress_callback, should_stop, on_initial,
+                                         deadline)
+        finally:
+            self._free_slots.put(slot)
+        metrics.REGISTRY.merge(snapshot)
+        return result
+
+    def _run(self, slot, request, version, progress_callback, should_stop, on_initial, deadline):
+        base = slot * SLOT_FIELDS
+        for attempt in range(2):
+            self._slots[base:base + SLOT_FIELDS] = [0, math.nan, math.nan, 0]
+            relayed = {'iteration': 0, 'initial': False}
+            executor = self._executor
+            try:
+                executor, future = self._submit(_run_task, slot, request, version, deadline)
+                while True:
+                    try:
+                        outcome = future.result(timeout=POLL_INTERVAL)
+                        break
+                    except TimeoutError:
+                        pass
+                    self._relay(base, relayed, progress_callback, on_initial)
+                    if should_stop is not None and should_stop():
+                        self._slots[base + CANCEL] = 1
+                self._relay(base, relayed, progress_callback, on_initial)
+                return outcome
+            except BrokenProcessPool:
+                # A worker died (killed, out of memory); start fresh workers
+                self._rebuild(executor)
+                if attempt == 1 or (should_stop is not None and should_stop()):
+                    raise RuntimeError("Optimization worker process crashed")
+
+    def reoptimize(self, model, state, rates, outputs, seed, deadline=None, should_stop=None):
+        """
+        sessions.reoptimize in a worker process, blocking until it finishes.
+        The run is short, so should_stop is not forwarded.
+        """
+        for attempt in range(2):
+            executor = self._executor
+            try:
+                executor, future = self._submit(_run_reoptimize, model.version, state, rates, outputs, seed,
+                                                deadline)
+                result, snapshot = future.result()
+                break
+            except BrokenProcessPool:
+                self._rebuild(executor)
+                if attempt == 1:
+                    raise RuntimeError("Optimization worker process crashed")
+        metrics.REGISTRY.merge(snapshot)
+        return result
+
+    def _relay(self, base, relayed, progress_callback, on_initial):
+        if on_initial is not None and not relayed['initial'] and not math.isnan(self._slots[base + INITIAL_RATE]):
+            relayed['initial'] = True
+            on_initial({'total_completion_rate': self._slots[base + INITIAL_RATE]})
+        iteration = int(self._slots[base + ITERATION])
+        if progress_callback is not None and iteration != relayed['iteration']:
+            relayed['iteration'] = iteration
+            progress_callback(iteration, self._slots[base + BEST_SCORE])
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'process',
+                'workers': self.size,
+                'tasks': self.tasks,
+                'rebuilds': self.rebuilds,
+                'max_tasks_per_worker': self.max_tasks_per_worker
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,300 @@
+"""
+Backtest the optimizer on historical plant-days, without a server.
+
+    python -m backtest.run --output backtest.csv --plant-size 20 --workers 8
+    python -m backtest.run --output backtest.csv --resume      # continue an interrupted run
+    python -m backtest.run --output backtest.parquet           # needs pyarrow
+
+Run from the backend directory. Dataset rows are grouped into plant-days of
+--plant-size consecutive teams per file; each plant-day is optimized with
+optimize_worker_allocation in a process pool (the model is loaded once per
+worker) and compared with the actual final_output.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import warnings
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+
+from app.dataset_store import dataset_files, normalize_frame
+from app.ml.feature_builder import TEAM_FIELDS
+from app.ml.model_loader import ModelLoader
+from app.ml.optimizer import optimize_worker_allocation
+
+COLUMNS = [
+    'plant_id', 'file', 'first_row', 'teams', 'seed',
+    'actual_output', 'daily_target', 'actual_completion_rate',
+    'initial_output', 'optimized_output', 'optimized_completion_rate',
+    'gain', 'improvement_pct', 'migrations', 'iterations', 'stop_reason',
+    'migration_log', 'seconds'
+]
+
+# Column types for the Parquet conversion (everything else is a float)
+INTEGER_COLUMNS = {'first_row', 'teams', 'seed', 'daily_target', 'migrations', 'iterations'}
+STRING_COLUMNS = {'plant_id', 'file', 'stop_reason', 'migration_log'}
+
+# Model bundle held by each worker process, set once by _init_worker
+_worker_model = None
+
+
+def _init_worker(artifacts_path, version, inference_backend):
+    """Pool initializer: load the model bundle from disk once per worker"""
+    global _worker_model
+    warnings.simplefilter('ignore')
+    loader = ModelLoader(inference_backend=inference_backend)
+    loader.artifacts_path = artifacts_path
+    _worker_model = loader.load_bundle(version)
+
+
+def plant_days(files, plant_size, chunksize=10000):
+    """
+    Stream plant-days from the dataset files.
+
+    Each file is read chunk by chunk and normalized like /sample-data;
+    consecutive valid rows with a final_output are grouped into plant-days
+    of plant_size teams (a shorter last group per file is dropped). Memory
+    depends on chunksize, not on the file size.
+
+    Yields:
+        (plant_id, file name, first row, (plant_size x 8) team matrix, actual output)
+    """
+    import pandas as pd
+
+    for path in files:
+        name = os.path.basename(path)
+        pending_teams, pending_output, pending_rows = [], [], []
+        for chunk in pd.read_csv(path, skipinitialspace=True, chunksize=chunksize):
+            frame = normalize_frame(chunk)
+            if 'final_output' not in frame.columns:
+                break
+            frame = frame.dropna(subset=['final_output'])
+            pending_teams.append(frame[TEAM_FIELDS].to_numpy(dtype=np.int32))
+            pending_output.append(frame['final_output'].to_numpy(dtype=np.float64))
+            pending_rows.append(frame.index.to_numpy())
+
+            teams = np.concatenate(pending_teams)
+            outputs = np.concatenate(pending_output)
+            rows = np.concatenate(pending_rows)
+            complete = len(teams) // plant_size * plant_size
+            for start in range(0, complete, plant_size):
+                first_row = int(rows[start])
+                yield (f'{name}:{first_row}', name, first_row,
+                       teams[start:start + plant_size], float(outputs[start:start + plant_size].sum()))
+            pending_teams, pending_output, pending_rows = [teams[complete:]], [outputs[complete:]], [rows[complete:]]
+
+
+def plant_seed(seed, plant_id):
+    """Per-plant seed that does not depend on scheduling order"""
+    return int(np.random.SeedSequence([seed, *plant_id.encode()]).generate_state(1)[0])
+
+
+def _optimize_plant(plant_id, name, first_row, teams, actual_output, seed, optimizer_kwargs, model=None):
+    model = model or _worker_model
+    start = time.perf_counter()
+    result = optimize_worker_allocation(
+        teams, model.rf_model, model.scaler, model.feature_order, seed=seed, **optimizer_kwargs
+    )
+    daily_target = int(teams[:, -1].sum())
+    return {
+        'plant_id': plant_id,
+        'file': name,
+        'first_row': first_row,
+        'teams': len(teams),
+        'seed': seed,
+        'actual_output': actual_output,
+        'daily_target': daily_target,
+        'actual_completion_rate': actual_output / daily_target,
+        'initial_output': result['initial_performance']['total_output'],
+        'optimized_output': result['best_performance']['total_output'],
+        'optimized_completion_rate': result['best_performance']['total_completion_rate'],
+        'gain': result['gain'],
+        'improvement_pct': result['improvement_pct'],
+        'migrations': result['migrations'],
+        'iterations': result['iterations'],
+        'stop_reason': result['stop_reason'],
+        'migration_log': json.dumps(result['migration_log'], sort_keys=True),
+        'seconds': time.perf_counter() - start
+    }
+
+
+def completed_plants(path):
+    """
+    plant_ids already in a checkpoint CSV. A partial last line left by an
+    interrupted run is cut off so appending continues on a clean row.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    with open(path, 'rb+') as f:
+        data = f.read()
+        if not data.endswith(b'\n'):
+            f.truncate(data.rfind(b'\n') + 1)
+    with open(path, newline='') as f:
+        return {row['plant_id'] for row in csv.DictReader(f)}
+
+
+def convert_to_parquet(csv_path, parquet_path, block_size=1 << 20):
+    """Stream the checkpoint CSV into a Parquet file, one record batch at a time"""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    column_types = {
+        column: pa.string() if column in STRING_COLUMNS else pa.int64() if column in INTEGER_COLUMNS else pa.float64()
+        for column in COLUMNS
+    }
+    reader = pa_csv.open_csv(
+        csv_path,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(column_types=column_types)
+    )
+    with pq.ParquetWriter(parquet_path, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+
+
+def run_plants(plants, args, optimizer_kwargs, handle, on_result):
+    """
+    Optimize plant-days, calling on_result(row) as each one finishes.
+
+    With more than one worker at most 2 x workers plant-days are in flight,
+    so memory stays bounded however long the input is.
+    """
+    if args.workers <= 1:
+        for plant_id, name, first_row, teams, actual in plants:
+            on_result(_optimize_plant(plant_id, name, first_row, teams, actual,
+                                      plant_seed(args.seed, plant_id), optimizer_kwargs, model=handle))
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(args.artifacts, handle.version, args.inference_backend)
+    ) as executor:
+        pending = set()
+        for plant_id, name, first_row, teams, actual in plants:
+            pending.add(executor.submit(_optimize_plant, plant_id, name, first_row, teams, actual,
+                                        plant_seed(args.seed, plant_id), optimizer_kwargs))
+            if len(pending) >= 2 * args.workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    on_result(future.result())
+        for future in wait(pending).done:
+            on_result(future.result())
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the optimizer on historical plant-days")
+    parser.add_argument('--data', help="CSV file or directory of garment*.csv (default: the repo's dataset/)")
+    parser.add_argument('--output', required=True, help="results file (.csv, or .parquet with pyarrow)")
+    parser.add_argument('--report', help="throughput report JSON (default: <output>.report.json)")
+    parser.add_argument('--resume', action='store_true', help="skip plant-days already in the checkpoint")
+    parser.add_argument('--plant-size', type=int, default=20, help="teams per plant-day")
+    parser.add_argument('--limit', type=int, help="stop after this many plant-days")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--chunksize', type=int, default=10000, help="CSV rows read at a time")
+    parser.add_argument('--artifacts', default=os.path.join(os.path.dirname(__file__), '..', 'artifacts'),
+                        help="artifacts directory")
+    parser.add_argument('--model-version', help="model version (default: the serving default)")
+    parser.add_argument('--inference-backend', default=os.environ.get('INFERENCE_BACKEND', 'sklearn'),
+                        choices=['sklearn', 'compiled'])
+    parser.add_argument('--seed', type=int, default=0, help="base seed; each plant-day derives its own")
+    parser.add_argument('--max-iterations', type=int, default=1000)
+    parser.add_argument('--temperature', type=float, default=2.0)
+    parser.add_argument('--cooling-rate', type=float, default=0.995)
+    parser.add_argument('--batch-size', type=int, default=1)
+    parser.add_argument('--no-bottleneck', action='store_true', help="disable the bottleneck penalty")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+
+    parquet = args.output.endswith('.parquet')
+    if parquet:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("Parquet output needs pyarrow (pip install pyarrow); use a .csv output instead", file=sys.stderr)
+            return 1
+    checkpoint = args.output + '.checkpoint.csv' if parquet else args.output
+
+    files = dataset_files(args.data)
+    if not files:
+        print("No dataset files found", file=sys.stderr)
+        return 1
+
+    loader = ModelLoader(inference_backend=args.inference_backend)
+    loader.artifacts_path = args.artifacts
+    handle = loader.load_bundle(args.model_version)
+
+    done = completed_plants(checkpoint) if args.resume else set()
+    plants = (plant for plant in plant_days(files, args.plant_size, args.chunksize) if plant[0] not in done)
+    if args.limit is not None:
+        plants = (plant for _, plant in zip(range(args.limit), plants))
+
+    optimizer_kwargs = {
+        'max_iterations': args.max_iterations,
+        'temperature': args.temperature,
+        'cooling_rate': args.cooling_rate,
+        'batch_size': args.batch_size,
+        'bottleneck_aware': not args.no_bottleneck
+    }
+
+    totals = {'plants': 0, 'teams': 0, 'gain': 0.0, 'actual_output': 0.0, 'optimized_output': 0.0}
+    append = args.resume and bool(done)
+    start = time.perf_counter()
+    with open(checkpoint, 'a' if append else 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        if not append:
+            writer.writeheader()
+
+        def on_result(row):
+            writer.writerow(row)
+            f.flush()
+            totals['plants'] += 1
+            totals['teams'] += row['teams']
+            totals['gain'] += row['gain']
+            totals['actual_output'] += row['actual_output']
+            totals['optimized_output'] += row['optimized_output']
+            if totals['plants'] % 100 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"✓ {totals['plants']} plant-days ({totals['plants'] / elapsed:.1f}/s)")
+
+        run_plants(plants, args, optimizer_kwargs, handle, on_result)
+    seconds = time.perf_counter() - start
+
+    if parquet:
+        convert_to_parquet(checkpoint, args.output)
+        os.remove(checkpoint)
+
+    report = {
+        'model_version': handle.version,
+        'inference_backend': args.inference_backend,
+        'workers': args.workers,
+        'plant_size': args.plant_size,
+        'plants': totals['plants'],
+        'resumed_plants': len(done),
+        'teams': totals['teams'],
+        'seconds': seconds,
+        'plants_per_sec': totals['plants'] / seconds if seconds else 0.0,
+        'teams_per_sec': totals['teams'] / seconds if seconds else 0.0,
+        'mean_gain': totals['gain'] / totals['plants'] if totals['plants'] else 0.0,
+        'actual_output': totals['actual_output'],
+        'optimized_output': totals['optimized_output'],
+        'optimizer': optimizer_kwargs
+    }
+    with open(args.report or args.output + '.report.json', 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Optimized {report['plants']} plant-days in {seconds:.1f} s "
+          f"({report['plants_per_sec']:.1f} plants/s) -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
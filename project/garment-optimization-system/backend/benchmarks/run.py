@@ -0,0 +1,261 @@
+"""
+Benchmark the evaluator and optimizer across plant sizes, without a server.
+
+    python -m benchmarks.run --sizes 2,100,1000 --output results.json
+    python -m benchmarks.run --baseline baseline.json    # flag regressions
+    python -m benchmarks.run --save-baseline baseline.json
+
+Run from the backend directory. Uses a deterministic stand-in model with
+the shipped scaler and feature_order (see benchmarks.synthetic).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import types
+import warnings
+
+import numpy as np
+import sklearn
+
+from app.ml.evaluator import evaluate_system, evaluate_system_batch
+from app.ml.feature_builder import build_team_features, compile_feature_layout, team_matrix
+from app.ml.greedy import optimize_greedy
+from app.ml.optimizer import optimize_worker_allocation
+from app.ml.prediction_cache import prediction_cache
+from benchmarks.synthetic import build_standin_model, generate_plant
+
+DEFAULT_SIZES = [2, 10, 100, 1000, 10000]
+
+
+def measure(fn, repeats):
+    """Wall-clock seconds for each of `repeats` calls"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def peak_memory_kb(fn):
+    """Peak traced Python allocation during one call"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def summarize(timings, units_per_call, unit, peak_kb):
+    timings_ms = np.asarray(timings) * 1000
+    return {
+        'repeats': len(timings),
+        'mean_ms': float(timings_ms.mean()),
+        'p50_ms': float(np.percentile(timings_ms, 50)),
+        'p90_ms': float(np.percentile(timings_ms, 90)),
+        'p99_ms': float(np.percentile(timings_ms, 99)),
+        'throughput': float(units_per_call / (timings_ms.mean() / 1000)),
+        'throughput_unit': f'{unit}/s',
+        'peak_memory_kb': float(peak_kb)
+    }
+
+
+def call_optimize_route(app, body):
+    """POST /optimize through the ASGI app in-process"""
+    payload = json.dumps(body).encode()
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': 'POST', 'scheme': 'http', 'path': '/optimize', 'raw_path': b'/optimize',
+        'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 8000),
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())]
+    }
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    response = {}
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+
+    asyncio.run(app(scope, receive, send))
+    if response.get('status') != 200:
+        raise RuntimeError(f"/optimize returned {response.get('status')}")
+
+
+def bench_size(n_teams, model, args):
+    rf_model, scaler, feature_order = model
+    teams = generate_plant(n_teams, seed=args.seed)
+    results = {}
+
+    def features():
+        for team in teams:
+            build_team_features(team)
+
+    results['build_team_features'] = summarize(
+        measure(features, args.repeats), n_teams, 'teams', peak_memory_kb(features)
+    )
+
+    layout = compile_feature_layout(feature_order)
+    buffer = layout.allocate(n_teams)
+
+    def feature_matrix():
+        layout.build(team_matrix(teams), buffer)
+
+    results['build_feature_matrix'] = summarize(
+        measure(feature_matrix, args.repeats), n_teams, 'teams', peak_memory_kb(feature_matrix)
+    )
+
+    def per_team():
+        evaluate_system(teams, rf_model, scaler, feature_order)
+
+    # The per-team path costs one model call per team; keep it affordable
+    if n_teams <= args.max_per_team:
+        results['evaluate_system'] = summarize(
+            measure(per_team, args.repeats), n_teams, 'teams', peak_memory_kb(per_team)
+        )
+
+    def batch():
+        evaluate_system_batch(teams, rf_model, scaler, feature_order, cache=None)
+
+    results['evaluate_system_batch'] = summarize(
+        measure(batch, args.repeats), n_teams, 'teams', peak_memory_kb(batch)
+    )
+
+    # Optimizer stages start from a cold prediction cache so runs are comparable
+    def optimize():
+        prediction_cache.clear()
+        optimize_worker_allocation(
+            teams, rf_model, scaler, feature_order, max_iterations=args.iterations, seed=args.seed
+        )
+
+    results['optimize_worker_allocation'] = summarize(
+        measure(optimize, args.opt_repeats), args.iterations, 'iterations', peak_memory_kb(optimize)
+    )
+
+    def greedy():
+        prediction_cache.clear()
+        optimize_greedy(teams, rf_model, scaler, feature_order, max_iterations=args.iterations)
+
+    results['optimize_greedy'] = summarize(
+        measure(greedy, args.opt_repeats), 1, 'runs', peak_memory_kb(greedy)
+    )
+
+    if not args.skip_api:
+        import app.main as main
+        from app.jobs import JobManager
+        from app.ml.model_loader import ModelHandle
+        from app.result_cache import ResultCache
+
+        main.model_loader = types.SimpleNamespace(
+            current=ModelHandle('standin', rf_model, scaler, feature_order), is_loaded=lambda: True
+        )
+        main.job_manager = JobManager(max_workers=1, max_queue=1)
+        main.result_cache = ResultCache(maxsize=0)  # time the computation, not cache hits
+        body = {'teams': teams, 'seed': args.seed}
+        try:
+            def route():
+                prediction_cache.clear()
+                call_optimize_route(main.app, body)
+
+            results['optimize_route'] = summarize(
+                measure(route, args.opt_repeats), 1, 'requests', peak_memory_kb(route)
+            )
+        finally:
+            main.job_manager.shutdown()
+
+    return results
+
+
+def compare(current, baseline, threshold):
+    """List stages whose p50 got slower than baseline by more than threshold"""
+    regressions = []
+    for size, stages in current['results'].items():
+        for stage, stats in stages.items():
+            base = baseline.get('results', {}).get(size, {}).get(stage)
+            if base is None:
+                continue
+            ratio = stats['p50_ms'] / base['p50_ms'] if base['p50_ms'] > 0 else 1.0
+            if ratio > 1 + threshold:
+                regressions.append({
+                    'n_teams': int(size),
+                    'stage': stage,
+                    'baseline_p50_ms': base['p50_ms'],
+                    'current_p50_ms': stats['p50_ms'],
+                    'slowdown': ratio
+                })
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark evaluator and optimizer stages")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated plant sizes (teams)")
+    parser.add_argument('--repeats', type=int, default=20, help="timed runs per evaluation stage")
+    parser.add_argument('--opt-repeats', type=int, default=3, help="timed runs per optimizer stage")
+    parser.add_argument('--iterations', type=int, default=200, help="annealing iterations per optimizer run")
+    parser.add_argument('--max-per-team', type=int, default=100,
+                        help="largest plant to time with the per-team evaluate_system")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-api', action='store_true', help="do not time the /optimize route")
+    parser.add_argument('--output', help="write results JSON here (default: stdout)")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="allowed p50 slowdown before a stage is flagged (0.2 = 20%%)")
+    parser.add_argument('--save-baseline', help="also write results JSON here as the new baseline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    model = build_standin_model(seed=args.seed)
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scikit_learn': sklearn.__version__,
+            'machine': platform.machine(),
+            'seed': args.seed,
+            'iterations': args.iterations
+        },
+        'results': {str(size): bench_size(size, model, args) for size in sizes}
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        report['regressions'] = compare(report, baseline, args.threshold)
+        for regression in report['regressions']:
+            print(
+                f"REGRESSION {regression['stage']} @ {regression['n_teams']} teams: "
+                f"{regression['baseline_p50_ms']:.2f} ms -> {regression['current_p50_ms']:.2f} ms "
+                f"({regression['slowdown']:.2f}x)",
+                file=sys.stderr
+            )
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            f.write(output)
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
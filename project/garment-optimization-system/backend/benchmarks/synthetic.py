@@ -0,0 +1,66 @@
+import os
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+from app.ml.feature_builder import build_team_features
+
+ARTIFACTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'artifacts')
+
+
+def generate_plant(n_teams, seed=0):
+    """
+    Random but valid team configurations.
+
+    Every team passes validate_teams: department workers sum to
+    total_workers and each attendance is between 1 and its department size.
+    """
+    rng = np.random.RandomState(seed)
+    teams = []
+    for _ in range(n_teams):
+        cutting, sewing, finishing = (int(v) for v in rng.randint(5, 60, size=3))
+        teams.append({
+            'total_workers': cutting + sewing + finishing,
+            'cutting_workers': cutting,
+            'sewing_workers': sewing,
+            'finishing_workers': finishing,
+            'cutting_attendance': int(rng.randint(1, cutting + 1)),
+            'sewing_attendance': int(rng.randint(1, sewing + 1)),
+            'finishing_attendance': int(rng.randint(1, finishing + 1)),
+            'daily_target': int(rng.randint(100, 1500))
+        })
+    return teams
+
+
+def load_preprocessing():
+    """The shipped scaler and feature order"""
+    scaler = joblib.load(os.path.join(ARTIFACTS_PATH, 'scaler.pkl'))
+    feature_order = joblib.load(os.path.join(ARTIFACTS_PATH, 'feature_order.pkl'))
+    return scaler, feature_order
+
+
+def build_standin_model(n_estimators=100, max_depth=12, n_train=2000, seed=0):
+    """
+    Deterministic stand-in for rf_completion_model.pkl.
+
+    A RandomForestRegressor fitted on synthetic teams with the shipped
+    scaler and feature_order, so it has the same inputs and a similar cost
+    profile to the real model. The target is the weakest department's
+    attendance relative to the largest department.
+
+    Returns:
+        (rf_model, scaler, feature_order)
+    """
+    scaler, feature_order = load_preprocessing()
+
+    train_teams = generate_plant(n_train, seed=seed + 1)
+    X = np.array([[build_team_features(t)[f] for f in feature_order] for t in train_teams])
+    y = np.array([
+        min(t['cutting_attendance'], t['sewing_attendance'], t['finishing_attendance']) /
+        max(t['cutting_workers'], t['sewing_workers'], t['finishing_workers'])
+        for t in train_teams
+    ])
+    rf_model = RandomForestRegressor(n_estimators=n_estimators, max_depth=max_depth, random_state=seed)
+    rf_model.fit(scaler.transform(X), y)
+    return rf_model, scaler, feature_order
@@ -0,0 +1,81 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.synthetic import build_standin_model, generate_plant
+
+collect_ignore = ['test_ml.py']  # manual script against a live server
+
+
+@pytest.fixture
+def make_teams():
+    return generate_plant
+
+
+@pytest.fixture(scope='session')
+def artifacts():
+    """Shipped scaler/feature order plus a small stand-in forest"""
+    return build_standin_model(n_estimators=10, max_depth=6, n_train=300, seed=0)
+
+
+class ASGIClient:
+    """Minimal in-process HTTP client for the FastAPI app (httpx is not a dependency)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method, path, body=None, query=b'', headers=(), disconnect=None):
+        """
+        Send one request; returns (status, headers, body bytes).
+
+        disconnect: optional asyncio.Event; the client disconnects once it is set
+        """
+        payload = json.dumps(body).encode() if body is not None else b''
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query, 'root_path': '',
+            'client': ('127.0.0.1', 0), 'server': ('127.0.0.1', 8000),
+            'headers': [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(payload)).encode())] + list(headers)
+        }
+        messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+        response = {'status': None, 'headers': {}, 'body': b''}
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            if disconnect is not None:
+                await disconnect.wait()
+            else:
+                await asyncio.Event().wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response['status'] = message['status']
+                response['headers'] = {k.decode(): v.decode() for k, v in message['headers']}
+            elif message['type'] == 'http.response.body':
+                response['body'] += message.get('body', b'')
+
+        await self.app(scope, receive, send)
+        return response['status'], response['headers'], response['body']
+
+
+@pytest.fixture
+def api(artifacts, monkeypatch):
+    """The app wired to the stand-in model, a small job pool and fresh caches"""
+    from app import main
+    from app.jobs import JobManager
+    from app.ml.model_loader import ModelHandle
+    from app.result_cache import ResultCache
+    from app.sessions import SessionStore
+
+    loader = SimpleNamespace(current=ModelHandle('v1', *artifacts), is_loaded=lambda: True, timings={})
+    monkeypatch.setattr(main, 'model_loader', loader)
+    monkeypatch.setattr(main, 'job_manager', JobManager(max_workers=1, max_queue=4))
+    monkeypatch.setattr(main, 'result_cache', ResultCache(maxsize=16, ttl=60, path=''))
+    monkeypatch.setattr(main, 'session_store', SessionStore(ttl=60, max_bytes=10 ** 6))
+    yield ASGIClient(main.app)
+    main.job_manager.shutdown()
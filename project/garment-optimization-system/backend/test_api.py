@@ -0,0 +1,178 @@
+import asyncio
+import json
+import threading
+
+from app import main
+from app.jobs import JobManager
+from app.ml.model_loader import ModelHandle
+from app.result_cache import ResultCache, request_key
+from app.schemas import OptimizationRequest
+
+
+def blocked_pool():
+    """Occupy the fixture's single job worker until the returned event is set"""
+    release = threading.Event()
+    main.job_manager.submit(lambda job: release.wait(5))
+    return release
+
+
+def test_cancelling_a_job_leaves_identical_optimize_requests_running(api, make_teams):
+    body = {'teams': make_teams(4, seed=1), 'seed': 2}
+
+    async def scenario():
+        release = blocked_pool()
+        _, _, created = await api.request('POST', '/jobs', body)
+        optimize = asyncio.create_task(api.request('POST', '/optimize', body))
+        await asyncio.sleep(0.05)
+        cancelled, _, _ = await api.request('DELETE', f"/jobs/{json.loads(created)['job_id']}")
+        release.set()
+        return cancelled, await optimize
+
+    cancelled, (status, headers, result) = asyncio.run(scenario())
+    assert cancelled == 200
+    assert status == 200 and headers['x-cache'] == 'MISS'
+    assert json.loads(result)['teams_after']
+
+
+def test_optimize_job_cancelled_before_it_starts_is_503(api, make_teams):
+    async def scenario():
+        release = blocked_pool()
+        optimize = asyncio.create_task(api.request('POST', '/optimize', {'teams': make_teams(4, seed=1)}))
+        await asyncio.sleep(0.05)
+        queued = [job for job in main.job_manager._jobs.values() if job.status == 'queued']
+        queued[0].cancel()  # as on shutdown
+        release.set()
+        return await optimize
+
+    status, headers, _ = asyncio.run(scenario())
+    assert status == 503 and headers['retry-after'] == '1'
+
+
+def test_session_edits_run_on_the_job_pool(api, make_teams, monkeypatch):
+    async def scenario():
+        _, _, created = await api.request('POST', '/sessions', {'teams': make_teams(6, seed=3), 'seed': 1})
+        session_id = json.loads(created)['session_id']
+        edit = {'changes': [{'team': 0, 'department': 'sewing', 'delta': -1}]}
+        status, _, updated = await api.request('PATCH', f'/sessions/{session_id}', edit)
+
+        monkeypatch.setattr(main, 'job_manager', JobManager(max_workers=1, max_queue=0))
+        release = blocked_pool()
+        full, _, _ = await api.request('PATCH', f'/sessions/{session_id}', edit)
+        release.set()
+        main.job_manager.shutdown()
+        return status, json.loads(updated), full
+
+    status, updated, full = asyncio.run(scenario())
+    assert status == 200 and updated['revision'] == 1 and updated['edited_teams'] == [0]
+    assert full == 429
+
+
+def stream_events(body):
+    return [json.loads(line[len(b'data: '):]) for line in body.split(b'\n\n') if line]
+
+
+def test_stream_sends_init_progress_then_complete(api, make_teams):
+    body = {'teams': make_teams(6, seed=3), 'seed': 2}
+    status, headers, stream = asyncio.run(
+        api.request('POST', '/optimize-stream', body, query=b'progress_interval_ms=0'))
+    events = stream_events(stream)
+
+    assert status == 200 and headers['content-type'].startswith('text/event-stream')
+    assert [event['type'] for event in events[:2]] == ['init', 'progress']
+    assert {event['type'] for event in events[1:-1]} == {'progress'}
+    assert events[-1]['type'] == 'complete' and events[-1]['result']['teams_after']
+
+
+def test_stream_cancels_its_job_when_the_client_disconnects(api, make_teams):
+    body = {'teams': make_teams(200, seed=3), 'seed': 2, 'restarts': 8}
+
+    async def scenario():
+        disconnect = asyncio.Event()
+        stream = asyncio.create_task(
+            api.request('POST', '/optimize-stream', body, query=b'progress_interval_ms=0', disconnect=disconnect))
+        while not any(job.status == 'running' for job in main.job_manager._jobs.values()):
+            await asyncio.sleep(0.01)
+        disconnect.set()
+        return await asyncio.wait_for(stream, timeout=10)
+
+    _, _, stream = asyncio.run(scenario())
+    assert 'complete' not in [event['type'] for event in stream_events(stream)]
+    [job] = main.job_manager._jobs.values()
+    assert job.cancel_requested()
+
+
+def test_evaluate_batch_streams_ndjson(api, make_teams):
+    body = {'teams': make_teams(4, seed=1), 'sweep': {'max_delta': 1, 'departments': ['sewing']}}
+    status, headers, stream = asyncio.run(api.request('POST', '/evaluate/batch', body))
+    lines = [json.loads(line) for line in stream.splitlines()]
+
+    assert status == 200 and headers['content-type'] == 'application/x-ndjson'
+    assert [line['type'] for line in lines] == ['base'] + ['scenario'] * 8 + ['summary']
+    assert lines[-1]['scenarios'] == 8
+
+
+def test_optimize_caches_under_the_version_it_ran_with(api, make_teams, artifacts, monkeypatch):
+    body = {'teams': make_teams(4, seed=1), 'seed': 2}
+
+    async def scenario():
+        release = blocked_pool()
+        optimize = asyncio.create_task(api.request('POST', '/optimize', body))
+        await asyncio.sleep(0.05)
+        # A reload lands while the job is queued
+        monkeypatch.setattr(main.model_loader, 'current', ModelHandle('v2', *artifacts))
+        release.set()
+        return await optimize
+
+    status, _, result = asyncio.run(scenario())
+    request = OptimizationRequest(**body)
+    assert status == 200 and json.loads(result)['model_version'] == 'v1'
+    assert main.result_cache.get(request_key(request, 'v1')) is not None
+    assert main.result_cache.get(request_key(request, 'v2')) is None
+
+
+def test_persistent_cache_lookups_run_off_the_event_loop(api, make_teams, tmp_path, monkeypatch):
+    cache = ResultCache(maxsize=16, ttl=60, path=str(tmp_path / 'results.db'))
+    lookups = []
+    get = cache.get
+    monkeypatch.setattr(cache, 'get', lambda key: lookups.append(threading.current_thread()) or get(key))
+    monkeypatch.setattr(main, 'result_cache', cache)
+    body = {'teams': make_teams(4, seed=1), 'seed': 2}
+
+    async def scenario():
+        first = await api.request('POST', '/optimize', body)
+        second = await api.request('POST', '/optimize', body)
+        return first[1]['x-cache'], second[1]['x-cache']
+
+    assert asyncio.run(scenario()) == ('MISS', 'HIT')
+    assert lookups and threading.main_thread() not in lookups
+
+
+def test_job_cancelled_while_running_returns_its_partial_result(api, make_teams):
+    body = {'teams': make_teams(200, seed=3), 'seed': 2, 'restarts': 8}
+
+    async def scenario():
+        _, _, created = await api.request('POST', '/jobs', body)
+        job_id = json.loads(created)['job_id']
+        while main.job_manager.get(job_id).status != 'running':
+            await asyncio.sleep(0.01)
+        await api.request('DELETE', f'/jobs/{job_id}')
+        while main.job_manager.get(job_id).status == 'running':
+            await asyncio.sleep(0.01)
+        return await api.request('GET', f'/jobs/{job_id}/result')
+
+    status, headers, result = asyncio.run(scenario())
+    assert status == 200 and headers['x-job-status'] == 'cancelled'
+    assert json.loads(result)['stop_reason'] == 'cancelled'
+
+
+def test_job_cancelled_before_it_starts_has_no_result(api, make_teams):
+    async def scenario():
+        release = blocked_pool()
+        _, _, created = await api.request('POST', '/jobs', {'teams': make_teams(4, seed=1)})
+        job_id = json.loads(created)['job_id']
+        await api.request('DELETE', f'/jobs/{job_id}')
+        release.set()
+        return await api.request('GET', f'/jobs/{job_id}/result')
+
+    status, _, _ = asyncio.run(scenario())
+    assert status == 409
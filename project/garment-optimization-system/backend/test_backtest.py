@@ -0,0 +1,49 @@
+import csv
+
+import joblib
+import pandas as pd
+
+from backtest import run
+
+
+def write_inputs(tmp_path, artifacts, make_teams):
+    path = tmp_path / 'artifacts' / 'versions' / 'v1'
+    path.mkdir(parents=True)
+    for name, artifact in zip(['rf_completion_model.pkl', 'scaler.pkl', 'feature_order.pkl'], artifacts):
+        joblib.dump(artifact, path / name)
+
+    frame = pd.DataFrame(make_teams(23, seed=4))
+    frame['final_output'] = (frame['daily_target'] * 0.9).round()
+    frame.to_csv(tmp_path / 'garment_history.csv', index=False)
+
+
+def backtest(tmp_path, output, *extra):
+    status = run.main([
+        '--data', str(tmp_path / 'garment_history.csv'), '--artifacts', str(tmp_path / 'artifacts'),
+        '--output', str(output), '--plant-size', '5', '--max-iterations', '30', '--chunksize', '7', *extra
+    ])
+    assert status == 0
+    with open(output, newline='') as f:
+        return {row['plant_id']: row for row in csv.DictReader(f)}
+
+
+def test_resume_and_pool_match_a_single_pass(artifacts, make_teams, tmp_path):
+    write_inputs(tmp_path, artifacts, make_teams)
+    full = backtest(tmp_path, tmp_path / 'full.csv', '--workers', '1')
+
+    # 23 rows -> four plant-days of five teams; the short tail is dropped
+    assert sorted(full) == ['garment_history.csv:0', 'garment_history.csv:10',
+                            'garment_history.csv:15', 'garment_history.csv:5']
+
+    # Interrupted after two plant-days, mid-way through writing a third
+    partial = tmp_path / 'partial.csv'
+    lines = (tmp_path / 'full.csv').read_text().splitlines(keepends=True)
+    partial.write_text(''.join(lines[:3]) + lines[3][:20])
+    resumed = backtest(tmp_path, partial, '--workers', '1', '--resume')
+    assert resumed.keys() == full.keys()
+
+    pooled = backtest(tmp_path, tmp_path / 'pooled.csv', '--workers', '2')
+    for plant_id, row in full.items():
+        assert resumed[plant_id]['optimized_output'] == row['optimized_output']
+        assert pooled[plant_id]['migration_log'] == row['migration_log']
+        assert pooled[plant_id]['gain'] == row['gain']
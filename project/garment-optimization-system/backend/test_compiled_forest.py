@@ -0,0 +1,95 @@
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from app.ml.compiled_forest import CompiledForest
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.feature_builder import build_team_features
+from app.ml.model_loader import ModelLoader
+from benchmarks.synthetic import build_standin_model
+
+
+def test_compiled_forest_matches_sklearn(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(200, seed=7)
+    X = np.array([[build_team_features(t)[f] for f in feature_order] for t in teams])
+
+    compiled = CompiledForest.from_sklearn(rf_model, scaler)
+
+    np.testing.assert_allclose(compiled.predict(X), rf_model.predict(scaler.transform(X)), rtol=1e-9)
+    np.testing.assert_allclose(compiled.predict(X[0]), rf_model.predict(scaler.transform(X[:1])), rtol=1e-9)
+
+
+def test_evaluator_uses_raw_features_for_compiled_backend(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(30, seed=8)
+    compiled = CompiledForest.from_sklearn(rf_model, scaler)
+
+    expected = evaluate_system_batch(teams, rf_model, scaler, feature_order, cache=None)
+    actual = evaluate_system_batch(teams, compiled, scaler, feature_order, cache=None)
+
+    assert actual['total_output'] == pytest.approx(expected['total_output'])
+
+
+def test_model_loader_reuses_memory_mapped_compiled_forest(artifacts, make_teams, tmp_path):
+    rf_model, scaler, feature_order = artifacts
+    joblib.dump(rf_model, tmp_path / 'rf_completion_model.pkl')
+    joblib.dump(scaler, tmp_path / 'scaler.pkl')
+    joblib.dump(feature_order, tmp_path / 'feature_order.pkl')
+
+    def load():
+        loader = ModelLoader(inference_backend='compiled', mmap_mode='r')
+        loader.artifacts_path = str(tmp_path)
+        loader.load_artifacts()
+        return loader
+
+    first = load()
+    assert first.sklearn_model is not None
+
+    second = load()
+    assert second.sklearn_model is None  # built from artifacts/compiled/ without unpickling
+    assert isinstance(second.rf_model.threshold, np.memmap)
+
+    X = np.array([[build_team_features(t)[f] for f in feature_order] for t in make_teams(20, seed=11)])
+    np.testing.assert_allclose(second.rf_model.predict(X), rf_model.predict(scaler.transform(X)), rtol=1e-9)
+
+
+def test_rebuild_leaves_a_mapped_older_cache_intact(artifacts, make_teams, tmp_path):
+    rf_model, scaler, feature_order = artifacts
+    joblib.dump(rf_model, tmp_path / 'rf_completion_model.pkl')
+    joblib.dump(scaler, tmp_path / 'scaler.pkl')
+    joblib.dump(feature_order, tmp_path / 'feature_order.pkl')
+    X = np.array([[build_team_features(t)[f] for f in feature_order] for t in make_teams(20, seed=11)])
+
+    def load():
+        loader = ModelLoader(inference_backend='compiled', mmap_mode='r')
+        loader.artifacts_path = str(tmp_path)
+        return loader.load_bundle()
+
+    old = load()
+    assert isinstance(old.rf_model.threshold, np.memmap)
+    old_cache = os.path.dirname(old.rf_model.threshold.filename)
+
+    # A retrained pickle changes the signature; the new cache goes to its own directory
+    new_model = build_standin_model(n_estimators=5, max_depth=4, n_train=200, seed=1)[0]
+    joblib.dump(new_model, tmp_path / 'rf_completion_model.pkl')
+    new = load()
+
+    assert os.path.dirname(new.rf_model.threshold.filename) != old_cache
+    assert os.listdir(tmp_path / 'compiled') == [os.path.basename(os.path.dirname(new.rf_model.threshold.filename))]
+    np.testing.assert_allclose(old.rf_model.predict(X), rf_model.predict(scaler.transform(X)), rtol=1e-9)
+    np.testing.assert_allclose(new.rf_model.predict(X), new_model.predict(scaler.transform(X)), rtol=1e-9)
+
+
+def test_save_never_rewrites_a_published_cache(artifacts, tmp_path):
+    rf_model, scaler, _ = artifacts
+    compiled = CompiledForest.from_sklearn(rf_model, scaler)
+    assert compiled.save(tmp_path / 'cache', signature=['a'])
+    before = (tmp_path / 'cache' / 'threshold.npy').stat().st_ino
+
+    assert not compiled.save(tmp_path / 'cache', signature=['b'])
+    assert (tmp_path / 'cache' / 'threshold.npy').stat().st_ino == before
+    assert CompiledForest.load(tmp_path / 'cache', signature=['a']) is not None
+    assert sorted(os.listdir(tmp_path)) == ['cache']
@@ -0,0 +1,34 @@
+import os
+
+from app.dataset_store import DatasetStore
+from app.utils.validators import validate_teams
+
+ATTENDANCE_CSV = """total_workers,cutting_workers,sewing_workers,finishing_workers,cutting_attendance,sewing_attendance,finishing_attendance,daily_target
+106,25,52,29,25,50,18,733
+133,54,40,39,39,33,38,1156
+"""
+
+ABSENCE_CSV = """day_of_week,total_workers,cutting_workers,sewing_workers,finishing_workers,absent_workers,,,daily_target,bottleneck_department
+1,52,10,34,8,9,,,129,Finishing
+2,73,11,44,18,6,,,200,Cutting
+"""
+
+
+def test_reads_mixed_layouts_and_reloads_on_change(tmp_path):
+    (tmp_path / 'garment1.csv').write_text(ATTENDANCE_CSV)
+    (tmp_path / 'garment2.csv').write_text(ABSENCE_CSV)
+    store = DatasetStore(str(tmp_path))
+
+    teams, total_rows = store.sample(10, seed=1)
+    assert total_rows == 4
+    assert validate_teams(teams)
+    absent_team = next(t for t in teams if t['total_workers'] == 52)
+    assert (absent_team['cutting_attendance'], absent_team['sewing_attendance'],
+            absent_team['finishing_attendance']) == (8, 28, 7)
+    assert store.sample(3, seed=7) == store.sample(3, seed=7)
+
+    path = tmp_path / 'garment1.csv'
+    path.write_text(ATTENDANCE_CSV + "30,10,10,10,9,9,9,300\n")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert len(store) == 5
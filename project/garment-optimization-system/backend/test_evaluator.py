@@ -0,0 +1,64 @@
+import copy
+
+import numpy as np
+import pytest
+
+from app.ml.evaluator import evaluate_system, evaluate_system_batch
+from app.ml.feature_builder import build_team_features, compile_feature_layout, team_matrix
+from app.ml.prediction_cache import PredictionCache
+
+
+@pytest.mark.parametrize('bottleneck_aware', [True, False])
+def test_batch_matches_per_team(artifacts, make_teams, bottleneck_aware):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(50)
+
+    expected = evaluate_system(teams, rf_model, scaler, feature_order, bottleneck_aware)
+    actual = evaluate_system_batch(teams, rf_model, scaler, feature_order, bottleneck_aware)
+
+    assert actual['total_completion_rate'] == pytest.approx(expected['total_completion_rate'])
+    assert actual['total_output'] == pytest.approx(expected['total_output'])
+    assert actual['total_target'] == expected['total_target']
+    assert len(actual['team_metrics']) == len(expected['team_metrics'])
+    for got, want in zip(actual['team_metrics'], expected['team_metrics']):
+        assert got['completion_rate'] == pytest.approx(want['completion_rate'])
+        assert got['output'] == pytest.approx(want['output'])
+        assert got['target'] == want['target']
+
+
+def test_prediction_cache_hits_and_eviction(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(20, seed=3)
+    cache = PredictionCache(maxsize=15)
+
+    uncached = evaluate_system_batch(teams, rf_model, scaler, feature_order, cache=None)
+    first = evaluate_system_batch(teams, rf_model, scaler, feature_order, cache=cache)
+    assert cache.stats()['misses'] == 20
+    assert cache.stats()['size'] == 15
+
+    second = evaluate_system_batch(teams[-15:], rf_model, scaler, feature_order, cache=cache)
+    assert cache.stats()['hits'] == 15
+    assert first['total_output'] == pytest.approx(uncached['total_output'])
+    assert second['team_metrics'] == first['team_metrics'][-15:]
+
+    # A different model invalidates the cached entries
+    other_model = copy.deepcopy(rf_model)
+    evaluate_system_batch(teams[-15:], other_model, scaler, feature_order, cache=cache)
+    assert cache.stats()['misses'] == 35
+
+
+def test_feature_layout_matches_build_team_features(artifacts, make_teams):
+    _, _, feature_order = artifacts
+    teams = make_teams(50, seed=9)
+    layout = compile_feature_layout(feature_order)
+    expected = np.array([[build_team_features(t)[f] for f in feature_order] for t in teams])
+
+    np.testing.assert_array_equal(layout.build(team_matrix(teams)), expected)
+
+    # Reused buffer: result is a view of the first rows
+    buffer = layout.allocate(60)
+    features = layout.build(team_matrix(teams[:3]), buffer)
+    assert np.shares_memory(features, buffer.features)
+    np.testing.assert_array_equal(features, expected[:3])
+    with pytest.raises(ValueError):
+        layout.build(team_matrix(make_teams(61, seed=1)), buffer)
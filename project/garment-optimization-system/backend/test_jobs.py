@@ -0,0 +1,49 @@
+import threading
+
+import pytest
+
+from app.jobs import JobManager, QueueFullError, CANCELLED, COMPLETED
+from app.ml.optimizer import optimize_worker_allocation
+
+
+def test_queue_depth_limit_and_cancel():
+    manager = JobManager(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    running = manager.submit(lambda job: release.wait(5))
+    queued = manager.submit(lambda job: 'never runs')
+    with pytest.raises(QueueFullError):
+        manager.submit(lambda job: None)
+
+    queued.cancel()
+    release.set()
+    running.future.result(timeout=5)
+    manager.shutdown()
+
+    assert running.status == COMPLETED
+    assert queued.status == CANCELLED
+
+
+def test_cancel_stops_annealing_loop(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(8, seed=5)
+    manager = JobManager(max_workers=1, max_queue=0)
+    started = threading.Event()
+
+    def run(job):
+        def report(iteration, best_score):
+            job.report_progress(iteration, best_score)
+            started.set()
+        return optimize_worker_allocation(
+            teams, rf_model, scaler, feature_order, max_iterations=100000,
+            temperature=1e6, cooling_rate=1.0, progress_callback=report, should_stop=job.cancel_requested
+        )
+
+    job = manager.submit(run)
+    assert started.wait(5)
+    job.cancel()
+    result = job.future.result(timeout=5)
+    manager.shutdown()
+
+    assert job.status == CANCELLED
+    assert result['iterations'] < 100000
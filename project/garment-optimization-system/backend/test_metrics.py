@@ -0,0 +1,40 @@
+from app import metrics
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.optimizer import optimize_worker_allocation
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.register(metrics.Histogram('demo_seconds', 'Demo', ('stage',), buckets=(0.1, 1.0)))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage='a"b')
+
+    text = registry.render()
+
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="a\\"b",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="a\\"b",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{stage="a\\"b",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="a\\"b"} 3' in text
+
+
+def test_profiling_collects_model_stages(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+
+    with metrics.profiling() as profile:
+        evaluate_system_batch(make_teams(20, seed=2), rf_model, scaler, feature_order, cache=None)
+    evaluate_system_batch(make_teams(20, seed=2), rf_model, scaler, feature_order, cache=None)
+
+    stages = profile.to_dict()['stages']
+    assert set(stages) == {'build_features', 'scale', 'predict'}
+    assert all(stage['calls'] == 1 for stage in stages.values())
+
+
+def test_optimizer_reports_move_outcomes_and_stop_reason(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    result = optimize_worker_allocation(
+        make_teams(6, seed=4), rf_model, scaler, feature_order, max_iterations=50, seed=1
+    )
+
+    assert result['accepted'] + result['rejected'] + result['infeasible'] == result['iterations']
+    assert result['stop_reason'] == 'max_iterations'
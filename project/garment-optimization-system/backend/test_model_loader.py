@@ -0,0 +1,68 @@
+import joblib
+import pytest
+
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.model_loader import ModelLoader
+from app.ml.prediction_cache import prediction_cache
+from benchmarks.synthetic import build_standin_model
+
+
+def write_version(root, version, bundle):
+    path = root / 'versions' / version
+    path.mkdir(parents=True)
+    rf_model, scaler, feature_order = bundle
+    joblib.dump(rf_model, path / 'rf_completion_model.pkl')
+    joblib.dump(scaler, path / 'scaler.pkl')
+    joblib.dump(feature_order, path / 'feature_order.pkl')
+
+
+def test_reload_swaps_version_and_keeps_old_handle_usable(artifacts, make_teams, tmp_path):
+    write_version(tmp_path, 'v1', artifacts)
+    write_version(tmp_path, 'v2', build_standin_model(n_estimators=5, max_depth=4, n_train=200, seed=1))
+    (tmp_path / 'CURRENT').write_text('v1\n')
+
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = str(tmp_path)
+    loader.load_artifacts()
+    assert loader.available_versions() == ['v1', 'v2']
+    assert loader.current.version == 'v1'
+
+    teams = make_teams(10, seed=3)
+    old = loader.current
+    before = evaluate_system_batch(teams, old.rf_model, old.scaler, old.feature_order)
+
+    loader.reload('v2')
+    assert loader.current.version == 'v2'
+    assert loader.last_reload['previous_version'] == 'v1'
+
+    # A request still holding the v1 handle gets v1 predictions, not v2 cache entries
+    evaluate_system_batch(teams, loader.rf_model, loader.scaler, loader.feature_order)
+    after = evaluate_system_batch(teams, old.rf_model, old.scaler, old.feature_order)
+    assert after['total_output'] == pytest.approx(before['total_output'])
+    assert {'v1', 'v2'} <= set(prediction_cache.stats()['versions'])
+
+
+def test_failed_reload_keeps_current_model(artifacts, tmp_path):
+    write_version(tmp_path, 'v1', artifacts)
+    (tmp_path / 'versions' / 'broken').mkdir()
+
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = str(tmp_path)
+    loader.load_artifacts('v1')
+
+    with pytest.raises(Exception):
+        loader.reload('broken')
+    assert loader.current.version == 'v1'
+    assert loader.last_reload['status'] == 'failed'
+
+
+def test_empty_versions_directory_falls_back_to_flat_layout(artifacts, tmp_path):
+    (tmp_path / 'versions').mkdir()
+    for name, artifact in zip(['rf_completion_model.pkl', 'scaler.pkl', 'feature_order.pkl'], artifacts):
+        joblib.dump(artifact, tmp_path / name)
+
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = str(tmp_path)
+    assert loader.default_version() == 'default'
+    loader.load_artifacts()
+    assert loader.current.version == 'default'
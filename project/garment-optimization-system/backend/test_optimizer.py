@@ -0,0 +1,154 @@
+import copy
+import time
+
+import numpy as np
+import pytest
+
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.feature_builder import team_matrix
+from app.ml.greedy import optimize_greedy
+from app.ml.multi_start import optimize_multi_start
+from app.ml.optimizer import optimize_worker_allocation
+from app.utils.validators import validate_teams
+
+
+def test_incremental_scores_match_full_evaluation(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(12)
+
+    np.random.seed(0)
+    result = optimize_worker_allocation(teams, rf_model, scaler, feature_order, max_iterations=300)
+
+    full = evaluate_system_batch(result['optimized_teams'], rf_model, scaler, feature_order)
+    best = result['best_performance']
+    assert best['total_completion_rate'] == pytest.approx(full['total_completion_rate'])
+    assert best['total_output'] == pytest.approx(full['total_output'])
+    for got, want in zip(best['team_metrics'], full['team_metrics']):
+        assert got['output'] == pytest.approx(want['output'])
+    assert result['gain'] >= 0
+
+
+def test_multi_start_is_reproducible(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(6, seed=4)
+
+    first = optimize_multi_start(teams, rf_model, scaler, feature_order,
+                                 restarts=3, seed=42, max_workers=2, max_iterations=100)
+    second = optimize_multi_start(teams, rf_model, scaler, feature_order,
+                                  restarts=3, seed=42, max_workers=1, max_iterations=100)
+
+    assert first['seed'] == 42
+    assert len({chain['seed'] for chain in first['chains']}) == 3
+    assert first['chains'] == second['chains']
+    assert first['optimized_teams'] == second['optimized_teams']
+    assert first['best_performance']['total_completion_rate'] == max(c['best_score'] for c in first['chains'])
+
+
+def test_stop_reaches_running_pool_chains(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    progress = []
+
+    def should_stop():
+        return len(progress) >= 2
+
+    started = time.monotonic()
+    result = optimize_multi_start(
+        make_teams(8, seed=2), rf_model, scaler, feature_order, restarts=2, seed=1, max_workers=2,
+        max_iterations=10 ** 6, temperature=1e6, cooling_rate=1.0, patience=10 ** 6,
+        progress_callback=lambda iteration, best_score: progress.append(iteration), should_stop=should_stop
+    )
+
+    assert time.monotonic() - started < 30
+    assert [chain['stop_reason'] for chain in result['chains']] == ['cancelled', 'cancelled']
+    assert all(chain['iterations'] < 10 ** 6 for chain in result['chains'])
+
+
+def test_greedy_is_deterministic_and_improves(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(10, seed=6)
+
+    first = optimize_greedy(teams, rf_model, scaler, feature_order)
+    second = optimize_greedy(teams, rf_model, scaler, feature_order)
+
+    assert first['optimized_teams'] == second['optimized_teams']
+    assert first['gain'] >= 0
+    assert validate_teams(first['optimized_teams'])
+    # One model call to score every team, then one per applied transfer
+    assert first['model_calls'] == first['iterations'] + 1
+
+    full = evaluate_system_batch(first['optimized_teams'], rf_model, scaler, feature_order)
+    assert first['best_performance']['total_output'] == pytest.approx(full['total_output'])
+
+
+@pytest.mark.parametrize('batch_selection', ['best', 'metropolis'])
+def test_batched_proposals_respect_migration_rules(artifacts, make_teams, batch_selection):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(8, seed=9)
+
+    result = optimize_worker_allocation(teams, rf_model, scaler, feature_order, max_iterations=200,
+                                        seed=2, batch_size=8, batch_selection=batch_selection)
+
+    assert validate_teams(result['optimized_teams'])
+    for before, after in zip(teams, result['optimized_teams']):
+        assert {k: v for k, v in before.items() if not k.endswith('_attendance')} == \
+               {k: v for k, v in after.items() if not k.endswith('_attendance')}
+    for dept in ('cutting', 'sewing', 'finishing'):
+        key = f'{dept}_attendance'
+        assert sum(t[key] for t in teams) == sum(t[key] for t in result['optimized_teams'])
+    full = evaluate_system_batch(result['optimized_teams'], rf_model, scaler, feature_order)
+    assert result['best_performance']['total_output'] == pytest.approx(full['total_output'])
+
+
+def test_annealing_accepts_team_matrix_and_leaves_input_untouched(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(10, seed=12)
+    original = copy.deepcopy(teams)
+
+    from_dicts = optimize_worker_allocation(teams, rf_model, scaler, feature_order, max_iterations=150, seed=3)
+    from_matrix = optimize_worker_allocation(team_matrix(teams), rf_model, scaler, feature_order,
+                                             max_iterations=150, seed=3)
+
+    assert teams == original
+    assert from_dicts['optimized_teams'] == from_matrix['optimized_teams']
+    assert from_dicts['best_performance'] == from_matrix['best_performance']
+    assert all(type(value) is int for value in from_dicts['optimized_teams'][0].values())
+
+
+@pytest.mark.parametrize('optimizer', [optimize_worker_allocation, optimize_greedy])
+def test_deadline_returns_best_so_far(artifacts, make_teams, optimizer):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(40, seed=6)
+
+    start = time.monotonic()
+    result = optimizer(teams, rf_model, scaler, feature_order, max_iterations=10 ** 6, deadline=start + 0.05)
+
+    assert time.monotonic() - start < 0.5
+    assert result['stop_reason'] in ('time_budget', 'converged')
+    assert result['best_performance']['total_output'] >= result['initial_performance']['total_output']
+    assert validate_teams(result['optimized_teams'])
+
+
+def test_time_budget_is_honoured_within_tolerance(artifacts, make_teams):
+    # Returns within 10% + 20 ms of the budget, and does not give up much before it
+    rf_model, scaler, feature_order = artifacts
+    teams = team_matrix(make_teams(1000, seed=6)).astype(np.int32)
+    budget = 0.2
+
+    start = time.monotonic()
+    result = optimize_worker_allocation(teams, rf_model, scaler, feature_order, max_iterations=10 ** 6,
+                                        deadline=start + budget)
+    elapsed = time.monotonic() - start
+
+    assert result['stop_reason'] == 'time_budget'
+    assert 0.8 * budget <= elapsed <= 1.1 * budget + 0.02
+
+
+def test_target_score_stops_once_reached(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(20, seed=2)
+    initial = evaluate_system_batch(teams, rf_model, scaler, feature_order)['total_completion_rate']
+
+    result = optimize_worker_allocation(teams, rf_model, scaler, feature_order, seed=1, target_score=initial * 1.001)
+
+    assert result['stop_reason'] == 'target_reached'
+    assert result['best_performance']['total_completion_rate'] >= initial * 1.001
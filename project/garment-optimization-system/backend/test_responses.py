@@ -0,0 +1,44 @@
+import gzip
+import json
+
+from app import responses
+from app.ml.optimizer import optimize_worker_allocation
+
+
+def test_delta_transfers_rebuild_optimized_teams(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    teams = make_teams(12, seed=5)
+    optimized = optimize_worker_allocation(teams, rf_model, scaler, feature_order, max_iterations=200, seed=1)
+    result = {
+        'teams_before': teams,
+        'teams_after': optimized['optimized_teams'],
+        'team_metrics_before': optimized['initial_performance']['team_metrics'],
+        'team_metrics_after': optimized['best_performance']['team_metrics'],
+        'gain': optimized['gain']
+    }
+
+    delta = responses.delta_result(result)
+
+    rebuilt = [dict(team) for team in teams]
+    for transfer in delta['transfers']:
+        field = f"{transfer['department']}_attendance"
+        rebuilt[transfer['from_team']][field] -= transfer['count']
+        rebuilt[transfer['to_team']][field] += transfer['count']
+    assert rebuilt == optimized['optimized_teams']
+    assert [change['team'] for change in delta['changed_teams']] == [
+        idx for idx, (before, after) in enumerate(zip(teams, rebuilt)) if before != after
+    ]
+    assert delta['gain'] == optimized['gain'] and 'teams_after' not in delta
+
+
+def test_gzip_is_negotiated_from_accept_encoding():
+    content = {'teams': [{'team': idx, 'output': idx * 1.5} for idx in range(500)]}
+
+    plain = responses.json_response(content, 'identity', headers={'ETag': '"key"'})
+    zipped = responses.json_response(content, 'br, gzip;q=0.8', headers={'ETag': '"key"'})
+    refused = responses.json_response(content, 'gzip;q=0')
+
+    assert 'content-encoding' not in plain.headers and plain.headers['etag'] == '"key"'
+    assert zipped.headers['content-encoding'] == 'gzip' and zipped.headers['etag'] == 'W/"key"'
+    assert json.loads(gzip.decompress(zipped.body)) == json.loads(plain.body) == content
+    assert 'content-encoding' not in refused.headers
@@ -0,0 +1,62 @@
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from app.result_cache import ResultCache, request_key
+from app.schemas import OptimizationRequest
+
+
+def make_request(make_teams, **fields):
+    return OptimizationRequest(teams=make_teams(3, seed=1), **fields)
+
+
+def test_request_key_covers_content_seed_and_model_version(make_teams):
+    base = request_key(make_request(make_teams, seed=1), 'v1')
+
+    assert request_key(make_request(make_teams, seed=1), 'v1') == base
+    assert request_key(make_request(make_teams, seed=1, profile=True), 'v1') == base
+    assert request_key(make_request(make_teams, seed=2), 'v1') != base
+    assert request_key(make_request(make_teams, seed=1), 'v2') != base
+    assert request_key(make_request(make_teams, seed=1, algorithm='greedy'), 'v1') != base
+
+
+def test_lru_and_ttl_eviction(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.result_cache.time.time', lambda: now[0])
+    cache = ResultCache(maxsize=2, ttl=60, path='')
+
+    cache.put('a', {'gain': 1})
+    cache.put('b', {'gain': 2})
+    assert cache.get('a') == {'gain': 1}
+    cache.put('c', {'gain': 3})  # evicts b, the least recently used
+    assert cache.get('b') is None
+
+    now[0] += 61
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 1
+
+
+def test_sqlite_tier_survives_restart(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    ResultCache(maxsize=4, ttl=60, path=path).put('key', {'gain': 1.5, 'migration_log': {'cutting': 2}})
+
+    restarted = ResultCache(maxsize=4, ttl=60, path=path)
+    assert restarted.get('key') == {'gain': 1.5, 'migration_log': {'cutting': 2}}
+
+
+def test_identical_requests_join_running_job():
+    cache = ResultCache(maxsize=4, ttl=60, path='')
+    started = []
+
+    def start():
+        job = SimpleNamespace(future=Future())
+        started.append(job)
+        return job
+
+    first, joined_first = cache.join_or_start('key', start)
+    second, joined_second = cache.join_or_start('key', start)
+    assert (joined_first, joined_second) == (False, True)
+    assert first is second and len(started) == 1
+
+    first.future.set_result({})
+    third, joined_third = cache.join_or_start('key', start)
+    assert not joined_third and third is not first
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from app.ml import scenarios
+from app.ml.evaluator import evaluate_system_batch
+from app.ml.feature_builder import team_matrix, teams_from_matrix
+from app.schemas import AttendanceChange
+
+
+def scenario_results(base, sources, artifacts, **kwargs):
+    rf_model, scaler, feature_order = artifacts
+    chunks = scenarios.evaluate_scenarios(base, sources, rf_model, scaler, feature_order, **kwargs)
+    next(chunks)  # base performance
+    return [result for chunk in chunks for result in chunk]
+
+
+def test_sweep_matches_full_plant_evaluation(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    base = team_matrix(make_teams(6, seed=3)).astype(np.int32)
+
+    generated = list(scenarios.sweep_scenarios(base, max_delta=2))
+    results = scenario_results(base, generated, artifacts, chunk_rows=7)
+
+    assert len(results) == len(generated)
+    assert [r['index'] for r in results] == list(range(len(generated)))
+    for (_, teams, attendance), result in zip(generated, results):
+        plant = base.copy()
+        plant[teams, 4:7] = attendance
+        expected = evaluate_system_batch(teams_from_matrix(plant), rf_model, scaler, feature_order, cache=None)
+        assert result['total_output'] == pytest.approx(expected['total_output'], rel=1e-12)
+
+
+def test_explicit_scenarios_are_validated(make_teams):
+    base = team_matrix(make_teams(2, seed=1)).astype(np.int32)
+    too_many = {'changes': [{'team': 0, 'department': 'cutting', 'delta': int(base[0, 1])}]}
+
+    with pytest.raises(ValueError):
+        list(scenarios.explicit_scenarios(base, [too_many]))
+    with pytest.raises(ValueError):
+        list(scenarios.explicit_scenarios(base, [{'changes': [{'team': 5, 'department': 'cutting', 'delta': -1}]}]))
+
+
+def test_top_k_keeps_most_extreme_scenarios(artifacts, make_teams):
+    base = team_matrix(make_teams(5, seed=2)).astype(np.int32)
+    results = scenario_results(base, scenarios.sweep_scenarios(base, max_delta=3), artifacts)
+    chunks = [results[i:i + 4] for i in range(0, len(results), 4)]
+
+    worst = scenarios.top_k(chunks, 3, rank='worst')
+
+    assert [r['index'] for r in worst] == [r['index'] for r in sorted(results, key=lambda r: r['total_output'])[:3]]
+
+
+def test_explicit_deltas_that_would_wrap_int32_are_rejected(make_teams):
+    base = team_matrix(make_teams(2, seed=1)).astype(np.int32)
+    # Adds up to 2**32, a no-op once wrapped to int32
+    changes = [{'team': 0, 'department': 'sewing', 'delta': delta} for delta in (2 ** 31 - 1, 2 ** 31 - 1, 2)]
+
+    with pytest.raises(ValueError, match="attendance must stay between 1 and its workers"):
+        list(scenarios.explicit_scenarios(base, [{'changes': changes}]))
+    with pytest.raises(ValueError):
+        AttendanceChange(team=0, department='sewing', delta=2 ** 32)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from app import sessions
+from app.ml.evaluator import evaluate_system_batch, team_outputs
+from app.ml.feature_builder import team_matrix
+from app.ml.model_loader import ModelHandle
+from app.ml.optimizer import optimize_worker_allocation
+from app.sessions import SessionCapacityError, SessionStore
+
+
+class CountingModel:
+    """Forest wrapper recording how many rows each predict call scores"""
+
+    def __init__(self, model):
+        self.model = model
+        self.rows = []
+
+    def predict(self, features):
+        self.rows.append(len(features))
+        return self.model.predict(features)
+
+
+def test_edit_rescores_only_edited_teams_and_continues_from_best(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    counting = CountingModel(rf_model)
+    model = ModelHandle('v1', counting, scaler, feature_order)
+    state = team_matrix(make_teams(100, seed=6))
+    store = SessionStore(ttl=60, max_bytes=10 ** 6)
+    session = store.create(model, state, seed=1)
+
+    team = int(np.flatnonzero(state[:, 5] > 1)[0])
+    counting.rows.clear()
+    result = session.update(changes=[{'team': team, 'department': 'sewing', 'delta': -1}])
+
+    # No call re-predicts the whole plant: the edited team, then move candidates
+    assert counting.rows[0] == 1 and max(counting.rows) < len(state)
+    assert result['revision'] == 1 and result['edited_teams'] == [team]
+    assert result['teams_before'][team]['sewing_attendance'] == state[team, 5] - 1
+    edited = evaluate_system_batch(result['teams_before'], rf_model, scaler, feature_order, cache=None)
+    assert result['initial']['total_output'] == pytest.approx(edited['total_output'])
+    assert result['final']['completion_rate'] >= result['initial']['completion_rate']
+
+    # The next edit starts from this result's teams and scores
+    after = evaluate_system_batch(result['teams_after'], rf_model, scaler, feature_order, cache=None)
+    assert session.to_dict(store.ttl)['total_output'] == pytest.approx(after['total_output'])
+    with pytest.raises(ValueError):
+        session.update(changes=[{'team': 100, 'department': 'sewing', 'delta': 1}])
+
+
+def test_idle_expiry_and_memory_cap(artifacts, make_teams, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('app.sessions.time.time', lambda: now[0])
+    model = ModelHandle('v1', *artifacts)
+    state = team_matrix(make_teams(10, seed=2))
+    scores = (np.ones(10), np.ones(10))
+    size = state.astype(np.int32).nbytes + 2 * scores[0].nbytes
+    store = SessionStore(ttl=60, max_bytes=2 * size)
+
+    first = store.create(model, state, scores)
+    now[0] += 30
+    second = store.create(model, state, scores)
+    store.get(first.id)  # first is now the most recently used
+    third = store.create(model, state, scores)
+    assert store.get(second.id) is None and store.stats()['evicted'] == 1
+
+    now[0] += 61
+    assert store.get(first.id) is None and store.get(third.id) is None
+    assert store.stats() == {'sessions': 0, 'bytes': 0, 'max_bytes': 2 * size, 'ttl': 60, 'expired': 2,
+                             'evicted': 1}
+    with pytest.raises(SessionCapacityError):
+        SessionStore(ttl=60, max_bytes=size - 1).create(model, state, scores)
+
+
+def test_warm_start_accepts_worse_moves_to_leave_a_local_optimum(artifacts, make_teams):
+    rf_model, scaler, feature_order = artifacts
+    # Hill-climb to a state where no sampled move improves the score
+    climbed = optimize_worker_allocation(team_matrix(make_teams(20, seed=4)), rf_model, scaler, feature_order,
+                                         max_iterations=5000, temperature=0, patience=100, batch_size=64, seed=1)
+    state = team_matrix(climbed['optimized_teams']).astype(np.int32)
+    rates, outputs = team_outputs(state, rf_model, scaler, feature_order)
+    model = ModelHandle('v1', rf_model, scaler, feature_order)
+
+    def warm(seed, temperature):
+        return optimize_worker_allocation(
+            state, rf_model, scaler, feature_order, max_iterations=sessions.WARM_ITERATIONS,
+            temperature=temperature, cooling_rate=sessions.WARM_COOLING_RATE, patience=sessions.WARM_PATIENCE,
+            batch_size=sessions.WARM_BATCH_SIZE, seed=seed, initial_scores=(rates, outputs)
+        )
+
+    # Without uphill moves the run is stuck there
+    assert all(warm(seed, 1e-9)['gain'] == 0 for seed in range(5))
+    results = [sessions.reoptimize(model, state, rates, outputs, seed) for seed in range(5)]
+    assert all(result['accepted_worse'] > 0 and result['gain'] >= 0 for result in results)
+    assert any(result['gain'] > 0 for result in results)
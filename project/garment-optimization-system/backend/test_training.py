@@ -0,0 +1,93 @@
+import json
+
+import numpy as np
+
+from app.ml.model_loader import ModelLoader
+from training import train
+
+HEADER_ABSENT = ('total_workers,cutting_workers,sewing_workers,finishing_workers,absent_workers,'
+                 'final_output,daily_target,bottleneck_department')
+HEADER_ATTENDANCE = ('total_workers,cutting_workers,sewing_workers,finishing_workers,cutting_attendance,'
+                     'sewing_attendance,finishing_attendance,final_output,daily_target,bottleneck_department')
+
+
+def write_datasets(root, rows=60, seed=0):
+    rng = np.random.default_rng(seed)
+    absent, attendance = [HEADER_ABSENT], [HEADER_ATTENDANCE]
+    for i in range(rows):
+        workers = rng.integers(10, 60, size=3)
+        present = np.maximum(1, workers - rng.integers(0, 5, size=3))
+        target = int(rng.integers(300, 900))
+        output = int(target * present.min() / workers.max())
+        if i % 2:
+            absent.append(f"{workers.sum()},{workers[0]},{workers[1]},{workers[2]},"
+                          f"{(workers - present).sum()},{output},{target},Finishing")
+        else:
+            attendance.append(f"{workers.sum()},{','.join(map(str, workers))},"
+                              f"{','.join(map(str, present))},{output},{target},sewing")
+    (root / 'garment_a.csv').write_text('\n'.join(absent) + '\n')
+    (root / 'garment_b.csv').write_text('\n'.join(attendance) + '\n')
+
+
+def test_training_writes_a_loadable_versioned_bundle(tmp_path):
+    data = tmp_path / 'data'
+    data.mkdir()
+    write_datasets(data)
+    output = tmp_path / 'artifacts'
+
+    status = train.main([
+        '--data', str(data), '--output', str(output), '--version', 'trained', '--set-current',
+        '--n-estimators', '3,6', '--max-depth', '3,None', '--n-jobs', '1',
+        '--chunksize', '7', '--latency-repeats', '3'
+    ])
+
+    assert status == 0
+    report = json.loads((output / 'versions' / 'trained' / 'training_report.json').read_text())
+    assert report['data']['rows'] == 60
+    assert len(report['sweep']) == 4
+    assert report['selected']['nodes'] == min(
+        r['nodes'] for r in report['sweep'] if r['r2'] >= max(s['r2'] for s in report['sweep']) - 0.01
+    )
+
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = str(output)
+    loader.load_artifacts()
+    assert loader.current.version == 'trained'
+    assert loader.current.rf_model.n_estimators == report['selected']['n_estimators']
+
+
+def test_select_config_prefers_smallest_model_within_slo():
+    results = [
+        {'nodes': 100, 'r2': 0.80, 'p50': 1.0},
+        {'nodes': 900, 'r2': 0.805, 'p50': 3.0},
+        {'nodes': 5000, 'r2': 0.90, 'p50': 9.0}
+    ]
+
+    assert train.select_config(results, 4.0, 'p50', 0.01)['nodes'] == 100
+    assert train.select_config(results, None, 'p50', 0.01)['nodes'] == 5000
+    assert train.select_config(results, 0.5, 'p50', 0.01) is None
+
+
+def test_sweep_refits_a_selected_model_it_did_not_keep(tmp_path, monkeypatch):
+    data = tmp_path / 'data'
+    data.mkdir()
+    write_datasets(data)
+    # The 6-tree forest is second smallest until the last result raises the R^2 cutoff past the 3-tree one
+    r2 = {3: 0.80, 6: 0.85, 9: 0.92}
+    evaluate = train.evaluate_config
+
+    def evaluate_config(n_estimators, max_depth, data, args):
+        rf_model, result = evaluate(n_estimators, max_depth, data, args)
+        return rf_model, {**result, 'nodes': n_estimators, 'r2': r2[n_estimators]}
+
+    monkeypatch.setattr(train, 'evaluate_config', evaluate_config)
+    output = tmp_path / 'artifacts'
+    status = train.main([
+        '--data', str(data), '--output', str(output), '--version', 'trained', '--r2-tolerance', '0.1',
+        '--n-estimators', '3,6,9', '--max-depth', '4', '--n-jobs', '1', '--latency-repeats', '3'
+    ])
+
+    assert status == 0
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = str(output)
+    assert loader.load_bundle('trained').rf_model.n_estimators == 6
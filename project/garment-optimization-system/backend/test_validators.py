@@ -0,0 +1,49 @@
+import pytest
+
+from app.ml.feature_builder import TEAM_FIELDS, team_matrix, team_matrix_from_columns
+from app.optimization import request_matrix
+from app.schemas import OptimizationRequest
+from app.utils.validators import validate_team_matrix, validate_teams
+
+
+def test_matrix_validator_reports_every_failing_team(make_teams):
+    teams = make_teams(8, seed=2)
+    assert validate_teams(teams) and validate_team_matrix(team_matrix(teams))
+
+    teams[1]['total_workers'] += 1
+    teams[3]['sewing_attendance'] = teams[3]['sewing_workers'] + 1
+    teams[6]['sewing_attendance'] = teams[6]['sewing_workers'] + 2
+    teams[7]['daily_target'] = 0
+
+    with pytest.raises(ValueError) as error:
+        validate_team_matrix(team_matrix(teams))
+    assert str(error.value) == (
+        "Team 8: all fields must be positive; "
+        "Team 2: sum of department workers must equal total_workers; "
+        "Teams 4, 7: sewing_attendance exceeds sewing_workers"
+    )
+
+
+def test_columns_and_team_objects_give_the_same_matrix(make_teams):
+    teams = make_teams(5, seed=1)
+    columns = {field: [team[field] for team in teams] for field in TEAM_FIELDS}
+
+    request = OptimizationRequest(columns=columns)
+    assert (team_matrix_from_columns(dict(request.columns)) == team_matrix(teams)).all()
+
+    with pytest.raises(ValueError):
+        OptimizationRequest(columns={**columns, 'daily_target': [1, 2]})
+    with pytest.raises(ValueError):
+        OptimizationRequest(teams=teams, columns=columns)
+
+
+def test_values_beyond_int32_are_validation_errors(make_teams):
+    teams = make_teams(3, seed=1)
+    columns = {field: [team[field] for team in teams] for field in TEAM_FIELDS}
+    columns['daily_target'][1] = 2 ** 31 + 5
+    with pytest.raises(ValueError, match="Team 2: fields must be at most 2147483647"):
+        request_matrix(OptimizationRequest(columns=columns))
+
+    teams[0]['daily_target'] = 2 ** 70
+    with pytest.raises(ValueError, match="at most 2147483647"):
+        request_matrix(OptimizationRequest(teams=teams))
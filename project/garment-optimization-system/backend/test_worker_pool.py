@@ -0,0 +1,93 @@
+import os
+import signal
+
+import joblib
+import pytest
+
+from app import metrics
+from app.ml.evaluator import team_outputs
+from app.ml.feature_builder import team_matrix
+from app.ml.model_loader import ModelLoader
+from app.optimization import run_optimization
+from app.schemas import OptimizationRequest
+from app.sessions import reoptimize
+from app import worker_pool
+from app.worker_pool import WorkerPool
+
+
+def save_bundle(artifacts, root):
+    path = root / 'versions' / 'v1'
+    path.mkdir(parents=True)
+    for name, artifact in zip(['rf_completion_model.pkl', 'scaler.pkl', 'feature_order.pkl'], artifacts):
+        joblib.dump(artifact, path / name)
+
+
+@pytest.fixture
+def pool(artifacts, tmp_path):
+    save_bundle(artifacts, tmp_path)
+    pool = WorkerPool(2, str(tmp_path), 'v1', inference_backend='sklearn', max_tasks_per_worker=10)
+    yield pool
+    pool.shutdown()
+
+
+def iterations_total():
+    return sum(value for _, _, _, value in metrics.ITERATIONS_TOTAL.samples())
+
+
+def test_pool_matches_in_process_run_and_relays_progress(pool, make_teams):
+    request = OptimizationRequest(teams=make_teams(6, seed=3), seed=5, restarts=2)
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = pool.artifacts_path
+    expected = run_optimization(request, loader.load_bundle('v1'), chain_workers=1)
+
+    progress, initial = [], []
+    before = iterations_total()
+    result = pool.run(request, 'v1', progress_callback=lambda i, s: progress.append(i), on_initial=initial.append)
+
+    assert result['teams_after'] == expected['teams_after']
+    assert result['migration_log'] == expected['migration_log']
+    assert initial[0]['total_completion_rate'] == pytest.approx(expected['initial']['completion_rate'])
+    assert progress and max(progress) > 0
+    # Iterations counted in the worker reach this process's registry
+    assert iterations_total() - before == sum(chain['iterations'] for chain in result['chains'])
+
+
+def test_pool_reoptimize_matches_in_process_run(pool, make_teams):
+    loader = ModelLoader(inference_backend='sklearn')
+    loader.artifacts_path = pool.artifacts_path
+    model = loader.load_bundle('v1')
+    state = team_matrix(make_teams(8, seed=4)).astype('int32')
+    rates, outputs = team_outputs(state, model.rf_model, model.scaler, model.feature_order)
+
+    expected = reoptimize(model, state, rates, outputs, seed=3)
+    result = pool.reoptimize(model, state, rates, outputs, seed=3)
+    assert result['optimized_teams'] == expected['optimized_teams']
+    assert result['iterations'] == expected['iterations']
+
+
+def test_cancel_and_recovery_from_a_dead_worker(pool, make_teams):
+    request = OptimizationRequest(teams=make_teams(6, seed=3), seed=5)
+    cancelled = pool.run(request, 'v1', should_stop=lambda: True)
+    assert cancelled['iterations'] < 1000
+
+    for process in list(pool._executor._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+
+    result = pool.run(request, 'v1')
+    assert result['teams_after']
+    assert pool.stats()['rebuilds'] == 1
+
+
+def test_pool_is_replaced_when_workers_cannot_recycle_themselves(artifacts, tmp_path, make_teams, monkeypatch):
+    # Python < 3.11 has no max_tasks_per_child
+    monkeypatch.setattr(worker_pool, 'PER_CHILD_RECYCLING', False)
+    save_bundle(artifacts, tmp_path)
+    pool = WorkerPool(1, str(tmp_path), 'v1', inference_backend='sklearn', max_tasks_per_worker=1)
+    try:
+        first = pool._executor
+        request = OptimizationRequest(teams=make_teams(4, seed=3), seed=5)
+        results = [pool.run(request, 'v1') for _ in range(2)]
+        assert results[0]['teams_after'] == results[1]['teams_after']
+        assert pool._executor is not first and pool.stats()['tasks'] == 2
+    finally:
+        pool.shutdown()
@@ -0,0 +1,254 @@
+"""
+Train rf_completion_model.pkl from the dataset CSVs into a versioned bundle.
+
+    python -m training.train                                  # default sweep
+    python -m training.train --n-estimators 50,100 --max-depth 10,None \\
+        --latency-slo-ms 2 --version rf-2024-06 --set-current
+
+Run from the backend directory. Reads every garment*.csv (or --data),
+sweeps forest size and depth, reports accuracy next to inference latency,
+and writes the selected model with its scaler and feature_order to
+artifacts/versions/<version>/ along with training_report.json.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import warnings
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from app.dataset_store import dataset_files, normalize_frame
+from app.ml.compiled_forest import CompiledForest
+from app.ml.feature_builder import TEAM_FIELDS, build_team_features
+from app.ml.model_loader import ModelLoader
+
+ARTIFACTS_PATH = os.path.join(os.path.dirname(__file__), '..', 'artifacts')
+
+# Rows per predict call timed: one annealing step (two teams) and a large plant
+LATENCY_BATCH_SIZES = (2, 1000)
+
+
+def load_training_data(files, chunksize=5000):
+    """
+    Team fields and completion-rate targets from the dataset files.
+
+    Files are read chunk by chunk and normalized with the same rules as
+    /sample-data (blank columns, absent_workers-only files); rows without
+    final_output are dropped.
+
+    Returns:
+        (teams, targets): (n x 8) int64 team matrix and final_output / daily_target
+    """
+    import pandas as pd
+
+    teams, targets = [], []
+    for path in files:
+        for chunk in pd.read_csv(path, skipinitialspace=True, chunksize=chunksize):
+            frame = normalize_frame(chunk)
+            if 'final_output' not in frame.columns:
+                continue
+            frame = frame.dropna(subset=['final_output'])
+            teams.append(frame[TEAM_FIELDS].to_numpy(dtype=np.int64))
+            targets.append(frame['final_output'].to_numpy(dtype=np.float64) / frame['daily_target'].to_numpy())
+    if not teams:
+        raise ValueError("No training rows with final_output found")
+    return np.concatenate(teams), np.concatenate(targets)
+
+
+def build_features(teams):
+    """Feature matrix and feature_order through build_team_features"""
+    rows = [build_team_features(dict(zip(TEAM_FIELDS, team))) for team in teams.tolist()]
+    feature_order = list(rows[0])
+    return np.array([[row[f] for f in feature_order] for row in rows]), feature_order
+
+
+def predict_latency_ms(model, X, batch_size, repeats):
+    """Median milliseconds per predict call on batch_size rows"""
+    batch = X[np.arange(batch_size) % len(X)]
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings) * 1000)
+
+
+def fit_forest(n_estimators, max_depth, X_train, y_train, args):
+    """Seeded forest, so the same configuration always gives the same model"""
+    rf_model = RandomForestRegressor(
+        n_estimators=n_estimators, max_depth=max_depth, n_jobs=args.n_jobs, random_state=args.seed
+    )
+    rf_model.fit(X_train, y_train)
+    # Serving predicts a few rows at a time; thread fan-out only adds overhead there
+    return rf_model.set_params(n_jobs=None)
+
+
+def evaluate_config(n_estimators, max_depth, data, args):
+    X_train, X_test, y_train, y_test, X_test_raw, scaler = data
+
+    start = time.perf_counter()
+    rf_model = fit_forest(n_estimators, max_depth, X_train, y_train, args)
+    train_seconds = time.perf_counter() - start
+
+    predictions = rf_model.predict(X_test)
+    compiled = CompiledForest.from_sklearn(rf_model, scaler)
+    latency = {}
+    for batch_size in LATENCY_BATCH_SIZES:
+        repeats = args.latency_repeats if batch_size <= 10 else max(3, args.latency_repeats // 10)
+        latency[f'sklearn_p50_ms_{batch_size}'] = predict_latency_ms(rf_model, X_test, batch_size, repeats)
+        latency[f'compiled_p50_ms_{batch_size}'] = predict_latency_ms(compiled, X_test_raw, batch_size, repeats)
+
+    return rf_model, {
+        'n_estimators': n_estimators,
+        'max_depth': max_depth,
+        'nodes': int(sum(tree.tree_.node_count for tree in rf_model.estimators_)),
+        'train_seconds': train_seconds,
+        'mae': float(mean_absolute_error(y_test, predictions)),
+        'rmse': float(np.sqrt(mean_squared_error(y_test, predictions))),
+        'r2': float(r2_score(y_test, predictions)),
+        **latency
+    }
+
+
+def select_config(results, slo_ms, slo_key, r2_tolerance):
+    """
+    Smallest forest (fewest nodes) whose R^2 is within r2_tolerance of the
+    best model that meets the latency SLO. Without an SLO every model
+    qualifies.
+    """
+    eligible = [r for r in results if slo_ms is None or r[slo_key] <= slo_ms]
+    if not eligible:
+        return None
+    best_r2 = max(r['r2'] for r in eligible)
+    candidates = [r for r in eligible if r['r2'] >= best_r2 - r2_tolerance]
+    return min(candidates, key=lambda r: (r['nodes'], -r['r2']))
+
+
+def file_digest(files):
+    digest = hashlib.sha256()
+    for path in files:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def write_bundle(output, version, rf_model, scaler, feature_order, report, set_current):
+    """artifacts/versions/<version>/ with the model, scaler, feature_order and report"""
+    path = os.path.join(output, 'versions', version)
+    os.makedirs(path, exist_ok=True)
+    joblib.dump(rf_model, os.path.join(path, 'rf_completion_model.pkl'))
+    joblib.dump(scaler, os.path.join(path, 'scaler.pkl'))
+    joblib.dump(feature_order, os.path.join(path, 'feature_order.pkl'))
+    with open(os.path.join(path, 'training_report.json'), 'w') as f:
+        json.dump(report, f, indent=2)
+    if set_current:
+        with open(os.path.join(output, 'CURRENT'), 'w') as f:
+            f.write(version + '\n')
+    return path
+
+
+def parse_depths(value):
+    return [None if depth.lower() == 'none' else int(depth) for depth in value.split(',')]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the completion-rate forest from the dataset CSVs")
+    parser.add_argument('--data', help="CSV file or directory of garment*.csv (default: the repo's dataset/)")
+    parser.add_argument('--output', default=ARTIFACTS_PATH, help="artifacts directory to write versions/ into")
+    parser.add_argument('--version', help="bundle name (default: rf-<estimators>x<depth>-<data hash>)")
+    parser.add_argument('--set-current', action='store_true', help="point artifacts/CURRENT at the new bundle")
+    parser.add_argument('--n-estimators', default='25,50,100', help="comma-separated forest sizes to sweep")
+    parser.add_argument('--max-depth', default='8,12,None', help="comma-separated depths to sweep (None = unlimited)")
+    parser.add_argument('--n-jobs', type=int, default=-1, help="training parallelism (-1 = all cores)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--chunksize', type=int, default=5000, help="CSV rows read at a time")
+    parser.add_argument('--latency-repeats', type=int, default=50, help="timed predict calls per small batch")
+    parser.add_argument('--latency-slo-ms', type=float, help="max p50 predict latency for the selected model")
+    parser.add_argument('--slo-metric', default='sklearn_p50_ms_2',
+                        help="latency column the SLO applies to (e.g. compiled_p50_ms_2)")
+    parser.add_argument('--r2-tolerance', type=float, default=0.01,
+                        help="accept a smaller model whose R^2 is this close to the best")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    warnings.simplefilter('ignore')
+
+    files = dataset_files(args.data)
+    if not files:
+        print("No dataset files found", file=sys.stderr)
+        return 1
+    teams, targets = load_training_data(files, args.chunksize)
+    X, feature_order = build_features(teams)
+    print(f"✓ Loaded {len(X)} rows from {len(files)} files")
+
+    X_train_raw, X_test_raw, y_train, y_test = train_test_split(
+        X, targets, test_size=args.test_size, random_state=args.seed
+    )
+    scaler = StandardScaler().fit(X_train_raw)
+    data = (scaler.transform(X_train_raw), scaler.transform(X_test_raw), y_train, y_test, X_test_raw, scaler)
+
+    # Only the model the selection currently points at is kept, not the whole sweep
+    results, kept = [], None
+    for n_estimators in [int(n) for n in args.n_estimators.split(',')]:
+        for max_depth in parse_depths(args.max_depth):
+            rf_model, result = evaluate_config(n_estimators, max_depth, data, args)
+            results.append(result)
+            if select_config(results, args.latency_slo_ms, args.slo_metric, args.r2_tolerance) is result:
+                kept = (result, rf_model)
+            rf_model = None
+            print(f"✓ {n_estimators} trees, depth {max_depth}: R^2 {result['r2']:.4f}, "
+                  f"MAE {result['mae']:.4f}, {result['sklearn_p50_ms_2']:.2f} ms / 2 rows "
+                  f"({result['compiled_p50_ms_2']:.2f} ms compiled)")
+
+    selected = select_config(results, args.latency_slo_ms, args.slo_metric, args.r2_tolerance)
+    if selected is None:
+        print(f"No model meets {args.slo_metric} <= {args.latency_slo_ms} ms", file=sys.stderr)
+        print(json.dumps(results, indent=2))
+        return 1
+
+    digest = file_digest(files)
+    version = args.version or f"rf-{selected['n_estimators']}x{selected['max_depth']}-{digest[:8]}"
+    report = {
+        'version': version,
+        'selected': selected,
+        'sweep': results,
+        'latency_slo_ms': args.latency_slo_ms,
+        'slo_metric': args.slo_metric,
+        'data': {'files': [os.path.basename(f) for f in files], 'rows': len(X), 'sha256': digest},
+        'params': {'seed': args.seed, 'test_size': args.test_size, 'r2_tolerance': args.r2_tolerance},
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'scikit_learn': sklearn.__version__
+        }
+    }
+    if kept is not None and kept[0] is selected:
+        rf_model = kept[1]
+    else:
+        # A more accurate later model moved the R^2 cutoff back to a model already dropped
+        rf_model = fit_forest(selected['n_estimators'], selected['max_depth'], data[0], data[2], args)
+    path = write_bundle(args.output, version, rf_model, scaler, feature_order, report, args.set_current)
+
+    # The bundle must load the way the server loads it
+    loader = ModelLoader(inference_backend='sklearn', mmap_mode='none')
+    loader.artifacts_path = args.output
+    loader.load_bundle(version)
+    print(f"✓ Wrote {path} ({selected['n_estimators']} trees, depth {selected['max_depth']})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())